@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import copy
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Set, Tuple
+
+
+DEFAULT_SEARCH_CACHE_SIZE = 256
+DEFAULT_SEARCH_CACHE_TTL = 30.0
+# Suggestions kept per trie node; `/suggest/tags` never asks for more.
+TAG_SUGGEST_DEPTH = 100
+
+
+def default_search_cache_size() -> int:
+    """Read the entry limit from `SEARCH_CACHE_SIZE`; 0 disables the cache."""
+
+    if size_env := os.environ.get("SEARCH_CACHE_SIZE"):
+        return max(0, int(size_env))
+    return DEFAULT_SEARCH_CACHE_SIZE
+
+
+def default_search_cache_ttl() -> float:
+    if ttl_env := os.environ.get("SEARCH_CACHE_TTL"):
+        return float(ttl_env)
+    return DEFAULT_SEARCH_CACHE_TTL
+
+
+class SearchCache:
+    """Thread-safe LRU cache with a TTL for search results.
+
+    Every entry records the `Database.generation` it was computed at; a lookup
+    with a newer generation treats the entry as stale, so any committed write
+    invalidates all cached results without the cache knowing which rows changed.
+    Values are deep-copied in and out, so a caller that edits its result cannot
+    change what later hits see.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_SEARCH_CACHE_SIZE,
+        ttl: float = DEFAULT_SEARCH_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, generation: int) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry_generation, expires_at, value = entry
+            if entry_generation != generation:
+                self.invalidations += 1
+            elif expires_at <= self._clock():
+                self.expirations += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(value)
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, generation: int, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (generation, self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+            }
+
+
+class _TrieNode:
+    __slots__ = ("children", "names", "top")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _TrieNode] = {}
+        self.names: Set[str] = set()
+        # Best names of this subtree, computed on demand and reset on change.
+        self.top: Optional[List[str]] = None
+
+
+class TagCache:
+    """Process-wide copy of the tag dictionary for lookups and suggestions.
+
+    Keeps `tag_id` by `(name, path)` and a case-insensitive prefix trie of tag
+    names ranked by how many items carry them. Every trie node memoizes its
+    best `TAG_SUGGEST_DEPTH` names, so a suggestion walks the prefix and
+    slices a list. `TagsRepo` feeds it from committed writes only.
+    """
+
+    def __init__(self, depth: int = TAG_SUGGEST_DEPTH) -> None:
+        self.depth = depth
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._names: Dict[int, str] = {}
+        self._tag_usage: Dict[int, int] = {}
+        self._usage: Dict[str, int] = {}
+        self._root = _TrieNode()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.misses = 0
+
+    def reset(self, rows: Iterable[Tuple[int, str, str, int]]) -> None:
+        """Replace the contents with `(tag_id, name, path, usage)` rows."""
+
+        with self._lock:
+            self._ids.clear()
+            self._names.clear()
+            self._tag_usage.clear()
+            self._usage.clear()
+            self._root = _TrieNode()
+            for tag_id, name, path, usage in rows:
+                self._add(tag_id, name, path)
+                self._tag_usage[tag_id] = usage
+                self._usage[name] += usage
+
+    def tag_id(self, name: str, path: str = "") -> Optional[int]:
+        with self._lock:
+            self.lookups += 1
+            tag_id = self._ids.get((name, path))
+            if tag_id is None:
+                self.misses += 1
+            return tag_id
+
+    def add_tags(self, rows: Iterable[Tuple[int, str, str]]) -> None:
+        with self._lock:
+            for tag_id, name, path in rows:
+                if tag_id not in self._names:
+                    self._add(tag_id, name, path)
+
+    def set_usage(self, counts: Mapping[int, int]) -> None:
+        """Record the current number of items carrying each `tag_id`."""
+
+        with self._lock:
+            for tag_id, usage in counts.items():
+                name = self._names.get(tag_id)
+                if name is None:
+                    continue
+                self._usage[name] += usage - self._tag_usage.get(tag_id, 0)
+                self._tag_usage[tag_id] = usage
+                self._invalidate(name)
+
+    def suggest(self, prefix: str, limit: int = 20) -> List[str]:
+        with self._lock:
+            node = self._root
+            for char in prefix.lower():
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            if limit > self.depth:
+                return self._rank(self._subtree_names(node))[:limit]
+            return self._top(node)[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"tags": len(self._ids), "names": len(self._usage), "lookups": self.lookups, "misses": self.misses}
+
+    def _add(self, tag_id: int, name: str, path: str) -> None:
+        self._ids[(name, path)] = tag_id
+        self._names[tag_id] = name
+        if name in self._usage:
+            return
+        self._usage[name] = 0
+        node = self._root
+        node.top = None
+        for char in name.lower():
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _TrieNode()
+            node = child
+            node.top = None
+        node.names.add(name)
+
+    def _invalidate(self, name: str) -> None:
+        node = self._root
+        node.top = None
+        for char in name.lower():
+            node = node.children[char]
+            node.top = None
+
+    def _rank_key(self, name: str) -> Tuple[int, str]:
+        return -self._usage[name], name
+
+    def _rank(self, names: Iterable[str]) -> List[str]:
+        return sorted(names, key=self._rank_key)
+
+    def _top(self, node: _TrieNode) -> List[str]:
+        # Children's lists are already ranked, so merging stops after `depth` names.
+        if node.top is None:
+            ranked = [self._rank(node.names)] if node.names else []
+            ranked.extend(self._top(child) for child in node.children.values())
+            if len(ranked) == 1:
+                node.top = ranked[0][: self.depth]
+            else:
+                node.top = list(islice(heapq.merge(*ranked, key=self._rank_key), self.depth))
+        return node.top
+
+    def _subtree_names(self, node: _TrieNode) -> List[str]:
+        names: List[str] = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            names.extend(current.names)
+            stack.extend(current.children.values())
+        return names
@@ -1,22 +1,184 @@
 from __future__ import annotations
 
 import os
+import queue
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+
+from .fts import FTS_SYNC_MODES, flush_dirty
+from .heads import flush_heads
+from .migrations import migrate
+from .neardup import flush_minhash
 
 
 APP_DIR = Path(__file__).resolve().parent
 BACKEND_DIR = APP_DIR.parent
 PROJECT_ROOT = BACKEND_DIR.parent
 
+DEFAULT_POOL_SIZE = 4
+# Idle connections older than this are pinged before being handed out again.
+HEALTH_CHECK_INTERVAL = 30.0
+
+
+def default_pool_size() -> int:
+    """Read the reader pool size from `DB_POOL_SIZE`, falling back to the default."""
+
+    if pool_env := os.environ.get("DB_POOL_SIZE"):
+        return max(0, int(pool_env))
+    return DEFAULT_POOL_SIZE
+
+
+# PRAGMAs applied to every new connection, selected with `DB_STORAGE_PROFILE`.
+# `wal_checkpoint_interval` is not a PRAGMA: it is the number of seconds between
+# passive WAL checkpoints issued after a commit.
+STORAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    # SQLite defaults: rollback journal, synchronous=FULL.
+    "default": {},
+    # Readers no longer block on writers; a crash may lose the last commits
+    # but never corrupts the file.
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "wal_checkpoint_interval": 60.0,
+    },
+}
+
+
+def default_storage_profile() -> str:
+    return os.environ.get("DB_STORAGE_PROFILE") or "default"
+
+
+def default_fts_sync() -> str:
+    return os.environ.get("FTS_SYNC") or "transaction"
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections.
+
+    Connections are created lazily up to `size` and are opened with
+    `check_same_thread=False`, so any thread from FastAPI's threadpool can use
+    them as long as only one thread holds a given connection at a time, which
+    `acquire`/`release` guarantee.
+    """
+
+    def __init__(self, factory: Callable[[], sqlite3.Connection], size: int, health_check_interval: float = HEALTH_CHECK_INTERVAL) -> None:
+        self._factory = factory
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self._idle: "queue.LifoQueue[tuple[sqlite3.Connection, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self.evicted = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn, released_at = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+                if time.monotonic() - released_at < self.health_check_interval or _is_healthy(conn):
+                    return conn
+                self._evict(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection, *, broken: bool = False) -> None:
+        try:
+            if broken and not _is_healthy(conn):
+                self._evict(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+    def _open(self) -> sqlite3.Connection:
+        conn = self._factory()
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+            self.evicted += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def _is_healthy(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("SELECT 1;").fetchone()
+        return True
+    except sqlite3.Error:
+        return False
+
 
 class Database:
-    """Simple SQLite helper used across the application."""
+    """Simple SQLite helper used across the application.
+
+    Reads go through a pool of reader connections and writes through a single
+    writer connection serialized by a lock, mirroring SQLite's one-writer model.
+    A thread that already holds a connection reuses it for nested calls.
+    Setting `pool_size=0` opens and closes a connection per call instead.
+    """
 
-    def __init__(self, db_path: os.PathLike[str] | str = "db.sqlite") -> None:
+    def __init__(
+        self,
+        db_path: os.PathLike[str] | str = "db.sqlite",
+        *,
+        pool_size: Optional[int] = None,
+        storage_profile: Optional[str] = None,
+        fts_sync: Optional[str] = None,
+    ) -> None:
         self.db_path = Path(db_path)
+        self.pool_size = default_pool_size() if pool_size is None else pool_size
+        self.storage_profile = storage_profile or default_storage_profile()
+        if self.storage_profile not in STORAGE_PROFILES:
+            raise ValueError(f"unknown storage profile: {self.storage_profile}")
+        self._pragmas = dict(STORAGE_PROFILES[self.storage_profile])
+        self._checkpoint_interval = self._pragmas.pop("wal_checkpoint_interval", None)
+        self._last_checkpoint = time.monotonic()
+        self.fts_sync = fts_sync or default_fts_sync()
+        if self.fts_sync not in FTS_SYNC_MODES:
+            raise ValueError(f"unknown fts sync mode: {self.fts_sync}")
+        # Callables run on the writer cursor right before an outermost commit.
+        self.before_commit: List[Callable[[sqlite3.Cursor], Any]] = []
+        if self.fts_sync == "transaction":
+            self.before_commit.append(flush_dirty)
+        self.before_commit.append(flush_heads)
+        self.before_commit.append(flush_minhash)
+        self._readers = ConnectionPool(self._open, self.pool_size) if self.pool_size > 0 else None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._local = threading.local()
+        # Bumped after every commit that changed rows; read caches key on it.
+        self.generation = 0
 
     def initialize(self, schema_path: os.PathLike[str] | str) -> bool:
         """
@@ -33,34 +195,206 @@ class Database:
         return True
 
     def apply_schema(self, schema_path: os.PathLike[str] | str) -> None:
-        schema_sql = Path(schema_path).read_text(encoding="utf-8")
-        with self.connect() as conn:
-            conn.executescript(schema_sql)
+        self.execute_script(Path(schema_path).read_text(encoding="utf-8"))
+
+    def execute_script(self, sql: str) -> None:
+        """Run a multi-statement script on the writer connection.
+
+        `executescript` commits any pending transaction first, so scripts that
+        must be atomic carry their own `BEGIN`/`COMMIT`.
+        """
 
-    def connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        with self._writer_lock:
+            conn = self._acquire_writer()
+            try:
+                conn.executescript(sql)
+            except Exception:
+                _rollback_quietly(conn)
+                raise
+            finally:
+                if not self._readers:
+                    self._discard_writer()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA foreign_keys = ON;")
+        for name, value in self._pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value};")
         return conn
 
     @contextmanager
-    def transaction(self) -> Iterable[sqlite3.Cursor]:
-        conn = self.connect()
-        cursor = conn.cursor()
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a reader connection (or the thread's current one) for the block.
+
+        Like `sqlite3.Connection` used as a context manager, pending changes are
+        committed on success and rolled back on error.
+        """
+
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._readers.acquire() if self._readers else self._open()
+        self._local.conn = conn
+        broken = False
         try:
-            yield cursor
-            conn.commit()
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except sqlite3.Error:
+            broken = True
+            _rollback_quietly(conn)
+            raise
         except Exception:
-            conn.rollback()
+            _rollback_quietly(conn)
             raise
         finally:
-            conn.close()
+            self._local.conn = None
+            if self._readers:
+                self._readers.release(conn, broken=broken)
+            else:
+                conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Run the block in a write transaction on the shared writer connection.
+
+        The outermost block takes the write lock with `BEGIN IMMEDIATE` and
+        commits on exit. Blocks nested inside it (for example repository calls
+        made within `unit_of_work`) become savepoints of that transaction.
+        """
+
+        held = getattr(self._local, "writer", None)
+        if held is not None:
+            with self._savepoint(held):
+                yield held.cursor()
+            return
+
+        committed: List[Callable[[], Any]] = []
+        with self._writer_lock:
+            conn = self._acquire_writer()
+            outer_reader = getattr(self._local, "conn", None)
+            self._local.writer = conn
+            self._local.conn = conn
+            self._local.depth = 0
+            self._local.after_commit = committed
+            try:
+                conn.execute("BEGIN IMMEDIATE;")
+                changes = conn.total_changes
+                cur = conn.cursor()
+                yield cur
+                for hook in self.before_commit:
+                    hook(cur)
+                conn.commit()
+                if conn.total_changes != changes:
+                    self.generation += 1
+                self._maybe_checkpoint(conn)
+            except Exception as exc:
+                _rollback_quietly(conn)
+                if isinstance(exc, sqlite3.Error) and not _is_healthy(conn):
+                    self._discard_writer()
+                raise
+            finally:
+                self._local.writer = None
+                self._local.conn = outer_reader
+                self._local.after_commit = None
+                if not self._readers:
+                    self._discard_writer()
+        for callback in committed:
+            callback()
+
+    def after_commit(self, callback: Callable[[], Any]) -> None:
+        """Run `callback` once the current write transaction has committed.
+
+        Callbacks registered in a savepoint that rolls back are dropped, and so
+        are all of them if the transaction rolls back. Outside a transaction the
+        callback runs immediately.
+        """
+
+        pending = getattr(self._local, "after_commit", None)
+        if pending is None:
+            callback()
+        else:
+            pending.append(callback)
+
+    def unit_of_work(self) -> ContextManager[sqlite3.Cursor]:
+        """Group every repository call made by this thread into one transaction.
+
+        Repositories keep calling `connect()`/`transaction()` as usual; inside
+        the block they share the writer connection, so the whole unit commits
+        once (one fsync) or rolls back as a whole.
+        """
+
+        return self.transaction()
+
+    @contextmanager
+    def _savepoint(self, conn: sqlite3.Connection) -> Iterator[None]:
+        self._local.depth += 1
+        name = f"sp_{self._local.depth}"
+        conn.execute(f"SAVEPOINT {name};")
+        mark = len(self._local.after_commit)
+        try:
+            yield
+            conn.execute(f"RELEASE {name};")
+        except Exception:
+            del self._local.after_commit[mark:]
+            conn.execute(f"ROLLBACK TO {name};")
+            conn.execute(f"RELEASE {name};")
+            raise
+        finally:
+            self._local.depth -= 1
+
+    def _maybe_checkpoint(self, conn: sqlite3.Connection) -> None:
+        if not self._checkpoint_interval:
+            return
+        now = time.monotonic()
+        if now - self._last_checkpoint >= self._checkpoint_interval:
+            self._last_checkpoint = now
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE);")
+
+    def checkpoint(self, mode: str = "PASSIVE") -> Dict[str, int]:
+        """Copy WAL frames back into the database file (no-op outside WAL mode)."""
+
+        with self._writer_lock:
+            row = self._acquire_writer().execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+            self._last_checkpoint = time.monotonic()
+        return {"busy": row[0], "log_frames": row[1], "checkpointed_frames": row[2]}
+
+    def _acquire_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._open()
+        return self._writer
+
+    def _discard_writer(self) -> None:
+        conn, self._writer = self._writer, None
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def close(self) -> None:
+        """Close every pooled connection; new ones are opened on next use."""
+
+        if self._readers:
+            self._readers.close()
+        with self._writer_lock:
+            self._discard_writer()
 
     def health_check(self) -> None:
         with self.connect() as conn:
             conn.execute("SELECT 1;")
 
 
+def _rollback_quietly(conn: sqlite3.Connection) -> None:
+    try:
+        conn.rollback()
+    except sqlite3.Error:
+        pass
+
+
 def row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
     return {key: row[key] for key in row.keys()}
 
@@ -87,9 +421,14 @@ def default_schema_path() -> Path:
 
 
 def ensure_schema(db: Database, schema_path: Optional[os.PathLike[str] | str] = None) -> bool:
-    """Create the database from the schema if it is not present."""
+    """Create the database if needed and apply pending migrations.
+
+    Returns True if a new database file was created. On an up-to-date database
+    this is a single `schema_version` lookup.
+    """
     schema = schema_path or default_schema_path()
-    created = db.initialize(schema)
-    if not created:
-        db.apply_schema(schema)
-    return created
\ No newline at end of file
+    created = not db.db_path.exists()
+    if created:
+        db.db_path.parent.mkdir(parents=True, exist_ok=True)
+    migrate(db, schema)
+    return created
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .db import Database
+
+
+# How `items_fts` catches up with writes queued in `fts_dirty`:
+# - "transaction": rebuild queued rows right before each outermost commit, so
+#   search always reflects committed data.
+# - "background": leave the queue to `FtsFlusher`; search may lag by one
+#   interval, which keeps large imports from rebuilding rows on every commit.
+FTS_SYNC_MODES = ("transaction", "background")
+
+_FTS_COLUMNS = "rowid, item_id, title, body, tags_text, kind, schema_id, domain"
+# items_fts_trigram mirrors the free-text columns for substring (Japanese) search.
+_TRIGRAM_COLUMNS = "rowid, title, body, tags_text"
+
+_FTS_ROWS = """
+SELECT
+  i.rowid,
+  i.item_id,
+  i.title,
+  i.body,
+  COALESCE((
+    SELECT GROUP_CONCAT(t.name, ' ')
+    FROM item_tags it
+    JOIN tags t ON t.tag_id = it.tag_id
+    WHERE it.item_id = i.item_id
+  ), ''),
+  i.kind,
+  i.schema_id,
+  COALESCE(i.domain, '')
+FROM items i
+"""
+
+
+def flush_dirty(cur: sqlite3.Cursor) -> int:
+    """Rebuild the FTS row of every queued item once; returns the queue length."""
+
+    if cur.execute("SELECT 1 FROM fts_dirty LIMIT 1").fetchone() is None:
+        return 0
+    cur.execute("DELETE FROM items_fts WHERE rowid IN (SELECT item_rowid FROM fts_dirty)")
+    cur.execute("DELETE FROM items_fts_trigram WHERE rowid IN (SELECT item_rowid FROM fts_dirty)")
+    cur.execute(
+        f"INSERT INTO items_fts({_FTS_COLUMNS}) {_FTS_ROWS} JOIN fts_dirty d ON d.item_rowid = i.rowid"
+    )
+    cur.execute(
+        f"INSERT INTO items_fts_trigram({_TRIGRAM_COLUMNS}) SELECT {_TRIGRAM_COLUMNS} FROM items_fts "
+        "WHERE rowid IN (SELECT item_rowid FROM fts_dirty)"
+    )
+    return cur.execute("DELETE FROM fts_dirty").rowcount
+
+
+def rebuild_all(cur: sqlite3.Cursor) -> int:
+    """Regenerate `items_fts` from `items` in one pass (bulk loads, after VACUUM)."""
+
+    cur.execute("DELETE FROM items_fts")
+    cur.execute("DELETE FROM items_fts_trigram")
+    count = cur.execute(f"INSERT INTO items_fts({_FTS_COLUMNS}) {_FTS_ROWS}").rowcount
+    cur.execute(f"INSERT INTO items_fts_trigram({_TRIGRAM_COLUMNS}) SELECT {_TRIGRAM_COLUMNS} FROM items_fts")
+    cur.execute("DELETE FROM fts_dirty")
+    cur.execute("INSERT INTO items_fts(items_fts) VALUES ('optimize')")
+    cur.execute("INSERT INTO items_fts_trigram(items_fts_trigram) VALUES ('optimize')")
+    return count
+
+
+class FtsFlusher:
+    """Daemon thread that drains `fts_dirty` every `interval` seconds."""
+
+    def __init__(self, db: "Database", interval: float = 2.0) -> None:
+        self.db = db
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="fts-flusher", daemon=True)
+            self._thread.start()
+
+    def flush(self) -> int:
+        with self.db.transaction() as cur:
+            return flush_dirty(cur)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+__all__ = ["FTS_SYNC_MODES", "FtsFlusher", "flush_dirty", "rebuild_all"]
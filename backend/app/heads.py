@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import sqlite3
+
+
+# A link (A, supersedes, B) makes A the newer version of B. `item_heads` maps
+# every superseded item to the item its chain currently ends at; items without
+# a row are their own head. Triggers on item_links queue the older side of each
+# changed supersedes link in `heads_dirty`, and `flush_heads` recomputes those
+# items (and everything they supersede) right before each outermost commit.
+#
+# When an item is superseded more than once, the newest link wins. Items on a
+# supersedes cycle are their own head; chains longer than HEAD_MAX_HOPS stop at
+# the item they reached.
+HEAD_MAX_HOPS = 64
+
+FLUSH_HEADS_STATEMENTS = (
+    # Everything older than a queued item may have its chain run through it.
+    """
+    WITH RECURSIVE older(item_id) AS (
+      SELECT item_id FROM heads_dirty
+      UNION
+      SELECT l.target_key FROM older o
+      JOIN item_links l ON l.item_id = o.item_id AND l.rel = 'supersedes'
+    )
+    INSERT INTO heads_dirty(item_id) SELECT item_id FROM older WHERE true ON CONFLICT DO NOTHING
+    """,
+    "DELETE FROM item_heads WHERE item_id IN (SELECT item_id FROM heads_dirty)",
+    f"""
+    WITH RECURSIVE chain(item_id, node, hops) AS (
+      SELECT item_id, item_id, 0 FROM heads_dirty
+      UNION ALL
+      SELECT c.item_id, l.item_id, c.hops + 1 FROM chain c
+      JOIN item_links l ON l.rowid = (
+        SELECT n.rowid FROM item_links n
+        WHERE n.target_key = c.node AND n.rel = 'supersedes'
+        ORDER BY n.created_at DESC, n.rowid DESC LIMIT 1
+      )
+      WHERE c.hops < {HEAD_MAX_HOPS} AND (c.hops = 0 OR c.node != c.item_id)
+    )
+    INSERT INTO item_heads(item_id, head_id)
+    SELECT item_id, node FROM (
+      SELECT item_id, node, row_number() OVER (PARTITION BY item_id ORDER BY hops DESC) AS rn FROM chain
+    )
+    WHERE rn = 1 AND node != item_id
+    """,
+)
+
+
+def flush_heads(cur: sqlite3.Cursor) -> int:
+    """Recompute the heads of queued items; returns how many were recomputed."""
+
+    if cur.execute("SELECT 1 FROM heads_dirty LIMIT 1").fetchone() is None:
+        return 0
+    for statement in FLUSH_HEADS_STATEMENTS:
+        cur.execute(statement)
+    return cur.execute("DELETE FROM heads_dirty").rowcount
+
@@ -0,0 +1,640 @@
+"""Create import jobs from extraction JSON without holding the whole document.
+
+An extraction is `{"source": ..., "classification": ..., "items": [...]}` or
+`{"chunks": [{"source": ..., "classification": ..., "items": [...]}, ...]}`,
+optionally wrapped as `{"extraction": {...}}` like the `POST /import/jobs`
+body. `iter_extraction` walks such a document from a file or upload stream and
+yields one chunk (or item) at a time; `ExtractionImporter` writes chunk
+sources and candidates in `executemany` batches as they arrive.
+
+`commit_import_job` turns a reviewed job into items, and `CommitExecutor`
+runs those commits in the background.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+from .cache import TagCache
+from .db import Database
+from .import_utils import compute_digest, compute_thread_id
+from .repositories import ImportRepo, ItemsRepo, LinksRepo, TagsRepo
+
+
+DEFAULT_BATCH_SIZE = 500
+COMMIT_BATCH_SIZE = 500
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+
+class _JsonReader:
+    """Incremental reader that decodes one JSON value at a time from a stream.
+
+    Values are decoded with `json.JSONDecoder.raw_decode`; when a value runs
+    past the buffered text, more is read and the value is decoded again. Reads
+    grow with the pending value so very large values stay linear.
+    """
+
+    _WHITESPACE = " \t\r\n"
+
+    def __init__(self, stream: IO[Any], block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        self._stream = stream
+        self._block_size = block_size
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.bytes_read = 0
+
+    def _fill(self, size: int) -> bool:
+        if self._eof:
+            return False
+        if self._pos:
+            self._buf = self._buf[self._pos :]
+            self._pos = 0
+        block = self._stream.read(size)
+        if not block:
+            self._eof = True
+            self._buf += self._text_decoder.decode(b"", final=True)
+            return False
+        if isinstance(block, bytes):
+            self.bytes_read += len(block)
+            block = self._text_decoder.decode(block)
+        else:
+            self.bytes_read += len(block.encode("utf-8"))
+        self._buf += block
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in self._WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill(self._block_size):
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected {char!r} at byte {self.bytes_read}, found {found!r}")
+        self._pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill(max(self._block_size, len(self._buf) - self._pos)):
+                    continue
+                raise
+            # A number at the very end of the buffer may continue in the next block.
+            if end == len(self._buf) and self._fill(self._block_size):
+                continue
+            self._pos = end
+            return value
+
+
+def iter_extraction(stream: IO[Any], *, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[Tuple[str, Any]]:
+    """Yield `("chunk", chunk)` / `("item", item)` events between `("header", fields)` events.
+
+    The header holds every other key of the extraction (`source`,
+    `classification`, ...), so only one chunk is decoded at a time. It is
+    yielded before the array with the keys seen so far and again at the end,
+    complete; keys after the array only appear in the last one.
+    """
+
+    return _iter_events(_JsonReader(stream, block_size))
+
+
+def _iter_events(reader: _JsonReader) -> Iterator[Tuple[str, Any]]:
+    header: Dict[str, Any] = {}
+    reader.expect("{")
+    yield from _walk_object(reader, header, wrapped=False)
+    if reader.peek():
+        raise ValueError("unexpected data after the extraction document")
+    yield "header", header
+
+
+def _walk_object(reader: _JsonReader, header: Dict[str, Any], *, wrapped: bool) -> Iterator[Tuple[str, Any]]:
+    if reader.peek() == "}":
+        reader.expect("}")
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key in ("chunks", "items") and reader.peek() == "[":
+            # Hand out the keys seen so far (usually `source`) before the array.
+            yield "header", header
+            reader.expect("[")
+            event = key[:-1]
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield event, reader.value()
+                    if reader.peek() == ",":
+                        reader.expect(",")
+                    else:
+                        reader.expect("]")
+                        break
+        elif key == "extraction" and not wrapped and reader.peek() == "{":
+            reader.expect("{")
+            yield from _walk_object(reader, header, wrapped=True)
+        else:
+            header[key] = reader.value()
+        if reader.peek() == ",":
+            reader.expect(",")
+        else:
+            reader.expect("}")
+            return
+
+
+def _events_from_extraction(extraction: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    chunks = extraction.get("chunks")
+    yield "header", {k: v for k, v in extraction.items() if k not in ("chunks", "items")}
+    if chunks:
+        for chunk in chunks:
+            yield "chunk", chunk
+    else:
+        for item in extraction.get("items", []):
+            yield "item", item
+
+
+def normalize_chunk_source(source: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill in `thread_id` and `digest` the way the commit step will look them up."""
+
+    messages = source.get("messages") or []
+    thread_id = source.get("thread_id") or (compute_thread_id(messages) if messages else None)
+    turn_range = source.get("locator", {}).get("turn_range", {}) or source.get("turn_range", {})
+    digest = source.get("digest") or (compute_digest(thread_id, turn_range) if thread_id else None)
+    return {**source, "thread_id": thread_id, "digest": digest}
+
+
+@dataclass
+class ImportProgress:
+    job_id: str
+    chunks: int = 0
+    candidates: int = 0
+    bytes_read: int = 0
+
+
+class ExtractionImporter:
+    """Turn an extraction into an import job and its candidates.
+
+    Chunk sources go to `import_job_chunks` and candidates to
+    `import_candidates`, flushed every `batch_size` rows, so memory stays
+    bounded by one batch plus the chunk being decoded. A failed import deletes
+    the partial job.
+    """
+
+    def __init__(
+        self,
+        repo: ImportRepo,
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress: Optional[Callable[[ImportProgress], None]] = None,
+    ) -> None:
+        self.repo = repo
+        self.batch_size = batch_size
+        self.progress = progress
+
+    def import_extraction(self, extraction: Dict[str, Any], *, job_id: Optional[str] = None) -> ImportProgress:
+        return self._run(_events_from_extraction(extraction), job_id=job_id)
+
+    def import_stream(self, stream: IO[Any], *, job_id: Optional[str] = None) -> ImportProgress:
+        reader = _JsonReader(stream)
+        return self._run(_iter_events(reader), job_id=job_id, reader=reader)
+
+    def _run(
+        self,
+        events: Iterable[Tuple[str, Any]],
+        *,
+        job_id: Optional[str],
+        reader: Optional[_JsonReader] = None,
+    ) -> ImportProgress:
+        state = ImportProgress(job_id=job_id or f"job-{uuid.uuid4()}")
+        header: Dict[str, Any] = {}
+        chunk_rows: List[Tuple[int, Dict[str, Any]]] = []
+        candidate_rows: List[Dict[str, Any]] = []
+        created = False
+        job_fields: Dict[str, Any] = {}
+        # The classification the item candidates were given their defaults from.
+        item_classification: Optional[Dict[str, Any]] = None
+
+        def ensure_job(source: Dict[str, Any], source_json: Dict[str, Any]) -> None:
+            nonlocal created
+            if created:
+                return
+            job_fields.update(_job_fields(source, source_json))
+            self.repo.create_job(job_id=state.job_id, **job_fields)
+            created = True
+
+        def flush() -> None:
+            with self.repo.db.unit_of_work():
+                self.repo.add_job_chunks(state.job_id, chunk_rows)
+                self.repo.add_candidates(state.job_id, candidate_rows)
+            state.candidates += len(candidate_rows)
+            chunk_rows.clear()
+            candidate_rows.clear()
+            if reader is not None:
+                state.bytes_read = reader.bytes_read
+            if self.progress:
+                self.progress(state)
+
+        try:
+            for kind, value in events:
+                if kind == "header":
+                    header = value
+                    continue
+                if kind == "chunk":
+                    # Chunk sources live in import_job_chunks, not in the job row.
+                    source = normalize_chunk_source(value.get("source", {}))
+                    ensure_job(source, {"chunks": []})
+                    chunk_rows.append((state.chunks, source))
+                    classification = value.get("classification", {})
+                    candidate_rows.extend(_candidate(item, classification, state.chunks) for item in value.get("items", []))
+                    state.chunks += 1
+                else:
+                    source = header.get("source", {})
+                    ensure_job(source, source)
+                    if item_classification is None:
+                        item_classification = header.get("classification", {})
+                    candidate_rows.append(_candidate(value, item_classification, 0))
+                if len(candidate_rows) + len(chunk_rows) >= self.batch_size:
+                    flush()
+            source = header.get("source", {})
+            ensure_job(source, source)
+            flush()
+            if not state.chunks:
+                # A streamed document may put `source` or `classification`
+                # after its items array; the job row and the candidates were
+                # written from the keys seen before it.
+                with self.repo.db.unit_of_work():
+                    if _job_fields(source, source) != job_fields:
+                        self.repo.update_job_source(state.job_id, **_job_fields(source, source))
+                    classification = header.get("classification", {})
+                    if item_classification is not None and classification != item_classification:
+                        self.repo.apply_classification(state.job_id, classification)
+        except Exception:
+            if created:
+                self.repo.delete_job(state.job_id)
+            raise
+        return state
+
+
+def _job_fields(source: Dict[str, Any], source_json: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "source_json": source_json,
+        "source_type": source.get("source_type", "chatgpt_export_json"),
+        "thread_id": source.get("thread_id"),
+        "chunk_id": source.get("chunk_id"),
+        "digest": source.get("digest"),
+        "hint": source.get("hint"),
+    }
+
+
+def _candidate(item: Dict[str, Any], classification: Dict[str, Any], chunk_index: int) -> Dict[str, Any]:
+    return {
+        "candidate_id": f"cand-{uuid.uuid4()}",
+        "temp_item_id": item.get("item_id", f"temp-{uuid.uuid4()}"),
+        "item_json": {**item, "_chunk_index": chunk_index},
+        "decision": item.get("decision", classification.get("decision", "KEEP")),
+        "skip_type": item.get("skip_type", classification.get("skip_type", "NONE")),
+        "reason": item.get("reason", classification.get("reason")),
+    }
+
+
+class ImportCommitError(Exception):
+    """A job that cannot be committed; `detail` is the API error code."""
+
+    def __init__(self, detail: str, status_code: int = 400) -> None:
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def commit_import_job(
+    db: Database,
+    job_id: str,
+    *,
+    tag_cache: Optional[TagCache] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> Dict[str, Any]:
+    """Turn the KEEP candidates of a job into items, tags and links.
+
+    Candidates are written `COMMIT_BATCH_SIZE` at a time through the bulk
+    repository methods. `progress(processed, total)` is called and
+    `cancelled()` is polled between batches; cancelling rolls the whole job
+    back.
+    """
+
+    repo = ImportRepo(db)
+    items_repo = ItemsRepo(db)
+    tags_repo = TagsRepo(db, cache=tag_cache)
+    links_repo = LinksRepo(db)
+    # One transaction for the whole job: a failure leaves nothing half-committed.
+    with db.unit_of_work():
+        job = repo.get_job(job_id)
+        if not job:
+            raise ImportCommitError("job_not_found", status_code=404)
+        if job.get("status") == "committed":
+            raise ImportCommitError("already_committed")
+
+        candidates = repo.list_candidates(job_id)
+        keep_candidates = [json.loads(c["item_json"]) for c in candidates if c["decision"] == "KEEP"]
+        id_map: Dict[str, str] = {}
+        inserted = 0
+        updated = 0
+        source_payload = job.get("source_json")
+        if isinstance(source_payload, str):
+            try:
+                source_payload = json.loads(source_payload)
+            except json.JSONDecodeError:
+                source_payload = {}
+        source_payload = source_payload or {}
+        chunks = repo.list_job_chunks(job_id) or source_payload.get("chunks")
+        if not chunks:
+            chunks = [{"source": source_payload}]
+        chunk_id_map: Dict[int, str] = {}
+        for start in range(0, len(keep_candidates), COMMIT_BATCH_SIZE):
+            if cancelled and cancelled():
+                raise ImportCommitError("commit_cancelled", status_code=409)
+            if progress:
+                progress(start, len(keep_candidates))
+            batch = keep_candidates[start : start + COMMIT_BATCH_SIZE]
+            rows = []
+            for item_payload in batch:
+                try:
+                    chunk_index = int(item_payload.get("_chunk_index", 0))
+                except (TypeError, ValueError):
+                    chunk_index = 0
+                if chunk_index not in chunk_id_map:
+                    chunk_source = chunks[chunk_index].get("source", {}) if chunk_index < len(chunks) else {}
+                    chunk_id = chunk_source.get("chunk_id") or f"chunk-{uuid.uuid4()}"
+                    chunk_id = items_repo.ensure_chunk_for_item(chunk_id, {**chunk_source, "chunk_id": chunk_id})
+                    chunk_id_map[chunk_index] = chunk_id
+                rows.append(
+                    {
+                        "item_id": f"item-{uuid.uuid4()}",
+                        "chunk_id": chunk_id_map[chunk_index],
+                        "kind": item_payload["kind"],
+                        "schema_id": item_payload["schema_id"],
+                        "title": item_payload["title"],
+                        "body": item_payload["body"],
+                        "stable_key": item_payload.get("stable_key"),
+                        "domain": item_payload.get("domain"),
+                        "confidence": item_payload.get("confidence", 0.0),
+                        "status": "active",
+                        "evidence_basis": json.dumps(item_payload.get("evidence", {})),
+                        "payload": item_payload.get("payload", {}),
+                    }
+                )
+
+            # Stateful items with a known stable_key update the existing row in place.
+            survivors = items_repo.upsert_items(rows)
+            item_tags: Dict[str, Any] = {}
+            batch_ids: Dict[str, str] = {}
+            for item_payload, row in zip(batch, rows):
+                item_id = survivors[row["item_id"]]
+                if item_id == row["item_id"]:
+                    inserted += 1
+                else:
+                    updated += 1
+                item_tags[item_id] = item_payload.get("tags", [])
+                if item_payload.get("item_id") is not None:
+                    batch_ids[item_payload["item_id"]] = item_id
+            tags_repo.replace_tags_bulk(item_tags)
+            repo.map_temp_ids(job_id, batch_ids)
+            id_map.update(batch_ids)
+
+        links = []
+        for item_payload in keep_candidates:
+            source_new_id = id_map.get(item_payload.get("item_id"))
+            if not source_new_id:
+                continue
+            for link in item_payload.get("links", []):
+                target_temp = link.get("target_key") or link.get("target_item_id")
+                links.append(
+                    {
+                        "link_id": f"link-{uuid.uuid4()}",
+                        "item_id": source_new_id,
+                        "rel": link["rel"],
+                        "target_key": id_map.get(target_temp, target_temp),
+                        "note": link.get("note"),
+                        "confidence": link.get("confidence", 0.0),
+                    }
+                )
+        links_repo.create_links_bulk(links)
+
+        if progress:
+            progress(len(keep_candidates), len(keep_candidates))
+        repo.mark_job_status(job_id, status="committed")
+        return {
+            "ok": True,
+            "inserted": inserted,
+            "updated": updated,
+            "skipped": len(candidates) - len(keep_candidates),
+            "links_created": len(links),
+            "warnings": [],
+        }
+
+
+# Background commit states recorded in import_jobs.commit_state.
+COMMIT_PENDING_STATES = ("queued", "running")
+_OWNER_INFIX = ".commit-"
+
+
+def _lock_nowait(handle: IO[bytes]) -> bool:
+    """Lock an open file exclusively; False when another holder has it."""
+
+    handle.seek(0)
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:  # pragma: no cover - Windows
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class CommitExecutor:
+    """Run import commits on a single background thread, one job at a time.
+
+    One worker keeps queued jobs from competing for SQLite's write lock. The
+    running job holds that lock until its single transaction ends, so every
+    write to `import_jobs` happens on the worker thread between jobs: the
+    `queued` state and the cancellation of a job that never started are kept in
+    memory until then, and `submit` and `cancel` never wait for another job's
+    commit. Final states, counts and errors are recorded on `import_jobs`; the
+    processed count of the running job is also kept in memory, because other
+    connections cannot see into its transaction.
+
+    Several processes (uvicorn `--workers`, a rolling restart) may share the
+    database; each executor records itself as `commit_owner` and holds a lock
+    on `<db>.commit-<owner>.lock` while it lives. On start, only the pending
+    commits whose owner's lock is free (the process is gone) are marked
+    failed. Progress and cancel only reach commits of this process.
+    """
+
+    def __init__(self, db: Database, tag_cache: Optional[TagCache] = None) -> None:
+        self.db = db
+        self.tag_cache = tag_cache
+        self.repo = ImportRepo(db)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="import-commit")
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._live: Dict[str, Tuple[int, int]] = {}
+        # commit_state of jobs the worker has not recorded yet.
+        self._states: Dict[str, str] = {}
+        self.owner = uuid.uuid4().hex
+        self._lease = self._owner_path(self.owner).open("a+b")
+        _lock_nowait(self._lease)
+        # Jobs queued or running when their process stopped never finished.
+        live = self._live_owners()
+        stale = [owner for owner in self.repo.pending_commit_owners(COMMIT_PENDING_STATES) if owner not in live]
+        if stale:
+            self.repo.fail_pending_commits(COMMIT_PENDING_STATES, error="interrupted", owners=stale)
+
+    def is_pending(self, job_id: str) -> bool:
+        with self._lock:
+            future = self._futures.get(job_id)
+            return future is not None and not future.done()
+
+    def submit(self, job_id: str) -> None:
+        job = self.repo.get_job(job_id)
+        if not job:
+            raise ImportCommitError("job_not_found", status_code=404)
+        if job.get("status") == "committed":
+            raise ImportCommitError("already_committed")
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future is not None and not future.done():
+                raise ImportCommitError("commit_in_progress", status_code=409)
+            self._states[job_id] = "queued"
+            cancel_event = threading.Event()
+            self._cancel_events[job_id] = cancel_event
+            self._futures[job_id] = self._executor.submit(self._run, job_id, cancel_event)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running commit; False when there is none."""
+
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future is None or future.done():
+                return False
+            self._cancel_events[job_id].set()
+            if not future.cancel():
+                return True  # running: the worker rolls back before its next batch
+            self._forget(job_id)
+            self._states[job_id] = "cancelled"
+            self._executor.submit(self._record_cancelled, job_id)
+        return True
+
+    def progress(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.repo.get_job(job_id)
+        if not job:
+            return None
+        state = job.get("commit_state")
+        processed, total = job.get("commit_processed") or 0, job.get("commit_total") or 0
+        error, result = job.get("commit_error"), job.get("commit_result")
+        with self._lock:
+            if job_id in self._states:
+                state, processed, total, error, result = self._states[job_id], 0, 0, None, None
+            elif state == "running" and job_id in self._live:
+                processed, total = self._live[job_id]
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "commit_state": state,
+            "processed": processed,
+            "total": total,
+            "error": error,
+            "result": json.loads(result) if result else None,
+        }
+
+    def shutdown(self) -> None:
+        """Cancel queued commits and wait for the running one to finish."""
+
+        with self._lock:
+            queued = [job_id for job_id, future in self._futures.items() if not future.running()]
+        for job_id in queued:
+            self.cancel(job_id)
+        self._executor.shutdown(wait=True)
+        if not self._lease.closed:
+            self._lease.close()
+            self._owner_path(self.owner).unlink(missing_ok=True)
+
+    def _run(self, job_id: str, cancel_event: threading.Event) -> None:
+        self.repo.set_commit_state(job_id, "running", processed=0, total=0, owner=self.owner)
+        with self._lock:
+            self._states.pop(job_id, None)
+
+        def report(processed: int, total: int) -> None:
+            with self._lock:
+                self._live[job_id] = (processed, total)
+
+        try:
+            result = commit_import_job(self.db, job_id, tag_cache=self.tag_cache, progress=report, cancelled=cancel_event.is_set)
+        except Exception as exc:
+            with self._lock:
+                processed, total = self._live.get(job_id, (0, 0))
+            if isinstance(exc, ImportCommitError) and exc.detail == "commit_cancelled":
+                self.repo.set_commit_state(job_id, "cancelled", processed=processed, total=total)
+            else:
+                error = exc.detail if isinstance(exc, ImportCommitError) else f"{type(exc).__name__}: {exc}"
+                self.repo.set_commit_state(job_id, "failed", processed=processed, total=total, error=error)
+        else:
+            kept = result["inserted"] + result["updated"]
+            self.repo.set_commit_state(job_id, "committed", processed=kept, total=kept, result=result)
+        finally:
+            with self._lock:
+                self._forget(job_id)
+
+    def _owner_path(self, owner: str) -> Path:
+        return self.db.db_path.with_name(f"{self.db.db_path.name}{_OWNER_INFIX}{owner}.lock")
+
+    def _live_owners(self) -> Set[str]:
+        """Owners whose lock file is still held; the files of the others are removed."""
+
+        live = {self.owner}
+        prefix = self.db.db_path.name + _OWNER_INFIX
+        for path in self.db.db_path.parent.iterdir():
+            owner = path.name[len(prefix) : -len(".lock")]
+            if not path.name.startswith(prefix) or not path.name.endswith(".lock") or owner == self.owner:
+                continue
+            with path.open("a+b") as handle:
+                if not _lock_nowait(handle):
+                    live.add(owner)
+                    continue
+            path.unlink(missing_ok=True)
+        return live
+
+    def _record_cancelled(self, job_id: str) -> None:
+        self.repo.set_commit_state(job_id, "cancelled", processed=0, total=0)
+        with self._lock:
+            # Unless the job was submitted again in the meantime.
+            if self._states.get(job_id) == "cancelled":
+                del self._states[job_id]
+
+    def _forget(self, job_id: str) -> None:
+        self._futures.pop(job_id, None)
+        self._cancel_events.pop(job_id, None)
+        self._live.pop(job_id, None)
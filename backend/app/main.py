@@ -2,22 +2,46 @@ from __future__ import annotations
 
 import json
 import os
+import tempfile
 import uuid
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
+from .cache import SearchCache, TagCache, default_search_cache_size, default_search_cache_ttl
 from .db import Database, ensure_schema, default_schema_path
-from .import_utils import compute_digest, compute_thread_id
-from .repositories import ImportRepo, ItemsRepo, LinksRepo, RawJsonRepo, SearchRepo, SpeakerRepo, TagsRepo
+from .fts import FtsFlusher
+from .importer import CommitExecutor, ExtractionImporter, ImportCommitError, commit_import_job
+from .repositories import (
+    GRAPH_MAX_DEPTH,
+    GRAPH_NODE_LIMIT,
+    SEARCH_TOTAL_CAP,
+    SNIPPET_MAX_TOKENS,
+    ImportRepo,
+    InvalidQueryError,
+    ItemsRepo,
+    LinksRepo,
+    RawJsonRepo,
+    SearchRepo,
+    SpeakerRepo,
+    TagsRepo,
+    default_bm25_weights,
+)
+from .vectors import VectorIndex, default_vector_search
 
 
 APP_DIR = Path(__file__).resolve().parent
 BACKEND_DIR = APP_DIR.parent
 PROJECT_ROOT = BACKEND_DIR.parent
 
+# Upper bound on ids per `POST /items:batch_get` call.
+BATCH_GET_LIMIT = 500
+# Streamed import uploads larger than this are spooled to a temporary file.
+IMPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
 
 def default_db_path() -> Path:
     """Determine the DB path from env or fall back to project storage."""
@@ -27,12 +51,18 @@ def default_db_path() -> Path:
     return PROJECT_ROOT / "data" / "app.db"
 
 def create_app(
-    *, db_path: Optional[str] = None, schema_path: Optional[str] = None
+    *,
+    db_path: Optional[str] = None,
+    schema_path: Optional[str] = None,
+    pool_size: Optional[int] = None,
+    storage_profile: Optional[str] = None,
+    fts_sync: Optional[str] = None,
+    search_cache_size: Optional[int] = None,
 ) -> FastAPI:
     database_path = Path(db_path) if db_path else default_db_path()
     schema_file = Path(schema_path) if schema_path else default_schema_path()
 
-    db = Database(database_path)
+    db = Database(database_path, pool_size=pool_size, storage_profile=storage_profile, fts_sync=fts_sync)
     ensure_schema(db, schema_file)
 
     app = FastAPI(title="Tool Dictionary Report API")
@@ -44,18 +74,39 @@ def create_app(
         allow_headers=["*"],
     )
     app.state.db = db
+    cache_size = default_search_cache_size() if search_cache_size is None else search_cache_size
+    app.state.search_cache = SearchCache(cache_size, default_search_cache_ttl()) if cache_size > 0 else None
+    app.state.bm25_weights = default_bm25_weights()
+    app.state.vector_index = None
+    if default_vector_search():
+        app.state.vector_index = VectorIndex(db)
+        app.router.on_shutdown.append(app.state.vector_index.close)
+    app.state.tag_cache = TagCache()
+    TagsRepo(db, cache=app.state.tag_cache).warm_cache()
+    if db.fts_sync == "background":
+        flusher = FtsFlusher(db)
+        app.router.on_startup.append(flusher.start)
+        app.router.on_shutdown.append(flusher.stop)
+    app.state.commit_executor = CommitExecutor(db, tag_cache=app.state.tag_cache)
+    app.router.on_shutdown.append(app.state.commit_executor.shutdown)
+    app.router.on_shutdown.append(db.close)
 
     def get_items_repo() -> ItemsRepo:
         return ItemsRepo(app.state.db)
 
     def get_tags_repo() -> TagsRepo:
-        return TagsRepo(app.state.db)
+        return TagsRepo(app.state.db, cache=app.state.tag_cache)
 
     def get_links_repo() -> LinksRepo:
         return LinksRepo(app.state.db)
 
     def get_search_repo() -> SearchRepo:
-        return SearchRepo(app.state.db)
+        return SearchRepo(
+            app.state.db,
+            cache=app.state.search_cache,
+            weights=app.state.bm25_weights,
+            vectors=app.state.vector_index,
+        )
 
     def get_import_repo() -> ImportRepo:
         return ImportRepo(app.state.db)
@@ -74,21 +125,51 @@ def create_app(
         except Exception as exc:  # pragma: no cover - defensive path
             raise HTTPException(status_code=503, detail="database_error") from exc
 
+    @app.get("/metrics")
+    def metrics() -> Dict[str, Any]:
+        cache = app.state.search_cache
+        return {
+            "db_generation": app.state.db.generation,
+            "search_cache": cache.stats() if cache else None,
+            "tag_cache": app.state.tag_cache.stats(),
+        }
+
     @app.get("/items/{item_id}")
     def get_item(
         item_id: str,
+        fields: Optional[str] = None,
+        include_links: bool = False,
         items: ItemsRepo = Depends(get_items_repo),
-        tags: TagsRepo = Depends(get_tags_repo),
     ) -> Dict[str, Any]:
-        item = items.get_item(item_id)
+        fields_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        try:
+            item = items.get_item_detail(item_id, fields=fields_list, include_links=include_links)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="invalid_fields") from exc
         if not item:
             raise HTTPException(status_code=404, detail="item_not_found")
-
-        payload = items.get_payload(item_id)
-        item_tags = tags.get_tags_for_item(item_id)
-        item.update({"payload": payload, "tags": item_tags})
         return {"item": item}
 
+    @app.post("/items:batch_get")
+    def batch_get_items(body: Dict[str, Any], items: ItemsRepo = Depends(get_items_repo)) -> Dict[str, Any]:
+        ids = body.get("ids")
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            raise HTTPException(status_code=400, detail="invalid_ids")
+        if len(ids) > BATCH_GET_LIMIT:
+            raise HTTPException(status_code=400, detail="too_many_ids")
+        include = set(body.get("include") or [])
+        try:
+            found = items.get_items(
+                ids,
+                fields=body.get("fields"),
+                include_payload="payload" in include,
+                include_tags="tags" in include,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="invalid_fields") from exc
+        found_ids = {item["item_id"] for item in found}
+        return {"items": found, "missing": [i for i in dict.fromkeys(ids) if i not in found_ids]}
+
     @app.post("/items")
     def create_item(
         payload: Dict[str, Any],
@@ -97,23 +178,24 @@ def create_app(
     ) -> Dict[str, str]:
         item_id = f"item-{uuid.uuid4()}"
         chunk_id = payload.get("chunk_id") or f"chunk-{uuid.uuid4()}"
-        chunk_id = items.ensure_chunk_for_item(chunk_id, payload)
-
-        items.create_item(
-            item_id=item_id,
-            chunk_id=chunk_id,
-            kind=payload["kind"],
-            schema_id=payload["schema_id"],
-            title=payload["title"],
-            body=payload["body"],
-            stable_key=payload.get("stable_key"),
-            domain=payload.get("domain"),
-            confidence=payload.get("confidence", 0.0),
-            status="active",
-            evidence_basis=json.dumps(payload.get("evidence", {})),
-        )
-        items.add_payload(item_id, payload.get("payload", {}))
-        tags.replace_item_tags(item_id, payload.get("tags", []))
+        with items.db.unit_of_work():
+            chunk_id = items.ensure_chunk_for_item(chunk_id, payload)
+
+            items.create_item(
+                item_id=item_id,
+                chunk_id=chunk_id,
+                kind=payload["kind"],
+                schema_id=payload["schema_id"],
+                title=payload["title"],
+                body=payload["body"],
+                stable_key=payload.get("stable_key"),
+                domain=payload.get("domain"),
+                confidence=payload.get("confidence", 0.0),
+                status="active",
+                evidence_basis=json.dumps(payload.get("evidence", {})),
+            )
+            items.add_payload(item_id, payload.get("payload", {}))
+            tags.replace_item_tags(item_id, payload.get("tags", []))
         return {"item_id": item_id}
 
     @app.put("/items/{item_id}")
@@ -123,37 +205,75 @@ def create_app(
         items: ItemsRepo = Depends(get_items_repo),
         tags: TagsRepo = Depends(get_tags_repo),
     ) -> Dict[str, bool]:
-        if not items.get_item(item_id):
-            raise HTTPException(status_code=404, detail="item_not_found")
-
-        items.update_item(
-            item_id=item_id,
-            kind=payload["kind"],
-            schema_id=payload["schema_id"],
-            title=payload["title"],
-            body=payload["body"],
-            stable_key=payload.get("stable_key"),
-            domain=payload.get("domain"),
-            confidence=payload.get("confidence", 0.0),
-            status=payload.get("status"),
-            evidence_basis=json.dumps(payload.get("evidence", {})),
-        )
-        items.add_payload(item_id, payload.get("payload", {}))
-        tags.replace_item_tags(item_id, payload.get("tags", []))
+        with items.db.unit_of_work():
+            found = items.update_item(
+                item_id=item_id,
+                kind=payload["kind"],
+                schema_id=payload["schema_id"],
+                title=payload["title"],
+                body=payload["body"],
+                stable_key=payload.get("stable_key"),
+                domain=payload.get("domain"),
+                confidence=payload.get("confidence", 0.0),
+                status=payload.get("status"),
+                evidence_basis=json.dumps(payload.get("evidence", {})),
+            )
+            if not found:
+                # Raising inside the unit of work rolls it back.
+                raise HTTPException(status_code=404, detail="item_not_found")
+            items.add_payload(item_id, payload.get("payload", {}))
+            tags.replace_item_tags(item_id, payload.get("tags", []))
         return {"ok": True}
 
     @app.delete("/items/{item_id}")
     def delete_item(item_id: str, items: ItemsRepo = Depends(get_items_repo)) -> Dict[str, bool]:
-        if not items.get_item(item_id):
+        if not items.soft_delete(item_id):
             raise HTTPException(status_code=404, detail="item_not_found")
-        items.soft_delete(item_id)
         return {"ok": True}
 
     @app.get("/items/{item_id}/links")
     def get_links(
-        item_id: str, links: LinksRepo = Depends(get_links_repo)
+        item_id: str,
+        degrees: bool = Query(False, description="Add each target's in- and out-degree"),
+        links: LinksRepo = Depends(get_links_repo),
+    ) -> Dict[str, Any]:
+        return {"links": links.list_links_for_item(item_id, include_targets=True, include_degrees=degrees)}
+
+    @app.get("/items/{item_id}/backlinks")
+    def get_backlinks(
+        item_id: str,
+        rel: Optional[str] = None,
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = None,
+        links: LinksRepo = Depends(get_links_repo),
+    ) -> Dict[str, Any]:
+        try:
+            return links.backlinks(item_id, rel=rel, limit=limit, cursor=cursor)
+        except InvalidQueryError as exc:
+            raise HTTPException(status_code=400, detail=exc.detail) from exc
+
+    @app.get("/items/{item_id}/head")
+    def get_head(item_id: str, links: LinksRepo = Depends(get_links_repo)) -> Dict[str, Any]:
+        head_id = links.head(item_id)
+        return {"item_id": item_id, "head_id": head_id, "superseded": head_id != item_id}
+
+    @app.get("/items/{item_id}/graph")
+    def get_graph(
+        item_id: str,
+        depth: int = Query(2, ge=0, le=GRAPH_MAX_DEPTH),
+        rels: Optional[str] = Query(None, description="Comma-separated link rels to follow; all when omitted"),
+        direction: str = Query("out", description="out, in or both"),
+        limit: int = Query(GRAPH_NODE_LIMIT, ge=1, le=GRAPH_NODE_LIMIT),
+        links: LinksRepo = Depends(get_links_repo),
     ) -> Dict[str, Any]:
-        return {"links": links.list_links_for_item(item_id, include_targets=True)}
+        rels_list = [r.strip() for r in rels.split(",") if r.strip()] if rels else None
+        try:
+            graph = links.graph(item_id, depth=depth, rels=rels_list, direction=direction, limit=limit)
+        except InvalidQueryError as exc:
+            raise HTTPException(status_code=400, detail=exc.detail) from exc
+        if graph is None:
+            raise HTTPException(status_code=404, detail="item_not_found")
+        return graph
 
     @app.post("/items/{item_id}/links")
     def create_link(
@@ -201,6 +321,13 @@ def create_app(
     ) -> Dict[str, List[str]]:
         return {"domains": search.suggest_domains(q, limit=limit)}
 
+    @app.get("/domains")
+    def list_domains(
+        parent: Optional[str] = Query(None, description="Dot path; omit for top-level domains"),
+        search: SearchRepo = Depends(get_search_repo),
+    ) -> Dict[str, Any]:
+        return {"domains": search.domain_children(parent)}
+
     @app.get("/speakers")
     def list_speakers(repo: SpeakerRepo = Depends(get_speaker_repo)) -> Dict[str, Any]:
         return {"speakers": repo.list_speakers()}
@@ -249,24 +376,44 @@ def create_app(
     def search_items(
         q: Optional[str] = None,
         kinds: Optional[str] = None,
-        domain: Optional[str] = None,
-        tags: Optional[str] = None,
-        sort: str = "relevance",
+        domain: Optional[str] = Query(None, description="Exact dot path, or `path.*` for the whole subtree"),
+        tags: Optional[str] = Query(None, description="Comma-separated, all required; `a|b` for either, `-a` to exclude"),
+        heads_only: bool = Query(False, description="Leave out items superseded by a newer version"),
+        mode: str = Query("keyword", description="keyword (FTS), semantic (vector index) or hybrid (both, fused)"),
+        sort: str = Query("relevance", description="relevance, blended, updated_at or created_at"),
         limit: int = Query(20, ge=1, le=100),
         offset: int = Query(0, ge=0),
+        cursor: Optional[str] = None,
+        total_cap: int = Query(SEARCH_TOTAL_CAP, ge=0, description="0 counts every match"),
+        facets: bool = Query(False, description="Also return kind, domain and tag counts"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return per hit"),
+        snippet: Optional[int] = Query(
+            None, ge=1, le=SNIPPET_MAX_TOKENS, description="Return a snippet of about this many tokens instead of body"
+        ),
         search: SearchRepo = Depends(get_search_repo),
     ) -> Dict[str, Any]:
         kinds_list = [k.strip() for k in kinds.split(",") if k.strip()] if kinds else []
         tags_list = [t.strip() for t in tags.split(",") if t.strip()] if tags else []
-        results = search.search_items(
-            query=q,
-            kinds=kinds_list,
-            domain=domain,
-            tags=tags_list,
-            sort=sort,
-            limit=limit,
-            offset=offset,
-        )
+        fields_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        try:
+            results = search.search_items(
+                query=q,
+                kinds=kinds_list,
+                domain=domain,
+                tags=tags_list,
+                heads_only=heads_only,
+                mode=mode,
+                sort=sort,
+                limit=limit,
+                offset=offset,
+                cursor=cursor,
+                total_cap=total_cap or None,
+                facets=facets,
+                fields=fields_list,
+                snippet=snippet,
+            )
+        except InvalidQueryError as exc:
+            raise HTTPException(status_code=400, detail=exc.detail) from exc
         return results
 
     @app.get("/raw-json")
@@ -316,80 +463,27 @@ def create_app(
         if not extraction:
             raise HTTPException(status_code=400, detail="missing_extraction")
 
-        job_id = f"job-{uuid.uuid4()}"
-        chunks = extraction.get("chunks")
-        if chunks:
-            normalized_chunks = []
-            for chunk in chunks:
-                source = chunk.get("source", {})
-                messages = source.get("messages") or []
-                thread_id = source.get("thread_id") or (compute_thread_id(messages) if messages else None)
-                turn_range = source.get("locator", {}).get("turn_range", {}) or source.get("turn_range", {})
-                digest = source.get("digest") or (compute_digest(thread_id, turn_range) if thread_id else None)
-                normalized_chunks.append(
-                    {
-                        **chunk,
-                        "source": {
-                            **source,
-                            "thread_id": thread_id,
-                            "digest": digest,
-                        },
-                    }
-                )
-
-            first_source = normalized_chunks[0].get("source", {}) if normalized_chunks else {}
-            repo.create_job(
-                job_id=job_id,
-                source_json={"chunks": normalized_chunks},
-                source_type=first_source.get("source_type", "chatgpt_export_json"),
-                thread_id=first_source.get("thread_id"),
-                chunk_id=first_source.get("chunk_id"),
-                digest=first_source.get("digest"),
-                hint=first_source.get("hint"),
-            )
-
-            for chunk_index, chunk in enumerate(normalized_chunks):
-                classification = chunk.get("classification", {})
-                for item in chunk.get("items", []):
-                    candidate_id = f"cand-{uuid.uuid4()}"
-                    repo.add_candidate(
-                        candidate_id=candidate_id,
-                        job_id=job_id,
-                        temp_item_id=item.get("item_id", f"temp-{uuid.uuid4()}"),
-                        item_json={**item, "_chunk_index": chunk_index},
-                        decision=item.get("decision", classification.get("decision", "KEEP")),
-                        skip_type=item.get("skip_type", classification.get("skip_type", "NONE")),
-                        reason=item.get("reason", classification.get("reason")),
-                    )
-        else:
-            source = extraction.get("source", {})
-            repo.create_job(
-                job_id=job_id,
-                source_json=source,
-                source_type=source.get("source_type", "chatgpt_export_json"),
-                thread_id=source.get("thread_id"),
-                chunk_id=source.get("chunk_id"),
-                digest=source.get("digest"),
-                hint=source.get("hint"),
-            )
-
-            items = extraction.get("items", [])
-            for item in items:
-                candidate_id = f"cand-{uuid.uuid4()}"
-                repo.add_candidate(
-                    candidate_id=candidate_id,
-                    job_id=job_id,
-                    temp_item_id=item.get("item_id", f"temp-{uuid.uuid4()}"),
-                    item_json={**item, "_chunk_index": 0},
-                    decision=item.get("decision", extraction.get("classification", {}).get("decision", "KEEP")),
-                    skip_type=item.get("skip_type", extraction.get("classification", {}).get("skip_type", "NONE")),
-                    reason=item.get("reason", extraction.get("classification", {}).get("reason")),
-                )
-        return {"job_id": job_id}
+        job = ExtractionImporter(repo).import_extraction(extraction)
+        return {"job_id": job.job_id}
+
+    @app.post("/import/jobs:stream")
+    async def stream_import_job(request: Request, repo: ImportRepo = Depends(get_import_repo)) -> Dict[str, Any]:
+        # Spool the upload (to disk past a few MB) and parse it incrementally
+        # off the event loop, so an export of any size never sits in memory.
+        with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE) as spool:
+            async for block in request.stream():
+                spool.write(block)
+            spool.seek(0)
+            try:
+                job = await run_in_threadpool(ExtractionImporter(repo).import_stream, spool)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail="invalid_extraction") from exc
+        return {"job_id": job.job_id, "chunks": job.chunks, "candidates": job.candidates}
 
     @app.get("/import/jobs/{job_id}")
     def get_import_job(
         job_id: str,
+        near_duplicates: int = Query(3, ge=0, le=20, description="Similar existing items per candidate; 0 skips"),
         repo: ImportRepo = Depends(get_import_repo),
         items_repo: ItemsRepo = Depends(get_items_repo),
         tags_repo: TagsRepo = Depends(get_tags_repo),
@@ -422,8 +516,24 @@ def create_app(
                         "payload": items_repo.get_payload(existing["item_id"]),
                         "tags": tags_repo.get_tags_for_item(existing["item_id"]),
                     }
+        near_duplicate_matches: Dict[str, Any] = {}
+        if near_duplicates:
+            texts = [(c["item"].get("title") or "", c["item"].get("body") or "") for c in parsed_candidates]
+            for cand, hits in zip(parsed_candidates, items_repo.find_near_duplicates(texts, limit=near_duplicates)):
+                if hits:
+                    near_duplicate_matches[cand["candidate_id"]] = hits
         job["source"] = json.loads(job.get("source_json", "{}"))
-        return {"job": job, "candidates": parsed_candidates, "stable_key_matches": stable_key_matches}
+        chunk_sources = repo.list_job_chunks(job_id)
+        if chunk_sources:
+            job["source"]["chunks"] = chunk_sources
+        return {
+            "job": job,
+            "candidates": parsed_candidates,
+            "stable_key_matches": stable_key_matches,
+            "near_duplicate_matches": near_duplicate_matches,
+            # False until `maintenance rebuild-minhash` has signed items from before the index.
+            "near_duplicates_complete": items_repo.near_duplicates_complete(),
+        }
 
     @app.put("/import/jobs/{job_id}/candidates/{candidate_id}")
     def update_candidate(
@@ -444,120 +554,33 @@ def create_app(
         return {"ok": True}
 
     @app.post("/import/jobs/{job_id}/commit")
-    def commit_job(
-        job_id: str,
-        repo: ImportRepo = Depends(get_import_repo),
-        items_repo: ItemsRepo = Depends(get_items_repo),
-        tags_repo: TagsRepo = Depends(get_tags_repo),
-        links_repo: LinksRepo = Depends(get_links_repo),
-    ) -> Dict[str, Any]:
-        job = repo.get_job(job_id)
-        if not job:
+    def commit_job(job_id: str, response: Response, background: bool = False) -> Dict[str, Any]:
+        executor: CommitExecutor = app.state.commit_executor
+        try:
+            if background:
+                executor.submit(job_id)
+                response.status_code = 202
+                return {"ok": True, "job_id": job_id, "commit_state": "queued"}
+            if executor.is_pending(job_id):
+                raise ImportCommitError("commit_in_progress", status_code=409)
+            return commit_import_job(app.state.db, job_id, tag_cache=app.state.tag_cache)
+        except ImportCommitError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
+
+    @app.get("/import/jobs/{job_id}/progress")
+    def get_commit_progress(job_id: str) -> Dict[str, Any]:
+        progress = app.state.commit_executor.progress(job_id)
+        if not progress:
             raise HTTPException(status_code=404, detail="job_not_found")
-        if job.get("status") == "committed":
-            raise HTTPException(status_code=400, detail="already_committed")
+        return progress
 
-        candidates = repo.list_candidates(job_id)
-        keep_candidates = [c for c in candidates if c["decision"] == "KEEP"]
-        id_map: Dict[str, str] = {}
-        inserted = 0
-        updated = 0
-        source_payload = job.get("source_json")
-        if isinstance(source_payload, str):
-            try:
-                source_payload = json.loads(source_payload)
-            except json.JSONDecodeError:
-                source_payload = {}
-        source_payload = source_payload or {}
-        chunks = source_payload.get("chunks")
-        if not chunks:
-            chunks = [{"source": source_payload}]
-        chunk_id_map: Dict[int, str] = {}
-        for cand in keep_candidates:
-            item_payload = json.loads(cand["item_json"])
-            try:
-                chunk_index = int(item_payload.get("_chunk_index", 0))
-            except (TypeError, ValueError):
-                chunk_index = 0
-            if chunk_index not in chunk_id_map:
-                chunk_source = chunks[chunk_index].get("source", {}) if chunk_index < len(chunks) else {}
-                chunk_id = chunk_source.get("chunk_id") or f"chunk-{uuid.uuid4()}"
-                chunk_id = items_repo.ensure_chunk_for_item(chunk_id, {**chunk_source, "chunk_id": chunk_id})
-                chunk_id_map[chunk_index] = chunk_id
-            chunk_id = chunk_id_map[chunk_index]
-            existing_item = None
-            stable_key = item_payload.get("stable_key")
-            if stable_key and item_payload.get("kind") in {"knowledge", "value"}:
-                existing_item = items_repo.find_item_by_stable_key(
-                    stable_key, kind=item_payload.get("kind")
-                )
-
-            if existing_item:
-                item_id = existing_item["item_id"]
-                updated += 1
-                items_repo.update_item(
-                    item_id=item_id,
-                    chunk_id=chunk_id,
-                    kind=item_payload["kind"],
-                    schema_id=item_payload["schema_id"],
-                    title=item_payload["title"],
-                    body=item_payload["body"],
-                    stable_key=item_payload.get("stable_key"),
-                    domain=item_payload.get("domain"),
-                    confidence=item_payload.get("confidence", 0.0),
-                    status="active",
-                    evidence_basis=json.dumps(item_payload.get("evidence", {})),
-                )
-            else:
-                item_id = f"item-{uuid.uuid4()}"
-                inserted += 1
-                items_repo.create_item(
-                    item_id=item_id,
-                    chunk_id=chunk_id,
-                    kind=item_payload["kind"],
-                    schema_id=item_payload["schema_id"],
-                    title=item_payload["title"],
-                    body=item_payload["body"],
-                    stable_key=item_payload.get("stable_key"),
-                    domain=item_payload.get("domain"),
-                    confidence=item_payload.get("confidence", 0.0),
-                    status="active",
-                    evidence_basis=json.dumps(item_payload.get("evidence", {})),
-                )
-
-            id_map[item_payload.get("item_id")] = item_id
-            items_repo.add_payload(item_id, item_payload.get("payload", {}))
-            tags_repo.replace_item_tags(item_id, item_payload.get("tags", []))
-            repo.map_temp_id(job_id=job_id, temp_item_id=item_payload.get("item_id"), item_id=item_id)
-
-        created_links = 0
-        for cand in keep_candidates:
-            item_payload = json.loads(cand["item_json"])
-            source_new_id = id_map.get(item_payload.get("item_id"))
-            if not source_new_id:
-                continue
-            for link in item_payload.get("links", []):
-                target_temp = link.get("target_key") or link.get("target_item_id")
-                target_real = id_map.get(target_temp, target_temp)
-                links_repo.create_link(
-                    link_id=f"link-{uuid.uuid4()}",
-                    item_id=source_new_id,
-                    rel=link["rel"],
-                    target_key=target_real,
-                    note=link.get("note"),
-                    confidence=link.get("confidence", 0.0),
-                )
-                created_links += 1
-
-        repo.mark_job_status(job_id, status="committed")
-        return {
-            "ok": True,
-            "inserted": inserted,
-            "updated": updated,
-            "skipped": len(candidates) - len(keep_candidates),
-            "links_created": created_links,
-            "warnings": [],
-        }
+    @app.post("/import/jobs/{job_id}/cancel")
+    def cancel_commit(job_id: str, repo: ImportRepo = Depends(get_import_repo)) -> Dict[str, bool]:
+        if not repo.get_job(job_id):
+            raise HTTPException(status_code=404, detail="job_not_found")
+        if not app.state.commit_executor.cancel(job_id):
+            raise HTTPException(status_code=409, detail="commit_not_pending")
+        return {"ok": True}
 
     @app.post("/import/jobs/{job_id}/discard")
     def discard_job(job_id: str, repo: ImportRepo = Depends(get_import_repo)) -> Dict[str, bool]:
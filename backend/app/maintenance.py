@@ -0,0 +1,72 @@
+"""Maintenance commands for an existing database.
+
+Run from the `backend/` directory, e.g. `python -m app.maintenance rebuild-fts`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import List, Optional
+
+from .db import Database, ensure_schema
+from .fts import flush_dirty, rebuild_all
+from .importer import ExtractionImporter, ImportProgress
+from .main import default_db_path
+from .neardup import rebuild_minhash
+from .repositories import ImportRepo
+from .vectors import VectorIndex
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance", description=__doc__)
+    parser.add_argument("--db", help="database path (defaults to DB_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="apply pending schema migrations")
+    commands.add_parser("rebuild-fts", help="regenerate items_fts from items (after bulk loads or VACUUM)")
+    commands.add_parser("flush-fts", help="apply queued FTS updates")
+    commands.add_parser("checkpoint", help="truncate the WAL file")
+    commands.add_parser("rebuild-minhash", help="re-sign every item for near-duplicate lookup (after upgrading)")
+    commands.add_parser("rebuild-vectors", help="rewrite the semantic search index files from items (needs numpy)")
+    import_file = commands.add_parser("import-file", help="create an import job from an extraction JSON file")
+    import_file.add_argument("path")
+    import_file.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    db = Database(args.db or default_db_path(), pool_size=1)
+    ensure_schema(db)
+    if args.command == "rebuild-fts":
+        with db.transaction() as cur:
+            print(f"indexed {rebuild_all(cur)} items")
+    elif args.command == "flush-fts":
+        with db.transaction() as cur:
+            print(f"flushed {flush_dirty(cur)} items")
+    elif args.command == "checkpoint":
+        print(db.checkpoint("TRUNCATE"))
+    elif args.command == "rebuild-minhash":
+        print(f"signed {rebuild_minhash(db)} items")
+    elif args.command == "rebuild-vectors":
+        try:
+            index = VectorIndex(db)
+        except RuntimeError as exc:
+            parser.error(str(exc))
+        print(f"indexed {index.rebuild()} items")
+        index.close()
+    elif args.command == "import-file":
+        def report(progress: ImportProgress) -> None:
+            print(
+                f"\r{progress.bytes_read / 1e6:.1f} MB, {progress.chunks} chunks, {progress.candidates} candidates",
+                end="",
+                file=sys.stderr,
+            )
+
+        importer = ExtractionImporter(ImportRepo(db), batch_size=args.batch_size, progress=report)
+        with open(args.path, "rb") as stream:
+            job = importer.import_stream(stream)
+        print(file=sys.stderr)
+        print(f"created {job.job_id}: {job.chunks} chunks, {job.candidates} candidates")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
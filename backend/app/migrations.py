@@ -0,0 +1,538 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+from .heads import FLUSH_HEADS_STATEMENTS
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .db import Database
+
+
+SCHEMA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+  version     INTEGER PRIMARY KEY,
+  name        TEXT NOT NULL,
+  applied_at  TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now'))
+);
+"""
+
+
+@dataclass(frozen=True)
+class Migration:
+    """One ordered schema step.
+
+    `sql` receives the base schema path so that the first step can load
+    `schema.sql`; later steps return inline DDL.
+    """
+
+    version: int
+    name: str
+    sql: Callable[[Path], str]
+
+
+def _baseline(schema_path: Path) -> str:
+    return Path(schema_path).read_text(encoding="utf-8")
+
+
+# items_fts is re-keyed by items.rowid (item_id is UNINDEXED, so deleting by it
+# scanned the whole index) and the per-row rebuild triggers are replaced by a
+# queue that `fts.flush_dirty` drains once per transaction. The queue inserts
+# use ON CONFLICT DO NOTHING rather than OR IGNORE: an outer UPSERT overrides
+# the OR IGNORE of statements in the triggers it fires, so queueing an
+# already-queued row would fail inside `INSERT ... ON CONFLICT DO UPDATE`.
+_DEFERRED_FTS = """
+DROP TRIGGER IF EXISTS trg_items_ai_fts;
+DROP TRIGGER IF EXISTS trg_items_au_fts;
+DROP TRIGGER IF EXISTS trg_items_ad_fts;
+DROP TRIGGER IF EXISTS trg_item_tags_ai_fts;
+DROP TRIGGER IF EXISTS trg_item_tags_ad_fts;
+DROP TABLE IF EXISTS items_fts;
+
+CREATE VIRTUAL TABLE items_fts USING fts5(
+  item_id UNINDEXED,
+  title,
+  body,
+  tags_text,
+  kind,
+  schema_id,
+  domain,
+  tokenize = 'unicode61'
+);
+
+CREATE TABLE IF NOT EXISTS fts_dirty (
+  item_rowid INTEGER PRIMARY KEY              -- items.rowid == items_fts.rowid
+);
+
+INSERT INTO items_fts(rowid, item_id, title, body, tags_text, kind, schema_id, domain)
+SELECT
+  i.rowid,
+  i.item_id,
+  i.title,
+  i.body,
+  COALESCE((
+    SELECT GROUP_CONCAT(t.name, ' ')
+    FROM item_tags it
+    JOIN tags t ON t.tag_id = it.tag_id
+    WHERE it.item_id = i.item_id
+  ), ''),
+  i.kind,
+  i.schema_id,
+  COALESCE(i.domain, '')
+FROM items i;
+
+CREATE TRIGGER trg_items_ai_fts
+AFTER INSERT ON items
+BEGIN
+  INSERT INTO fts_dirty(item_rowid) VALUES (NEW.rowid) ON CONFLICT DO NOTHING;
+END;
+
+CREATE TRIGGER trg_items_au_fts
+AFTER UPDATE OF title, body, kind, schema_id, domain ON items
+BEGIN
+  INSERT INTO fts_dirty(item_rowid) VALUES (NEW.rowid) ON CONFLICT DO NOTHING;
+END;
+
+CREATE TRIGGER trg_items_ad_fts
+AFTER DELETE ON items
+BEGIN
+  INSERT INTO fts_dirty(item_rowid) VALUES (OLD.rowid) ON CONFLICT DO NOTHING;
+END;
+
+CREATE TRIGGER trg_item_tags_ai_fts
+AFTER INSERT ON item_tags
+BEGIN
+  INSERT INTO fts_dirty(item_rowid)
+  SELECT rowid FROM items WHERE item_id = NEW.item_id
+  ON CONFLICT DO NOTHING;
+END;
+
+CREATE TRIGGER trg_item_tags_ad_fts
+AFTER DELETE ON item_tags
+BEGIN
+  INSERT INTO fts_dirty(item_rowid)
+  SELECT rowid FROM items WHERE item_id = OLD.item_id
+  ON CONFLICT DO NOTHING;
+END;
+"""
+
+# Search pages are ordered by (updated_at|created_at, item_id).
+_KEYSET_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_items_updated_keyset
+  ON items(updated_at, item_id);
+
+CREATE INDEX IF NOT EXISTS idx_items_created_keyset
+  ON items(created_at, item_id);
+"""
+
+# Substring index for Japanese text, which unicode61 cannot segment. Rows share
+# rowids with items_fts and are kept in sync by the same fts_dirty queue.
+_TRIGRAM_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts_trigram USING fts5(
+  title,
+  body,
+  tags_text,
+  tokenize = 'trigram'
+);
+
+INSERT INTO items_fts_trigram(rowid, title, body, tags_text)
+SELECT rowid, title, body, tags_text FROM items_fts;
+"""
+
+# Per-chunk sources of an import job, written in batches while an extraction
+# streams in instead of as one JSON document on import_jobs.source_json.
+_IMPORT_JOB_CHUNKS = """
+CREATE TABLE IF NOT EXISTS import_job_chunks (
+  job_id       TEXT NOT NULL REFERENCES import_jobs(job_id) ON DELETE CASCADE,
+  chunk_index  INTEGER NOT NULL,
+  source_json  TEXT NOT NULL,
+  PRIMARY KEY (job_id, chunk_index)
+);
+"""
+
+# Background commit bookkeeping. A separate column rather than new `status`
+# values, which the CHECK constraint on import_jobs.status would reject.
+# `commit_owner` names the process whose worker runs the commit, so a starting
+# process only fails commits left behind by processes that are gone.
+_IMPORT_COMMIT_STATE = """
+ALTER TABLE import_jobs ADD COLUMN commit_state TEXT;
+ALTER TABLE import_jobs ADD COLUMN commit_processed INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE import_jobs ADD COLUMN commit_total INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE import_jobs ADD COLUMN commit_error TEXT;
+ALTER TABLE import_jobs ADD COLUMN commit_result TEXT;
+ALTER TABLE import_jobs ADD COLUMN commit_owner TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_import_jobs_commit_state
+  ON import_jobs(commit_state);
+"""
+
+
+def _domain_paths(domain: str, *, source: str = "", partition: str = "") -> str:
+    """SELECT yielding `domain`, `parent`, `depth` for every ancestor-or-self path of a dot path.
+
+    SQLite has no string split and triggers cannot use WITH, so the path is
+    turned into a JSON array of its segments and a running sum of segment
+    lengths gives each prefix.
+    """
+
+    window = f"(PARTITION BY {partition} ORDER BY s.key)" if partition else "(ORDER BY s.key)"
+    end = f"sum(length(s.value) + 1) OVER {window} - 1"
+    return f"""SELECT
+      substr({domain}, 1, {end}) AS domain,
+      CASE WHEN s.key = 0 THEN NULL ELSE substr({domain}, 1, {end} - length(s.value) - 1) END AS parent,
+      s.key AS depth,
+      {end} = length({domain}) AS exact
+    FROM {source}json_each('[' || replace(json_quote({domain}), '.', '","') || ']') AS s"""
+
+
+def _domain_trigger_add(ref: str) -> str:
+    return f"""
+  INSERT INTO domains(domain, parent, depth, item_count, subtree_count)
+  SELECT domain, parent, depth, exact, 1 FROM ({_domain_paths(f"{ref}.domain")}) WHERE domain <> ''
+  ON CONFLICT(domain) DO UPDATE SET
+    item_count = item_count + excluded.item_count,
+    subtree_count = subtree_count + 1;"""
+
+
+def _domain_trigger_remove(ref: str) -> str:
+    paths = f"SELECT domain FROM ({_domain_paths(f'{ref}.domain')})"
+    return f"""
+  UPDATE domains
+  SET item_count = item_count - (domain = {ref}.domain), subtree_count = subtree_count - 1
+  WHERE domain IN ({paths});
+  DELETE FROM domains WHERE subtree_count <= 0 AND domain IN ({paths});"""
+
+
+# Per-domain item counts for dot paths ("software.testing" counts towards
+# "software" too). `item_count` is items with exactly this domain,
+# `subtree_count` items at or below it; rows go away when it reaches zero.
+_DOMAINS_INDEX = f"""
+CREATE TABLE IF NOT EXISTS domains (
+  domain        TEXT PRIMARY KEY,
+  parent        TEXT,
+  depth         INTEGER NOT NULL,
+  item_count    INTEGER NOT NULL DEFAULT 0,
+  subtree_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_domains_parent
+  ON domains(parent);
+
+-- Prefix suggestions ignore ASCII case, as the LIKE scan over items did.
+CREATE INDEX IF NOT EXISTS idx_domains_nocase
+  ON domains(domain COLLATE NOCASE);
+
+-- idx_items_domain leads with kind; subtree filters look up items by domain alone.
+CREATE INDEX IF NOT EXISTS idx_items_domain_status
+  ON items(domain, status);
+
+INSERT INTO domains(domain, parent, depth, item_count, subtree_count)
+SELECT domain, parent, depth, sum(exact), count(*)
+FROM ({_domain_paths("i.domain", source="items AS i, ", partition="i.rowid")})
+WHERE domain <> ''
+GROUP BY domain;
+
+CREATE TRIGGER trg_items_ai_domains
+AFTER INSERT ON items
+WHEN NEW.domain <> ''
+BEGIN{_domain_trigger_add("NEW")}
+END;
+
+CREATE TRIGGER trg_items_au_domains
+AFTER UPDATE OF domain ON items
+WHEN OLD.domain IS NOT NEW.domain
+BEGIN{_domain_trigger_remove("OLD")}{_domain_trigger_add("NEW")}
+END;
+
+CREATE TRIGGER trg_items_ad_domains
+AFTER DELETE ON items
+WHEN OLD.domain <> ''
+BEGIN{_domain_trigger_remove("OLD")}
+END;
+"""
+
+
+def _facet_delta(facet: str, value: str, delta: int, source: str = "", where: str = "") -> str:
+    select = f"SELECT '{facet}', {value}, {delta}{source}"
+    return f"""
+  INSERT INTO facet_counts(facet, value, count)
+  {select} WHERE {value} <> ''{f" AND {where}" if where else ""}
+  ON CONFLICT(facet, value) DO UPDATE SET count = count + excluded.count;"""
+
+
+_ITEM_TAG_NAMES = " FROM item_tags it JOIN tags t ON t.tag_id = it.tag_id"
+
+# Result-set-independent facet counts for `/search?facets=true` without
+# filters. Only items that are not deleted count; tags are counted by name.
+# Zero rows are left in place and skipped by readers. Writers must not re-add
+# an item tag with INSERT OR REPLACE: its implicit delete fires no trigger, so
+# the tag would be counted twice.
+_FACET_COUNTS = f"""
+CREATE TABLE IF NOT EXISTS facet_counts (
+  facet TEXT NOT NULL,  -- 'kind' | 'domain' | 'tag'
+  value TEXT NOT NULL,
+  count INTEGER NOT NULL,
+  PRIMARY KEY (facet, value)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_facet_counts_top
+  ON facet_counts(facet, count DESC);
+
+INSERT INTO facet_counts(facet, value, count)
+SELECT 'kind', kind, count(*) FROM items WHERE status != 'deleted' GROUP BY kind
+UNION ALL
+SELECT 'domain', domain, count(*) FROM items WHERE status != 'deleted' AND domain <> '' GROUP BY domain
+UNION ALL
+SELECT 'tag', t.name, count(*)
+FROM item_tags it
+JOIN tags t ON t.tag_id = it.tag_id
+JOIN items i ON i.item_id = it.item_id
+WHERE i.status != 'deleted'
+GROUP BY t.name;
+
+-- Tags linked before their item exists (deferred foreign keys) are counted
+-- here; trg_item_tags_ai_facets skips them because the item is missing.
+CREATE TRIGGER trg_items_ai_facets
+AFTER INSERT ON items
+WHEN NEW.status != 'deleted'
+BEGIN{_facet_delta("kind", "NEW.kind", 1)}{_facet_delta("domain", "NEW.domain", 1)}{_facet_delta("tag", "t.name", 1, _ITEM_TAG_NAMES, "it.item_id = NEW.item_id")}
+END;
+
+CREATE TRIGGER trg_items_au_facets
+AFTER UPDATE OF kind, domain, status ON items
+WHEN OLD.kind IS NOT NEW.kind OR OLD.domain IS NOT NEW.domain OR OLD.status IS NOT NEW.status
+BEGIN{_facet_delta("kind", "OLD.kind", -1, where="OLD.status != 'deleted'")}{_facet_delta("domain", "OLD.domain", -1, where="OLD.status != 'deleted'")}{_facet_delta("kind", "NEW.kind", 1, where="NEW.status != 'deleted'")}{_facet_delta("domain", "NEW.domain", 1, where="NEW.status != 'deleted'")}
+END;
+
+CREATE TRIGGER trg_items_au_facets_tags
+AFTER UPDATE OF status ON items
+WHEN (OLD.status = 'deleted') != (NEW.status = 'deleted')
+BEGIN{_facet_delta("tag", "t.name", "CASE NEW.status WHEN 'deleted' THEN -1 ELSE 1 END", _ITEM_TAG_NAMES, "it.item_id = NEW.item_id")}
+END;
+
+-- BEFORE, so the item's tags are still there when a hard delete cascades.
+CREATE TRIGGER trg_items_bd_facets
+BEFORE DELETE ON items
+WHEN OLD.status != 'deleted'
+BEGIN{_facet_delta("kind", "OLD.kind", -1)}{_facet_delta("domain", "OLD.domain", -1)}{_facet_delta("tag", "t.name", -1, _ITEM_TAG_NAMES, "it.item_id = OLD.item_id")}
+END;
+
+CREATE TRIGGER trg_item_tags_ai_facets
+AFTER INSERT ON item_tags
+BEGIN{_facet_delta("tag", "t.name", 1, " FROM tags t JOIN items i ON i.item_id = NEW.item_id", "t.tag_id = NEW.tag_id AND i.status != 'deleted'")}
+END;
+
+CREATE TRIGGER trg_item_tags_ad_facets
+AFTER DELETE ON item_tags
+BEGIN{_facet_delta("tag", "t.name", -1, " FROM tags t JOIN items i ON i.item_id = OLD.item_id", "t.tag_id = OLD.tag_id AND i.status != 'deleted'")}
+END;
+"""
+
+# Graph walks step from a node along one rel at a time, in either direction.
+# Both indexes cover the step, so traversal never reads item_links rows; they
+# replace the single-column indexes they start with.
+_LINK_TRAVERSAL_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_item_links_item_rel
+  ON item_links(item_id, rel, target_key);
+
+CREATE INDEX IF NOT EXISTS idx_item_links_target_rel
+  ON item_links(target_key, rel, item_id);
+
+DROP INDEX IF EXISTS idx_item_links_item;
+DROP INDEX IF EXISTS idx_item_links_target;
+"""
+
+# Heads of supersedes chains (see heads.py). The triggers only queue the older
+# item of a changed link and `flush_heads` walks the chains before commit:
+# trigger bodies cannot hold the recursive CTE. The backfill runs the same walk.
+_ITEM_HEADS = """
+CREATE TABLE IF NOT EXISTS item_heads (
+  item_id  TEXT PRIMARY KEY,                 -- superseded item
+  head_id  TEXT NOT NULL                     -- newest item of its chain
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS heads_dirty (
+  item_id  TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_item_links_ai_heads
+AFTER INSERT ON item_links
+WHEN NEW.rel = 'supersedes'
+BEGIN
+  INSERT INTO heads_dirty(item_id) VALUES (NEW.target_key) ON CONFLICT DO NOTHING;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_item_links_ad_heads
+AFTER DELETE ON item_links
+WHEN OLD.rel = 'supersedes'
+BEGIN
+  INSERT INTO heads_dirty(item_id) VALUES (OLD.target_key) ON CONFLICT DO NOTHING;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_item_links_au_heads
+AFTER UPDATE OF item_id, rel, target_key, created_at ON item_links
+WHEN 'supersedes' IN (OLD.rel, NEW.rel)
+BEGIN
+  INSERT INTO heads_dirty(item_id) VALUES (OLD.target_key), (NEW.target_key) ON CONFLICT DO NOTHING;
+END;
+
+INSERT INTO heads_dirty(item_id)
+SELECT target_key FROM item_links WHERE rel = 'supersedes'
+ON CONFLICT DO NOTHING;
+""" + ";\n".join(FLUSH_HEADS_STATEMENTS) + """;
+DELETE FROM heads_dirty;
+"""
+
+# MinHash LSH index for near-duplicate lookup (see neardup.py). Signatures are
+# computed in Python, so triggers only queue item rowids and the before-commit
+# hook signs them. Existing items are signed by `maintenance rebuild-minhash`
+# rather than here, where no Python runs. They wait in minhash_backfill instead
+# of minhash_dirty, which would make the next write commit sign the whole
+# table; until the queue is empty the import review reports its near-duplicate
+# matches as incomplete. An item's next edit also signs it.
+_MINHASH_INDEX = """
+CREATE TABLE IF NOT EXISTS item_minhash (
+  item_rowid  INTEGER PRIMARY KEY,           -- items.rowid
+  signature   BLOB NOT NULL                  -- NUM_PERM little-endian uint32
+);
+
+CREATE TABLE IF NOT EXISTS item_minhash_buckets (
+  bucket      INTEGER NOT NULL,              -- band << 32 | crc32(band values)
+  item_rowid  INTEGER NOT NULL,
+  PRIMARY KEY (bucket, item_rowid)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS minhash_dirty (
+  item_rowid  INTEGER PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS minhash_backfill (
+  item_rowid  INTEGER PRIMARY KEY            -- items.rowid
+);
+
+INSERT INTO minhash_backfill(item_rowid) SELECT rowid FROM items;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_ai_minhash
+AFTER INSERT ON items
+BEGIN
+  INSERT INTO minhash_dirty(item_rowid) VALUES (NEW.rowid) ON CONFLICT DO NOTHING;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_au_minhash
+AFTER UPDATE OF title, body ON items
+BEGIN
+  INSERT INTO minhash_dirty(item_rowid) VALUES (NEW.rowid) ON CONFLICT DO NOTHING;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_ad_minhash
+AFTER DELETE ON items
+BEGIN
+  INSERT INTO minhash_dirty(item_rowid) VALUES (OLD.rowid) ON CONFLICT DO NOTHING;
+END;
+"""
+
+# Change log for the in-process vector index (see vectors.py). Every write to
+# an item's text or status moves it to the end of the log, so an index that
+# remembers the last `seq` it applied catches up by reading only newer rows.
+# items_fts_vocab exposes per-term document counts for query-side IDF.
+_VECTOR_CHANGES = """
+CREATE TABLE IF NOT EXISTS item_vector_changes (
+  item_rowid  INTEGER PRIMARY KEY,           -- items.rowid
+  seq         INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_item_vector_changes_seq ON item_vector_changes(seq);
+
+CREATE TRIGGER IF NOT EXISTS trg_items_ai_vectors
+AFTER INSERT ON items
+BEGIN
+  INSERT INTO item_vector_changes(item_rowid, seq)
+  VALUES (NEW.rowid, (SELECT coalesce(max(seq), 0) + 1 FROM item_vector_changes))
+  ON CONFLICT(item_rowid) DO UPDATE SET seq = excluded.seq;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_au_vectors
+AFTER UPDATE OF title, body, status ON items
+BEGIN
+  INSERT INTO item_vector_changes(item_rowid, seq)
+  VALUES (NEW.rowid, (SELECT coalesce(max(seq), 0) + 1 FROM item_vector_changes))
+  ON CONFLICT(item_rowid) DO UPDATE SET seq = excluded.seq;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_ad_vectors
+AFTER DELETE ON items
+BEGIN
+  INSERT INTO item_vector_changes(item_rowid, seq)
+  VALUES (OLD.rowid, (SELECT coalesce(max(seq), 0) + 1 FROM item_vector_changes))
+  ON CONFLICT(item_rowid) DO UPDATE SET seq = excluded.seq;
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts_vocab USING fts5vocab(items_fts, 'row');
+"""
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline schema.sql", _baseline),
+    Migration(2, "deferred fts sync", lambda _: _DEFERRED_FTS),
+    Migration(3, "keyset pagination indexes", lambda _: _KEYSET_INDEXES),
+    Migration(4, "trigram fts index", lambda _: _TRIGRAM_FTS),
+    Migration(5, "import job chunks", lambda _: _IMPORT_JOB_CHUNKS),
+    Migration(6, "import commit state", lambda _: _IMPORT_COMMIT_STATE),
+    Migration(7, "domain index", lambda _: _DOMAINS_INDEX),
+    Migration(8, "facet counts", lambda _: _FACET_COUNTS),
+    Migration(9, "link traversal indexes", lambda _: _LINK_TRAVERSAL_INDEXES),
+    Migration(10, "supersedes chain heads", lambda _: _ITEM_HEADS),
+    Migration(11, "minhash near-duplicate index", lambda _: _MINHASH_INDEX),
+    Migration(12, "vector index change log", lambda _: _VECTOR_CHANGES),
+]
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version
+
+
+def current_version(db: "Database") -> int:
+    """Return the applied schema version, 0 for databases that predate `schema_version`."""
+
+    try:
+        with db.connect() as conn:
+            row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return int(row[0] or 0)
+
+
+def migrate(db: "Database", schema_path: os.PathLike[str] | str, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations in order; each step commits atomically.
+
+    Returns the versions that were applied (empty when already up to date).
+    Databases created before versioning are brought under it by re-running the
+    idempotent baseline.
+    """
+
+    target = latest_version() if target is None else target
+    version = current_version(db)
+    applied: List[int] = []
+    for migration in MIGRATIONS:
+        if migration.version <= version or migration.version > target:
+            continue
+        script = "\n".join(
+            [
+                "BEGIN IMMEDIATE;",
+                SCHEMA_VERSION_DDL,
+                migration.sql(Path(schema_path)),
+                ";",
+                "INSERT INTO schema_version(version, name) VALUES (%d, '%s');"
+                % (migration.version, migration.name.replace("'", "''")),
+                "COMMIT;",
+            ]
+        )
+        db.execute_script(script)
+        applied.append(migration.version)
+    return applied
+
+
+__all__ = ["MIGRATIONS", "Migration", "current_version", "latest_version", "migrate"]
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import sqlite3
+import struct
+import unicodedata
+import zlib
+from typing import TYPE_CHECKING, List, Sequence, Set, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .db import Database
+
+
+# Near-duplicate lookup over items.title + body with MinHash LSH.
+#
+# Text is NFKC-folded, lowercased and cut into character 4-grams (so Japanese
+# without spaces works too). Signatures use one-permutation hashing: each
+# gram's crc32 picks one of NUM_PERM bins by its low bits and the bin keeps
+# the minimum of the rest, so hashing costs O(text) instead of O(text * perms).
+# Empty bins borrow the next non-empty bin's value (rotation densification).
+#
+# The signature is cut into BANDS bands of ROWS values; items sharing any band
+# are candidates (about 50% Jaccard similarity gives even odds), and candidates
+# are ranked by the fraction of equal signature values.
+SHINGLE_CHARS = 4
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_BIN_BITS = 6  # log2(NUM_PERM)
+_EMPTY = 0xFFFFFFFF
+_ROTATION = 1 << (32 - _BIN_BITS)
+_SIGNATURE = struct.Struct(f"<{NUM_PERM}I")
+
+
+def shingles(text: str) -> Set[int]:
+    text = " ".join(unicodedata.normalize("NFKC", text).lower().split())
+    if len(text) <= SHINGLE_CHARS:
+        grams = {text} if text else set()
+    else:
+        grams = {text[n : n + SHINGLE_CHARS] for n in range(len(text) - SHINGLE_CHARS + 1)}
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+
+
+def signature(title: str, body: str) -> Tuple[int, ...]:
+    bins = [_EMPTY] * NUM_PERM
+    mask = NUM_PERM - 1
+    for value in shingles(f"{title} {body}"):
+        slot, rest = value & mask, value >> _BIN_BITS
+        if rest < bins[slot]:
+            bins[slot] = rest
+    real = [value != _EMPTY for value in bins]
+    if any(real) and not all(real):
+        for n in range(NUM_PERM):
+            if not real[n]:
+                # Borrow from the next filled bin, offset by the distance so
+                # borrowed values never equal real ones (those stay below
+                # _ROTATION).
+                distance = next(d for d in range(1, NUM_PERM) if real[(n + d) % NUM_PERM])
+                bins[n] = bins[(n + distance) % NUM_PERM] + distance * _ROTATION
+    return tuple(bins)
+
+
+def buckets(sig: Sequence[int]) -> List[int]:
+    """One LSH bucket key per band; the band number is in the high bits."""
+
+    return [
+        (band << 32) | zlib.crc32(struct.pack(f"<{ROWS}I", *sig[band * ROWS : (band + 1) * ROWS]))
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def pack(sig: Sequence[int]) -> bytes:
+    return _SIGNATURE.pack(*sig)
+
+
+def unpack(blob: bytes) -> Tuple[int, ...]:
+    return _SIGNATURE.unpack(blob)
+
+
+def flush_minhash(cur: sqlite3.Cursor) -> int:
+    """Re-sign every item queued in `minhash_dirty`; returns the queue length."""
+
+    rows = cur.execute(
+        """
+        SELECT d.item_rowid, i.title, i.body, m.signature
+        FROM minhash_dirty d
+        LEFT JOIN items i ON i.rowid = d.item_rowid
+        LEFT JOIN item_minhash m ON m.item_rowid = d.item_rowid
+        """
+    ).fetchall()
+    if not rows:
+        return 0
+    stale: List[Tuple[int, int]] = []
+    fresh: List[Tuple[int, int]] = []
+    signatures: List[Tuple[int, bytes]] = []
+    removed: List[Tuple[int]] = []
+    for item_rowid, title, body, old_blob in rows:
+        old = unpack(old_blob) if old_blob is not None else None
+        new = signature(title, body) if title is not None else None
+        if new == old:
+            continue
+        if old is not None:
+            stale.extend((bucket, item_rowid) for bucket in buckets(old))
+        if new is None:
+            removed.append((item_rowid,))
+            continue
+        fresh.extend((bucket, item_rowid) for bucket in buckets(new))
+        signatures.append((item_rowid, pack(new)))
+    cur.executemany("DELETE FROM item_minhash_buckets WHERE bucket = ? AND item_rowid = ?", stale)
+    cur.executemany("DELETE FROM item_minhash WHERE item_rowid = ?", removed)
+    cur.executemany(
+        "INSERT INTO item_minhash(item_rowid, signature) VALUES (?, ?) "
+        "ON CONFLICT(item_rowid) DO UPDATE SET signature = excluded.signature",
+        signatures,
+    )
+    cur.executemany(
+        "INSERT INTO item_minhash_buckets(bucket, item_rowid) VALUES (?, ?) ON CONFLICT DO NOTHING", fresh
+    )
+    cur.execute("DELETE FROM minhash_backfill WHERE item_rowid IN (SELECT item_rowid FROM minhash_dirty)")
+    cur.execute("DELETE FROM minhash_dirty")
+    return len(rows)
+
+
+def rebuild_minhash(db: "Database", batch_size: int = 5_000) -> int:
+    """Sign every item (after upgrading, or to repair the index), one batch per commit."""
+
+    with db.transaction() as cur:
+        cur.execute("DELETE FROM item_minhash_buckets")
+        cur.execute("DELETE FROM item_minhash")
+        cur.execute("DELETE FROM minhash_dirty")
+    last_rowid, total = 0, 0
+    while True:
+        with db.transaction() as cur:
+            # Queued rows are signed by the before-commit hook.
+            queued = cur.execute(
+                "INSERT INTO minhash_dirty(item_rowid) SELECT rowid FROM items WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, batch_size),
+            ).rowcount
+            if queued:
+                last_rowid = cur.execute("SELECT max(item_rowid) FROM minhash_dirty").fetchone()[0]
+        total += queued
+        if queued < batch_size:
+            return total
+
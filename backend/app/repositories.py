@@ -1,11 +1,203 @@
 from __future__ import annotations
 
+import base64
+import binascii
 import json
-from typing import Any, Dict, List, Optional, Sequence
+import os
+import re
+import sqlite3
+import time
+from functools import partial
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
 from .import_utils import compute_digest, compute_thread_id
 
+from .cache import SearchCache, TagCache
 from .db import Database, row_to_dict
+from .neardup import buckets, signature, similarity, unpack
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .vectors import VectorIndex
+
+
+# Upper bound for `total` in search results; counting past it costs more than
+# the number is worth for paging UIs.
+SEARCH_TOTAL_CAP = 10_000
+# Fields of a search hit, in response order; `fields=` projects from these.
+SEARCH_FIELDS = (
+    "item_id",
+    "kind",
+    "schema_id",
+    "title",
+    "body",
+    "domain",
+    "created_at",
+    "updated_at",
+    "confidence",
+    "tags",
+)
+# FTS5 caps snippet() windows at 64 tokens.
+SNIPPET_MAX_TOKENS = 64
+SNIPPET_OPEN, SNIPPET_CLOSE, SNIPPET_ELLIPSIS = "<mark>", "</mark>", "…"
+# Columns of each FTS table, in declaration order (bm25() weights and
+# snippet() columns are positional).
+_FTS_COLUMNS = {
+    "items_fts": ("item_id", "title", "body", "tags_text", "kind", "schema_id", "domain"),
+    "items_fts_trigram": ("title", "body", "tags_text"),
+}
+# bm25() weight per FTS column for relevance sorts; unlisted columns weigh 1.0.
+BM25_WEIGHTS = {"title": 4.0, "body": 1.0, "tags_text": 2.0, "kind": 0.5, "schema_id": 0.5, "domain": 1.0}
+# `sort=blended` scales relevance by (1 + BLEND_CONFIDENCE * confidence) and
+# halves it for an item last updated BLEND_HALF_LIFE_DAYS ago.
+BLEND_CONFIDENCE = 0.5
+BLEND_HALF_LIFE_DAYS = 365.0
+# `mode=semantic` ranks by vector similarity and `mode=hybrid` fuses that
+# ranking with bm25 by reciprocal rank (1 / (RRF_K + rank) per list). Each
+# list holds at most VECTOR_CANDIDATES hits after the filters, which also caps
+# `total` (reported through `total_capped`).
+SEARCH_MODES = ("keyword", "semantic", "hybrid")
+VECTOR_CANDIDATES = 200
+# Filtered searches first take VECTOR_OVERSAMPLE times as many global hits and
+# scan only the filtered items when fewer than VECTOR_CANDIDATES survive.
+VECTOR_OVERSAMPLE = 4
+RRF_K = 60
+# Values returned per facet by `SearchRepo.search_items(facets=True)`.
+FACET_LIMIT = 10
+_FACET_KEYS = (("kind", "kinds"), ("domain", "domains"), ("tag", "tags"))
+
+# In- and out-degree of a link's target; both are index-only counts.
+_LINK_DEGREES = (
+    ", (SELECT count(*) FROM item_links d WHERE d.target_key = l.target_key) AS target_in_degree"
+    ", (SELECT count(*) FROM item_links d WHERE d.item_id = l.target_key) AS target_out_degree"
+)
+# `ItemsRepo.find_near_duplicates` keeps hits whose estimated Jaccard
+# similarity (of title + body character 4-grams) reaches this.
+NEAR_DUPLICATE_MIN_SIMILARITY = 0.5
+# Bounds for `LinksRepo.graph`: hops from the root, and nodes visited
+# before the walk stops expanding.
+GRAPH_MAX_DEPTH = 5
+GRAPH_NODE_LIMIT = 500
+_GRAPH_STEPS = {
+    "out": ("l.target_key", "l.item_id"),
+    "in": ("l.item_id", "l.target_key"),
+}
+
+# Columns of `items`, in table order; `ItemsRepo.get_items` projects from these.
+ITEM_FIELDS = (
+    "item_id",
+    "chunk_id",
+    "kind",
+    "schema_id",
+    "stable_key",
+    "title",
+    "body",
+    "domain",
+    "confidence",
+    "status",
+    "created_at",
+    "updated_at",
+    "evidence_basis",
+)
+
+# Kinds where the latest item for a stable_key wins (see uq_items_stateful_stable_key).
+STATEFUL_KINDS = ("knowledge", "value")
+
+_INSERT_ITEM_SQL = """
+INSERT INTO items(item_id, chunk_id, kind, schema_id, stable_key, title, body, domain, confidence, status, evidence_basis)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, 0.0), COALESCE(?, 'active'), ?)
+"""
+
+# The conflict target must repeat the partial index's WHERE clause, otherwise
+# SQLite does not consider uq_items_stateful_stable_key a usable constraint.
+_UPSERT_STATEFUL_ITEM_SQL = _INSERT_ITEM_SQL + """
+ON CONFLICT(kind, stable_key) WHERE stable_key IS NOT NULL AND kind IN ('knowledge','value') DO UPDATE SET
+  chunk_id = excluded.chunk_id,
+  schema_id = excluded.schema_id,
+  title = excluded.title,
+  body = excluded.body,
+  domain = excluded.domain,
+  confidence = excluded.confidence,
+  status = excluded.status,
+  evidence_basis = excluded.evidence_basis,
+  updated_at = (strftime('%Y-%m-%dT%H:%M:%fZ','now'))
+"""
+
+_UPSERT_PAYLOAD_SQL = """
+INSERT INTO item_payloads(item_id, payload_json) VALUES (?, ?)
+ON CONFLICT(item_id) DO UPDATE SET payload_json = excluded.payload_json
+"""
+
+# Hiragana, katakana (full and half width) and CJK ideographs.
+_CJK_RE = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f]")
+
+
+class InvalidQueryError(ValueError):
+    """A query parameter the repository cannot serve; `detail` is the API error code."""
+
+    def __init__(self, detail: str, message: str) -> None:
+        super().__init__(message)
+        self.detail = detail
+
+
+def _encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidQueryError("invalid_cursor", "invalid cursor") from exc
+    if not isinstance(values, list) or len(values) != 3:
+        raise InvalidQueryError("invalid_cursor", "invalid cursor")
+    return values
+
+
+def default_bm25_weights() -> Dict[str, float]:
+    """`BM25_WEIGHTS` overridden by `SEARCH_BM25_WEIGHTS` ("title=5,body=1")."""
+
+    weights = dict(BM25_WEIGHTS)
+    if weights_env := os.environ.get("SEARCH_BM25_WEIGHTS"):
+        for pair in weights_env.split(","):
+            column, _, value = pair.partition("=")
+            weights[column.strip()] = float(value)
+    return weights
+
+
+def _julian_now() -> float:
+    return time.time() / 86400.0 + 2440587.5
+
+
+def _blend_reference(cursor: str) -> float:
+    sort_name = _decode_cursor(cursor)[0]
+    if isinstance(sort_name, str) and sort_name.startswith("blended:"):
+        try:
+            return float(sort_name.partition(":")[2])
+        except ValueError as exc:
+            raise InvalidQueryError("invalid_cursor", "invalid cursor") from exc
+    return _julian_now()
+
+
+def _is_stateful(item: Dict[str, Any]) -> bool:
+    return bool(item.get("stable_key")) and item.get("kind") in STATEFUL_KINDS
+
+
+def _item_row(item: Dict[str, Any]) -> tuple:
+    return (
+        item["item_id"],
+        item["chunk_id"],
+        item["kind"],
+        item["schema_id"],
+        item.get("stable_key"),
+        item["title"],
+        item["body"],
+        item.get("domain"),
+        item.get("confidence"),
+        item.get("status"),
+        item.get("evidence_basis"),
+    )
 
 
 class ItemsRepo:
@@ -41,22 +233,21 @@ class ItemsRepo:
     ) -> None:
         with self.db.transaction() as cur:
             cur.execute(
-                """
-                INSERT INTO items(item_id, chunk_id, kind, schema_id, stable_key, title, body, domain, confidence, status, evidence_basis)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    item_id,
-                    chunk_id,
-                    kind,
-                    schema_id,
-                    stable_key,
-                    title,
-                    body,
-                    domain,
-                    confidence,
-                    status,
-                    evidence_basis,
+                _INSERT_ITEM_SQL,
+                _item_row(
+                    {
+                        "item_id": item_id,
+                        "chunk_id": chunk_id,
+                        "kind": kind,
+                        "schema_id": schema_id,
+                        "stable_key": stable_key,
+                        "title": title,
+                        "body": body,
+                        "domain": domain,
+                        "confidence": confidence,
+                        "status": status,
+                        "evidence_basis": evidence_basis,
+                    }
                 ),
             )
 
@@ -74,7 +265,7 @@ class ItemsRepo:
         status: str = "active",
         evidence_basis: Optional[str] = None,
         chunk_id: Optional[str] = None,
-    ) -> None:
+    ) -> bool:
         with self.db.transaction() as cur:
             cur.execute(
                 """
@@ -98,6 +289,55 @@ class ItemsRepo:
                     item_id,
                 ),
             )
+            return cur.rowcount > 0
+
+    def create_items(self, items: Sequence[Dict[str, Any]]) -> None:
+        """Insert many items (and their `payload`, when given) with executemany."""
+
+        with self.db.transaction() as cur:
+            cur.executemany(_INSERT_ITEM_SQL, (_item_row(item) for item in items))
+            self._write_payloads(cur, ((item["item_id"], item) for item in items))
+
+    def upsert_stateful_item(self, item: Dict[str, Any]) -> tuple[str, bool]:
+        """Insert a knowledge/value item or update the row holding its stable_key.
+
+        Returns `(item_id, inserted)`, where `item_id` is the surviving row's id
+        taken from `RETURNING`; the payload, when given, is written to that row.
+        """
+
+        if not _is_stateful(item):
+            raise ValueError("upsert_stateful_item needs a knowledge/value item with a stable_key")
+        with self.db.transaction() as cur:
+            item_id = self._upsert_stateful(cur, item)
+            self._write_payloads(cur, [(item_id, item)])
+        return item_id, item_id == item["item_id"]
+
+    def upsert_items(self, items: Sequence[Dict[str, Any]]) -> Dict[str, str]:
+        """Insert items, updating the existing row for stateful stable_keys.
+
+        Returns the surviving `item_id` for every proposed `item_id`; an item
+        was inserted when the two are equal.
+        """
+
+        plain = [item for item in items if not _is_stateful(item)]
+        survivors = {item["item_id"]: item["item_id"] for item in plain}
+        with self.db.transaction() as cur:
+            cur.executemany(_INSERT_ITEM_SQL, (_item_row(item) for item in plain))
+            for item in items:
+                if _is_stateful(item):
+                    survivors[item["item_id"]] = self._upsert_stateful(cur, item)
+            self._write_payloads(cur, ((survivors[item["item_id"]], item) for item in items))
+        return survivors
+
+    def _upsert_stateful(self, cur: sqlite3.Cursor, item: Dict[str, Any]) -> str:
+        # executemany cannot return rows, so stateful items go one statement at a time.
+        return cur.execute(_UPSERT_STATEFUL_ITEM_SQL + "RETURNING item_id", _item_row(item)).fetchone()[0]
+
+    def _write_payloads(self, cur: sqlite3.Cursor, items: Iterable[tuple[str, Dict[str, Any]]]) -> None:
+        cur.executemany(
+            _UPSERT_PAYLOAD_SQL,
+            ((item_id, json.dumps(item["payload"])) for item_id, item in items if "payload" in item),
+        )
 
     def add_payload(self, item_id: str, payload: Dict[str, Any]) -> None:
         with self.db.transaction() as cur:
@@ -121,12 +361,127 @@ class ItemsRepo:
             row = conn.execute("SELECT * FROM items WHERE item_id = ?", (item_id,)).fetchone()
             return row_to_dict(row) if row else None
 
+    def get_item_detail(
+        self,
+        item_id: str,
+        *,
+        fields: Optional[Sequence[str]] = None,
+        include_links: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """Load an item with its payload and tags (and links with their target
+        titles) in a single statement; the related rows come back as JSON."""
+
+        columns = self._project(fields)
+        links_sql = ""
+        if include_links:
+            links_sql = """,
+                (
+                    SELECT json_group_array(json_object(
+                        'link_id', l.link_id, 'item_id', l.item_id, 'rel', l.rel, 'target_key', l.target_key,
+                        'note', l.note, 'confidence', l.confidence,
+                        'target_title', l.target_title, 'target_kind', l.target_kind
+                    ))
+                    FROM (
+                        SELECT l.*, t.title AS target_title, t.kind AS target_kind
+                        FROM item_links l
+                        LEFT JOIN items t ON t.item_id = l.target_key
+                        WHERE l.item_id = i.item_id
+                        ORDER BY l.created_at
+                    ) l
+                ) AS links_json"""
+        with self.db.connect() as conn:
+            row = conn.execute(
+                f"""
+                SELECT {', '.join('i.' + c for c in columns)},
+                    (SELECT payload_json FROM item_payloads p WHERE p.item_id = i.item_id) AS payload_json,
+                    (
+                        SELECT json_group_array(json_object('name', t.name, 'path', t.path, 'confidence', t.confidence))
+                        FROM (
+                            SELECT t.name, t.path, it.confidence
+                            FROM item_tags it
+                            JOIN tags t ON t.tag_id = it.tag_id
+                            WHERE it.item_id = i.item_id
+                            ORDER BY t.name
+                        ) t
+                    ) AS tags_json{links_sql}
+                FROM items i
+                WHERE i.item_id = ?
+                """,
+                (item_id,),
+            ).fetchone()
+        if not row:
+            return None
+        item = row_to_dict(row)
+        payload_json = item.pop("payload_json")
+        item["payload"] = json.loads(payload_json) if payload_json else {}
+        item["tags"] = json.loads(item.pop("tags_json"))
+        if include_links:
+            item["links"] = json.loads(item.pop("links_json"))
+        return item
+
+    def _project(self, fields: Optional[Sequence[str]]) -> List[str]:
+        if not fields:
+            return list(ITEM_FIELDS)
+        unknown = set(fields) - set(ITEM_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown item fields: {sorted(unknown)}")
+        return ["item_id", *(f for f in ITEM_FIELDS if f in fields and f != "item_id")]
+
+    def get_items(
+        self,
+        item_ids: Sequence[str],
+        *,
+        fields: Optional[Sequence[str]] = None,
+        include_payload: bool = False,
+        include_tags: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Load many items in at most three queries, in the order of `item_ids`.
+
+        `fields` projects the item columns (`item_id` is always returned);
+        unknown ids are skipped. Ids are bound as one JSON array, so the
+        statement does not depend on the number of ids.
+        """
+
+        columns = self._project(fields)
+        ids_json = json.dumps(list(dict.fromkeys(item_ids)))
+
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(columns)} FROM items WHERE item_id IN (SELECT value FROM json_each(?))",
+                (ids_json,),
+            ).fetchall()
+            found = {row["item_id"]: row_to_dict(row) for row in rows}
+            if include_payload:
+                for item in found.values():
+                    item["payload"] = {}
+                for row in conn.execute(
+                    "SELECT item_id, payload_json FROM item_payloads WHERE item_id IN (SELECT value FROM json_each(?))",
+                    (ids_json,),
+                ):
+                    found[row["item_id"]]["payload"] = json.loads(row["payload_json"])
+            if include_tags:
+                for item in found.values():
+                    item["tags"] = []
+                for row in conn.execute(
+                    """
+                    SELECT it.item_id, t.name, t.path, it.confidence
+                    FROM item_tags it
+                    JOIN tags t ON t.tag_id = it.tag_id
+                    WHERE it.item_id IN (SELECT value FROM json_each(?))
+                    ORDER BY it.item_id, t.name
+                    """,
+                    (ids_json,),
+                ):
+                    tag = row_to_dict(row)
+                    found[tag.pop("item_id")]["tags"].append(tag)
+        return [found[item_id] for item_id in dict.fromkeys(item_ids) if item_id in found]
+
     def list_items(self) -> List[Dict[str, Any]]:
         with self.db.connect() as conn:
             rows = conn.execute("SELECT * FROM items ORDER BY created_at DESC").fetchall()
             return [row_to_dict(r) for r in rows]
 
-    def soft_delete(self, item_id: str) -> None:
+    def soft_delete(self, item_id: str) -> bool:
         with self.db.transaction() as cur:
             cur.execute(
                 """
@@ -135,6 +490,7 @@ class ItemsRepo:
                 """,
                 (item_id,),
             )
+            return cur.rowcount > 0
 
     def ensure_chunk_for_item(self, chunk_id: str, source: Dict[str, Any]) -> str:
         with self.db.transaction() as cur:
@@ -240,10 +596,77 @@ class ItemsRepo:
                 ).fetchone()
             return row_to_dict(row) if row else None
 
+    def near_duplicates_complete(self) -> bool:
+        """False while items from before the MinHash index still wait for `rebuild-minhash`."""
+
+        with self.db.connect() as conn:
+            return conn.execute("SELECT NOT EXISTS (SELECT 1 FROM minhash_backfill)").fetchone()[0] == 1
+
+    def find_near_duplicates(
+        self,
+        texts: Sequence[Tuple[str, str]],
+        *,
+        limit: int = 5,
+        min_similarity: float = NEAR_DUPLICATE_MIN_SIMILARITY,
+        exclude_item_id: Optional[str] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """For each (title, body), the most similar live items, best first.
+
+        Only items sharing a MinHash LSH bucket are scored, so the cost follows
+        the number of near matches rather than the number of items.
+        """
+
+        results = []
+        with self.db.connect() as conn:
+            for title, body in texts:
+                sig = signature(title, body)
+                rows = conn.execute(
+                    """
+                    SELECT i.item_id, i.kind, i.title, i.status, m.signature
+                    FROM (
+                      SELECT item_rowid FROM item_minhash_buckets
+                      WHERE bucket IN (SELECT value FROM json_each(?))
+                      GROUP BY item_rowid
+                    ) b
+                    JOIN item_minhash m ON m.item_rowid = b.item_rowid
+                    JOIN items i ON i.rowid = b.item_rowid
+                    WHERE i.status != 'deleted' AND i.item_id IS NOT ?
+                    """,
+                    (json.dumps(buckets(sig)), exclude_item_id),
+                ).fetchall()
+                hits = []
+                for row in rows:
+                    score = similarity(sig, unpack(row["signature"]))
+                    if score >= min_similarity:
+                        hit = row_to_dict(row)
+                        del hit["signature"]
+                        hit["similarity"] = score
+                        hits.append(hit)
+                hits.sort(key=lambda hit: (-hit["similarity"], hit["item_id"]))
+                results.append(hits[:limit])
+        return results
+
 
 class TagsRepo:
-    def __init__(self, db: Database) -> None:
+    def __init__(self, db: Database, cache: Optional[TagCache] = None) -> None:
         self.db = db
+        self.cache = cache
+
+    def warm_cache(self) -> None:
+        """Load every tag and its item count into `cache`."""
+
+        if self.cache is None:
+            return
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT t.tag_id, t.name, t.path, count(it.item_id) AS usage
+                FROM tags t
+                LEFT JOIN item_tags it ON it.tag_id = t.tag_id
+                GROUP BY t.tag_id
+                """
+            ).fetchall()
+        self.cache.reset((int(r["tag_id"]), r["name"], r["path"] or "", int(r["usage"])) for r in rows)
 
     def create_tag(self, name: str, path: Optional[str] = None, parent_id: Optional[int] = None) -> int:
         with self.db.transaction() as cur:
@@ -254,7 +677,10 @@ class TagsRepo:
                 """,
                 (name, path or "", parent_id),
             )
-            return cur.lastrowid
+            tag_id = cur.lastrowid
+            if self.cache is not None:
+                self.db.after_commit(partial(self.cache.add_tags, [(tag_id, name, path or "")]))
+            return tag_id
 
     def find_tag(self, name: str, path: Optional[str] = None) -> Optional[Dict[str, Any]]:
         with self.db.connect() as conn:
@@ -265,6 +691,10 @@ class TagsRepo:
             return row_to_dict(row) if row else None
 
     def find_or_create(self, tag: Dict[str, Any]) -> int:
+        if self.cache is not None:
+            cached = self.cache.tag_id(tag.get("name"), tag.get("path") or "")
+            if cached is not None:
+                return cached
         existing = self.find_tag(tag.get("name"), tag.get("path"))
         if existing:
             return int(existing["tag_id"])
@@ -274,21 +704,98 @@ class TagsRepo:
         with self.db.transaction() as cur:
             cur.execute(
                 """
-                INSERT OR REPLACE INTO item_tags(item_id, tag_id, confidence)
+                INSERT INTO item_tags(item_id, tag_id, confidence)
                 VALUES (?, ?, ?)
+                ON CONFLICT(item_id, tag_id) DO UPDATE SET confidence = excluded.confidence
                 """,
                 (item_id, tag_id, confidence),
             )
+            self._refresh_usage(cur, [tag_id])
 
     def clear_tags_for_item(self, item_id: str) -> None:
         with self.db.transaction() as cur:
-            cur.execute("DELETE FROM item_tags WHERE item_id = ?", (item_id,))
+            removed = cur.execute("DELETE FROM item_tags WHERE item_id = ? RETURNING tag_id", (item_id,)).fetchall()
+            self._refresh_usage(cur, [row["tag_id"] for row in removed])
 
     def replace_item_tags(self, item_id: str, tags: Sequence[Dict[str, Any]]) -> None:
-        self.clear_tags_for_item(item_id)
-        for tag in tags:
-            tag_id = self.find_or_create(tag)
-            self.add_tag_to_item(item_id, tag_id, confidence=tag.get("confidence", 0.0))
+        self.replace_tags_bulk({item_id: tags})
+
+    def resolve_tags(self, tags: Iterable[Dict[str, Any]]) -> Dict[tuple[str, str], int]:
+        """Return `tag_id` by `(name, path)`, creating missing tags.
+
+        One executemany inserts the new names and one query reads back every id.
+        With a cache, only names it does not know reach SQLite.
+        """
+
+        keys = sorted({(tag.get("name"), tag.get("path") or "") for tag in tags})
+        resolved: Dict[tuple[str, str], int] = {}
+        if self.cache is not None:
+            for key in keys:
+                tag_id = self.cache.tag_id(*key)
+                if tag_id is not None:
+                    resolved[key] = tag_id
+            keys = [key for key in keys if key not in resolved]
+        if not keys:
+            return resolved
+        with self.db.transaction() as cur:
+            cur.executemany("INSERT INTO tags(name, path) VALUES (?, ?) ON CONFLICT(name, path) DO NOTHING", keys)
+            rows = cur.execute(
+                """
+                SELECT tag_id, name, path FROM tags
+                WHERE (name, path) IN (
+                  SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+                )
+                """,
+                (json.dumps(keys),),
+            ).fetchall()
+            found = [(int(row["tag_id"]), row["name"], row["path"]) for row in rows]
+            if self.cache is not None:
+                self.db.after_commit(partial(self.cache.add_tags, found))
+        resolved.update(((name, path), tag_id) for tag_id, name, path in found)
+        return resolved
+
+    def replace_tags_bulk(self, item_tags: Mapping[str, Sequence[Dict[str, Any]]]) -> None:
+        """Replace the tags of every item in `item_tags` in one transaction."""
+
+        if not item_tags:
+            return
+        with self.db.transaction() as cur:
+            tag_ids = self.resolve_tags(tag for tags in item_tags.values() for tag in tags)
+            removed = cur.execute(
+                "DELETE FROM item_tags WHERE item_id IN (SELECT value FROM json_each(?)) RETURNING tag_id",
+                (json.dumps(list(item_tags)),),
+            ).fetchall()
+            cur.executemany(
+                """
+                INSERT INTO item_tags(item_id, tag_id, confidence) VALUES (?, ?, ?)
+                ON CONFLICT(item_id, tag_id) DO UPDATE SET confidence = excluded.confidence
+                """,
+                (
+                    (item_id, tag_ids[(tag.get("name"), tag.get("path") or "")], tag.get("confidence", 0.0))
+                    for item_id, tags in item_tags.items()
+                    for tag in tags
+                ),
+            )
+            self._refresh_usage(cur, [row["tag_id"] for row in removed] + list(tag_ids.values()))
+
+    def _refresh_usage(self, cur: sqlite3.Cursor, tag_ids: Iterable[int]) -> None:
+        # Recount the touched tags so the cache ranks by committed item counts.
+        if self.cache is None:
+            return
+        unique = sorted(set(tag_ids))
+        if not unique:
+            return
+        counts = {tag_id: 0 for tag_id in unique}
+        for row in cur.execute(
+            """
+            SELECT tag_id, count(*) AS usage FROM item_tags
+            WHERE tag_id IN (SELECT value FROM json_each(?))
+            GROUP BY tag_id
+            """,
+            (json.dumps(unique),),
+        ):
+            counts[int(row["tag_id"])] = int(row["usage"])
+        self.db.after_commit(partial(self.cache.set_usage, counts))
 
     def get_tags_for_item(self, item_id: str) -> List[Dict[str, Any]]:
         with self.db.connect() as conn:
@@ -310,6 +817,10 @@ class TagsRepo:
             return [row_to_dict(r) for r in rows]
 
     def suggest_tags(self, prefix: str, limit: int = 20) -> List[str]:
+        """Tag names starting with `prefix`, most used first when cached."""
+
+        if self.cache is not None:
+            return self.cache.suggest(prefix, limit)
         with self.db.connect() as conn:
             rows = conn.execute(
                 "SELECT name FROM tags WHERE name LIKE ? || '%' ORDER BY name LIMIT ?",
@@ -341,6 +852,26 @@ class LinksRepo:
                 (link_id, item_id, rel, target_key, note, confidence),
             )
 
+    def create_links_bulk(self, links: Sequence[Dict[str, Any]]) -> None:
+        with self.db.transaction() as cur:
+            cur.executemany(
+                """
+                INSERT INTO item_links(link_id, item_id, rel, target_key, note, confidence)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    (
+                        link["link_id"],
+                        link["item_id"],
+                        link["rel"],
+                        link["target_key"],
+                        link.get("note"),
+                        link.get("confidence", 0.0),
+                    )
+                    for link in links
+                ),
+            )
+
     def find_link_id(self, item_id: str, rel: str, target_key: str) -> Optional[str]:
         with self.db.connect() as conn:
             row = conn.execute(
@@ -355,17 +886,24 @@ class LinksRepo:
             ).fetchone()
             return row["link_id"] if row else None
 
-    def list_links_for_item(self, item_id: str, include_targets: bool = False) -> List[Dict[str, Any]]:
+    def list_links_for_item(
+        self, item_id: str, include_targets: bool = False, include_degrees: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Outgoing links of `item_id`. `include_degrees` adds each target's
+        `target_in_degree` / `target_out_degree`, counted on the link indexes
+        without reading link rows."""
+
+        degrees = _LINK_DEGREES if include_degrees else ""
         with self.db.connect() as conn:
             if not include_targets:
                 rows = conn.execute(
-                    "SELECT * FROM item_links WHERE item_id = ?", (item_id,)
+                    f"SELECT l.*{degrees} FROM item_links l WHERE l.item_id = ?", (item_id,)
                 ).fetchall()
                 return [row_to_dict(r) for r in rows]
 
             rows = conn.execute(
-                """
-                SELECT l.link_id, l.item_id, l.rel, l.target_key, l.note, l.confidence, t.title AS target_title, t.kind AS target_kind
+                f"""
+                SELECT l.link_id, l.item_id, l.rel, l.target_key, l.note, l.confidence, t.title AS target_title, t.kind AS target_kind{degrees}
                 FROM item_links l
                 LEFT JOIN items t ON t.item_id = l.target_key
                 WHERE l.item_id = ?
@@ -375,10 +913,168 @@ class LinksRepo:
             ).fetchall()
             return [row_to_dict(r) for r in rows]
 
+    def backlinks(
+        self,
+        item_id: str,
+        *,
+        rel: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Links pointing at `item_id`, grouped by `rel`, newest first.
+
+        Every group carries its full `count` and up to `limit` links with the
+        source item's title; `next_cursor` pages through one group (the cursor
+        implies its `rel`). Counts and pages come from the (target_key, rel,
+        item_id) index in one query; only the returned links are read from the
+        table. The page is a bounded top-N per rel; left to itself the planner
+        walks idx_item_links_rel in rowid order instead, which scans the whole
+        rel for items with few backlinks.
+        """
+
+        after_sql = ""
+        after: List[Any] = []
+        if cursor:
+            kind, cursor_rel, last_rowid = _decode_cursor(cursor)
+            if kind != "backlinks" or (rel is not None and rel != cursor_rel) or not isinstance(last_rowid, int):
+                raise InvalidQueryError("invalid_cursor", "invalid cursor")
+            rel, after_sql, after = cursor_rel, " AND rowid < ?", [last_rowid]
+        rel_sql = " AND rel = ?" if rel is not None else ""
+        rel_params = [rel] if rel is not None else []
+
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                f"""
+                WITH counts AS (
+                  SELECT rel, count(*) AS rel_count FROM item_links WHERE target_key = ?{rel_sql} GROUP BY rel
+                )
+                SELECT c.rel, c.rel_count, l.rowid AS rid, l.link_id, l.item_id, s.title, s.kind, s.status,
+                       l.note, l.confidence, l.created_at
+                FROM counts c
+                LEFT JOIN item_links l ON l.rowid IN (
+                  SELECT rowid FROM item_links INDEXED BY idx_item_links_target_rel
+                  WHERE target_key = ? AND rel = c.rel{after_sql}
+                  ORDER BY rowid DESC LIMIT ?
+                )
+                LEFT JOIN items s ON s.item_id = l.item_id
+                ORDER BY c.rel, l.rowid DESC
+                """,
+                (item_id, *rel_params, item_id, *after, limit + 1),
+            ).fetchall()
+
+        groups: Dict[str, Dict[str, Any]] = {}
+        last_rowids: Dict[str, int] = {}
+        for row in rows:
+            rel_name = row["rel"]
+            group = groups.setdefault(
+                rel_name, {"rel": rel_name, "count": row["rel_count"], "links": [], "next_cursor": None}
+            )
+            if row["rid"] is None:
+                continue
+            if len(group["links"]) == limit:
+                group["next_cursor"] = _encode_cursor(["backlinks", rel_name, last_rowids[rel_name]])
+                continue
+            last_rowids[rel_name] = row["rid"]
+            link = row_to_dict(row)
+            for key in ("rel", "rel_count", "rid"):
+                del link[key]
+            group["links"].append(link)
+        return {
+            "item_id": item_id,
+            "total": sum(group["count"] for group in groups.values()),
+            "rels": list(groups.values()),
+        }
+
     def delete_link(self, link_id: str) -> None:
         with self.db.transaction() as cur:
             cur.execute("DELETE FROM item_links WHERE link_id = ?", (link_id,))
 
+    def head(self, item_id: str) -> str:
+        """The newest version of `item_id` along its supersedes chain."""
+
+        with self.db.connect() as conn:
+            row = conn.execute("SELECT head_id FROM item_heads WHERE item_id = ?", (item_id,)).fetchone()
+            return row["head_id"] if row else item_id
+
+    def graph(
+        self,
+        item_id: str,
+        *,
+        depth: int = 2,
+        rels: Optional[Sequence[str]] = None,
+        direction: str = "out",
+        limit: int = GRAPH_NODE_LIMIT,
+    ) -> Optional[Dict[str, Any]]:
+        """The subgraph reachable from `item_id` within `depth` hops, in one query.
+
+        `direction` follows links from source to target ("out"), backwards
+        ("in") or both ways. Nodes carry their shortest distance from the
+        root; edges are every link (of `rels`, when given) between two
+        returned nodes. Returns None when the root item does not exist.
+        """
+
+        if direction not in ("out", "in", "both"):
+            raise InvalidQueryError("invalid_direction", "direction must be out, in or both")
+        depth = max(0, min(depth, GRAPH_MAX_DEPTH))
+        rel_sql = " AND l.rel IN (SELECT value FROM json_each(?))" if rels else ""
+        rel_params = [json.dumps(list(rels))] if rels else []
+
+        # The walk is breadth first (ORDER BY depth) and UNION drops a node
+        # already queued at the same depth, so cycles end at the depth bound
+        # and LIMIT keeps the nearest nodes when the graph is too large.
+        steps: List[str] = []
+        params: List[Any] = [item_id]
+        for step in ("out", "in") if direction == "both" else (direction,):
+            to_node, from_node = _GRAPH_STEPS[step]
+            steps.append(
+                f"SELECT {to_node}, r.depth + 1 FROM reach r JOIN item_links l ON {from_node} = r.node "
+                f"WHERE r.depth < ?{rel_sql}"
+            )
+            params.extend([depth, *rel_params])
+        params.append(limit + 1)
+
+        with self.db.connect() as conn:
+            visited = conn.execute(
+                "WITH RECURSIVE reach(node, depth) AS ("
+                "SELECT ?, 0 UNION " + " UNION ".join(steps) + " ORDER BY 2 LIMIT ?) "
+                "SELECT node, depth FROM reach",
+                tuple(params),
+            ).fetchall()
+            truncated = len(visited) > limit
+            distances: Dict[str, int] = {}
+            for node, node_depth in visited[:limit]:
+                distances.setdefault(node, node_depth)
+            node_ids = json.dumps(list(distances))
+
+            rows = conn.execute(
+                """
+                SELECT n.value AS item_id, i.kind, i.title, i.status
+                FROM json_each(?) n
+                LEFT JOIN items i ON i.item_id = n.value
+                """,
+                (node_ids,),
+            ).fetchall()
+            if rows[0]["title"] is None:
+                return None
+            nodes = [{**row_to_dict(row), "depth": distances[row["item_id"]]} for row in rows]
+
+            edges = conn.execute(
+                f"""
+                SELECT l.link_id, l.item_id, l.rel, l.target_key, l.confidence
+                FROM json_each(?) n
+                CROSS JOIN item_links l ON l.item_id = n.value
+                WHERE l.target_key IN (SELECT value FROM json_each(?)){rel_sql}
+                ORDER BY l.item_id, l.rel, l.target_key
+                """,
+                (node_ids, node_ids, *rel_params),
+            ).fetchall()
+            return {
+                "root": item_id,
+                "nodes": nodes,
+                "edges": [row_to_dict(row) for row in edges],
+                "truncated": truncated,
+            }
+
 
 class SpeakerRepo:
     def __init__(self, db: Database) -> None:
@@ -432,8 +1128,25 @@ class SpeakerRepo:
 
 
 class SearchRepo:
-    def __init__(self, db: Database) -> None:
+    def __init__(
+        self,
+        db: Database,
+        cache: Optional[SearchCache] = None,
+        weights: Optional[Mapping[str, float]] = None,
+        vectors: Optional["VectorIndex"] = None,
+    ) -> None:
         self.db = db
+        self.cache = cache
+        self.vectors = vectors
+        weights = dict(BM25_WEIGHTS if weights is None else weights)
+        unknown = set(weights) - set(_FTS_COLUMNS["items_fts"][1:])
+        if unknown:
+            raise ValueError(f"unknown bm25 columns: {', '.join(sorted(unknown))}")
+        # Weights are validated floats, so they are inlined into the SQL.
+        self._bm25 = {
+            table: f"bm25({table}, {', '.join(repr(float(weights.get(c, 1.0))) for c in columns)})"
+            for table, columns in _FTS_COLUMNS.items()
+        }
 
     def _build_match(self, query: str) -> str:
         safe_terms = []
@@ -442,6 +1155,85 @@ class SearchRepo:
             safe_terms.append(f'"{cleaned}"')
         return " ".join(safe_terms)
 
+    def _route_terms(self, query: str) -> Dict[str, List[str]]:
+        """Split query terms by the index that can answer them.
+
+        unicode61 does not segment Japanese, so CJK terms go to the trigram
+        index; CJK terms shorter than a trigram fall back to a substring test.
+        """
+
+        routes: Dict[str, List[str]] = {"fts": [], "trigram": [], "substring": []}
+        for term in query.split():
+            if not _CJK_RE.search(term):
+                routes["fts"].append(term)
+            elif len(term) >= 3:
+                routes["trigram"].append(term)
+            else:
+                routes["substring"].append(term)
+        return routes
+
+    def _tag_filter(self, tags: Sequence[str]) -> tuple[str, List[Any]]:
+        """WHERE clause for a tag expression.
+
+        Every entry must match (AND); `a|b` matches either name (OR) and `-a`
+        excludes items carrying it (NOT). Names are resolved to tag ids first,
+        then the rarest clause drives the filter and the others are checked by
+        item through the (item_id, tag_id) key.
+        """
+
+        required: List[List[str]] = []
+        excluded: List[str] = []
+        for entry in tags:
+            if entry.startswith("-"):
+                excluded.append(entry[1:])
+            else:
+                required.append([name for name in entry.split("|") if name])
+        names = sorted({name for clause in required for name in clause} | set(excluded))
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                "SELECT tag_id, name FROM tags WHERE name IN (SELECT value FROM json_each(?))", (json.dumps(names),)
+            ).fetchall()
+            usage = {
+                row["value"]: int(row["count"])
+                for row in conn.execute(
+                    "SELECT value, count FROM facet_counts WHERE facet = 'tag' AND value IN (SELECT value FROM json_each(?))",
+                    (json.dumps(names),),
+                )
+            }
+        ids_by_name: Dict[str, List[int]] = {}
+        for row in rows:
+            ids_by_name.setdefault(row["name"], []).append(int(row["tag_id"]))
+
+        clauses = []
+        for clause in required:
+            ids = [tag_id for name in clause for tag_id in ids_by_name.get(name, [])]
+            if not ids:
+                return "0", []
+            clauses.append((sum(usage.get(name, 0) for name in clause), ids))
+        clauses.sort(key=lambda clause: clause[0])
+        excluded_ids = [tag_id for name in excluded for tag_id in ids_by_name.get(name, [])]
+
+        sql: List[str] = []
+        params: List[Any] = []
+        if clauses:
+            probes = "".join(
+                " AND EXISTS (SELECT 1 FROM item_tags x WHERE x.item_id = it.item_id"
+                " AND x.tag_id IN (SELECT value FROM json_each(?)))"
+                for _ in clauses[1:]
+            )
+            sql.append(
+                "i.item_id IN (SELECT it.item_id FROM item_tags it"
+                f" WHERE it.tag_id IN (SELECT value FROM json_each(?)){probes})"
+            )
+            params.extend(json.dumps(ids) for _, ids in clauses)
+        if excluded_ids:
+            sql.append(
+                "NOT EXISTS (SELECT 1 FROM item_tags x WHERE x.item_id = i.item_id"
+                " AND x.tag_id IN (SELECT value FROM json_each(?)))"
+            )
+            params.append(json.dumps(excluded_ids))
+        return " AND ".join(sql) or "1", params
+
     def search_items(
         self,
         *,
@@ -449,12 +1241,86 @@ class SearchRepo:
         kinds: Optional[Sequence[str]] = None,
         domain: Optional[str] = None,
         tags: Optional[Sequence[str]] = None,
+        heads_only: bool = False,
+        mode: str = "keyword",
         sort: str = "relevance",
         limit: int = 20,
         offset: int = 0,
+        cursor: Optional[str] = None,
+        total_cap: Optional[int] = SEARCH_TOTAL_CAP,
+        facets: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        snippet: Optional[int] = None,
     ) -> Dict[str, Any]:
+        """`total` stops counting at `total_cap` (None counts exactly); pass the
+        returned `next_cursor` back to page without OFFSET scans. With `facets`,
+        the result also carries kind, domain and tag counts of the matches.
+
+        `fields` projects each hit onto `SEARCH_FIELDS` (`item_id` is always
+        returned). `snippet=N` replaces `body` with a `snippet` of about N tokens
+        around the matches, cut by FTS5 inside SQLite.
+
+        `sort` is "relevance" (column-weighted bm25), "blended" (relevance
+        boosted by confidence and recency), "updated_at" or "created_at"; the
+        first two need a full-text query and otherwise fall back to updated_at.
+        `heads_only` leaves out items superseded by a newer version.
+
+        `mode` "semantic" ranks by the `vectors` index instead of FTS and
+        "hybrid" fuses both rankings; either ignores `sort`, needs a query
+        (without one they behave like "keyword") and snippets show the opening
+        of the body.
+        """
+
         kinds = kinds or []
         tags = tags or []
+        columns = self._search_columns(fields, snippet)
+        if snippet is not None and not 1 <= snippet <= SNIPPET_MAX_TOKENS:
+            raise InvalidQueryError("invalid_snippet", f"snippet must be between 1 and {SNIPPET_MAX_TOKENS} tokens")
+        if mode not in SEARCH_MODES:
+            raise InvalidQueryError("invalid_mode", f"unknown search mode: {mode}")
+        if mode != "keyword" and self.vectors is None:
+            raise InvalidQueryError("semantic_search_unavailable", f"{mode} search needs a vector index")
+        if mode != "keyword" and query and query.strip():
+            search = partial(self._vector_search, mode)
+        else:
+            search = partial(self._search, sort=sort)
+
+        if self.cache is None:
+            return search(
+                query, kinds, domain, tags, heads_only, limit, offset, cursor, total_cap, facets, columns, snippet
+            )
+        key = (
+            # Case is kept: short CJK terms go through a case-sensitive instr().
+            " ".join(query.split()) if query else "",
+            tuple(sorted(kinds)),
+            domain or "",
+            tuple(sorted(tags)),
+            heads_only,
+            mode,
+            sort,
+            limit,
+            offset,
+            cursor,
+            total_cap,
+            facets,
+            tuple(columns),
+            snippet,
+        )
+        # Read the generation first: a write committed while we query makes
+        # the stored entry stale instead of caching pre-write rows as current.
+        generation = self.db.generation
+        results = self.cache.get(key, generation)
+        if results is None:
+            results = search(
+                query, kinds, domain, tags, heads_only, limit, offset, cursor, total_cap, facets, columns, snippet
+            )
+            self.cache.put(key, generation, results)
+        return results
+
+    def _filters(
+        self, kinds: Sequence[str], domain: Optional[str], tags: Sequence[str], heads_only: bool
+    ) -> tuple[List[str], List[Any]]:
+        """WHERE clauses (on items `i`) and their parameters for the non-text filters."""
 
         params: List[Any] = ["deleted"]
         where_clauses = ["i.status != ?"]
@@ -464,76 +1330,378 @@ class SearchRepo:
             where_clauses.append(f"i.kind IN ({placeholders})")
             params.extend(kinds)
 
-        if domain:
+        if domain and domain.endswith(".*"):
+            # Subtree filter: expand the path through the domains index.
+            root = domain[:-2]
+            where_clauses.append(
+                "i.domain IN (SELECT domain FROM domains WHERE domain = ? OR (domain > ? AND domain < ?))"
+            )
+            params.extend([root, root + ".", root + "/"])
+        elif domain:
             where_clauses.append("i.domain = ?")
             params.append(domain)
 
-        join = ""
         if tags:
-            join = " JOIN item_tags it ON it.item_id = i.item_id JOIN tags t ON t.tag_id = it.tag_id "
-            where_clauses.append(
-                "i.item_id IN (SELECT it2.item_id FROM item_tags it2 JOIN tags t2 ON t2.tag_id = it2.tag_id WHERE t2.name IN (%s) GROUP BY it2.item_id HAVING COUNT(*) >= ? )"
-                % ",".join(["?"] * len(tags))
-            )
-            params.extend(tags)
-            params.append(len(tags))
+            tag_sql, tag_params = self._tag_filter(tags)
+            where_clauses.append(tag_sql)
+            params.extend(tag_params)
 
-        if sort == "relevance" and query:
-            order_clause = "ORDER BY bm25(f)"
-        elif sort == "created":
-            order_clause = "ORDER BY i.created_at DESC"
-        else:
-            order_clause = "ORDER BY i.updated_at DESC"
+        if heads_only:
+            # Uncorrelated: item_heads is read once into an ephemeral index.
+            where_clauses.append("i.item_id NOT IN (SELECT item_id FROM item_heads)")
+        return where_clauses, params
 
+    def _search(
+        self,
+        query: Optional[str],
+        kinds: Sequence[str],
+        domain: Optional[str],
+        tags: Sequence[str],
+        heads_only: bool,
+        limit: int,
+        offset: int,
+        cursor: Optional[str],
+        total_cap: Optional[int],
+        facets: bool,
+        columns: Sequence[str],
+        snippet: Optional[int],
+        *,
+        sort: str,
+    ) -> Dict[str, Any]:
+
+        where_clauses, params = self._filters(kinds, domain, tags, heads_only)
+
+        fts_table = None
+        fts_match = None
         if query:
-            match_query = self._build_match(query)
-            sql = (
-                "SELECT i.item_id, i.kind, i.schema_id, i.title, i.body, i.domain, i.created_at, i.updated_at, i.confidence, "
-                "(SELECT json_group_array(t.name) FROM item_tags it2 JOIN tags t ON t.tag_id = it2.tag_id WHERE it2.item_id = i.item_id) AS tags_json "
-                "FROM items_fts f JOIN items i ON i.item_id = f.item_id "
-                f"{join} "
-            )
-            if where_clauses:
-                sql += "WHERE f MATCH ? AND " + " AND ".join(where_clauses) + " "
-            else:
-                sql += "WHERE f MATCH ? "
-            sql += f"{order_clause} LIMIT ? OFFSET ?"
-            params = [match_query, *params, limit, offset]
+            routes = self._route_terms(query)
+            match_clauses: List[str] = []
+            match_params: List[Any] = []
+            for table, terms in (("items_fts", routes["fts"]), ("items_fts_trigram", routes["trigram"])):
+                if not terms:
+                    continue
+                if fts_table is None:
+                    fts_table = table
+                    fts_match = self._build_match(" ".join(terms))
+                    match_clauses.append(f"{table} MATCH ?")
+                else:
+                    match_clauses.append(f"i.rowid IN (SELECT rowid FROM {table} WHERE {table} MATCH ?)")
+                match_params.append(self._build_match(" ".join(terms)))
+            for term in routes["substring"]:
+                match_clauses.append("(instr(i.title, ?) > 0 OR instr(i.body, ?) > 0)")
+                match_params.extend([term, term])
+            where_clauses[:0] = match_clauses
+            params[:0] = match_params
+
+        if fts_table:
+            from_clause = f"FROM {fts_table} JOIN items i ON i.rowid = {fts_table}.rowid "
         else:
-            sql = (
-                "SELECT i.item_id, i.kind, i.schema_id, i.title, i.body, i.domain, i.created_at, i.updated_at, i.confidence, "
-                "(SELECT json_group_array(t.name) FROM item_tags it2 JOIN tags t ON t.tag_id = it2.tag_id WHERE it2.item_id = i.item_id) AS tags_json "
-                "FROM items i "
-                f"{join} "
+            from_clause = "FROM items i "
+
+        # Keyset order: every sort is made total by tie-breaking on item_id.
+        if sort == "relevance" and fts_table:
+            sort_name, sort_key, direction = "relevance", self._bm25[fts_table], "ASC"
+        elif sort == "blended" and fts_table:
+            # bm25 is negative (lower ranks first), so the boosts multiply it.
+            # Age is measured from the first page's clock, carried in the
+            # cursor, so later pages see the same scores.
+            now = _blend_reference(cursor) if cursor else _julian_now()
+            sort_name, direction = f"blended:{now!r}", "ASC"
+            sort_key = (
+                f"{self._bm25[fts_table]} * (1.0 + {BLEND_CONFIDENCE!r} * i.confidence)"
+                f" * ({BLEND_HALF_LIFE_DAYS!r} / ({BLEND_HALF_LIFE_DAYS!r} + max(0.0, {now!r} - julianday(i.updated_at))))"
             )
-            if where_clauses:
-                sql += "WHERE " + " AND ".join(where_clauses) + " "
-            sql += f"{order_clause} LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
+        elif sort in ("created", "created_at"):
+            sort_name, sort_key, direction = "created_at", "i.created_at", "DESC"
+        else:
+            sort_name, sort_key, direction = "updated_at", "i.updated_at", "DESC"
+
+        filter_sql = from_clause + "WHERE " + " AND ".join(where_clauses) + " "
+
+        page_params = list(params)
+        page_sql = filter_sql
+        if cursor:
+            cursor_sort, last_value, last_item_id = _decode_cursor(cursor)
+            if cursor_sort != sort_name:
+                raise InvalidQueryError("invalid_cursor", "cursor does not match sort order")
+            page_sql += f"AND ({sort_key}, i.item_id) {'>' if direction == 'ASC' else '<'} (?, ?) "
+            page_params.extend([last_value, last_item_id])
+            offset = 0
+
+        select, select_params = self._select(columns, fts_table, snippet)
+        # The page is picked first and the output columns are computed for its
+        # rows only: otherwise bodies, tag lists and snippets are built for
+        # every match before the sort throws all but `limit` of them away.
+        page_from = "FROM page JOIN items i ON i.rowid = page.rid "
+        if "snippet" in columns and fts_table:
+            page_from += f"JOIN {fts_table} ON {fts_table}.rowid = page.rid AND {fts_table} MATCH ? "
+            select_params.append(fts_match)
+        sql = (
+            f"WITH page AS MATERIALIZED (SELECT i.rowid AS rid, i.item_id, {sort_key} AS sort_value "
+            + page_sql
+            + f"ORDER BY {sort_key} {direction}, i.item_id {direction} LIMIT ? OFFSET ?) "
+            f"SELECT {', '.join(select)}, page.sort_value AS sort_value "
+            + page_from
+            + f"ORDER BY page.sort_value {direction}, page.item_id {direction}"
+        )
+        page_params.extend([limit, offset])
+        page_params.extend(select_params)
 
         with self.db.connect() as conn:
-            rows = conn.execute(sql, tuple(params)).fetchall()
+            total, total_capped = self._count(conn, filter_sql, params, total_cap)
+            rows = conn.execute(sql, tuple(page_params)).fetchall()
             items = []
+            last_key: Optional[List[Any]] = None
             for row in rows:
-                item = row_to_dict(row)
-                tags_json = item.pop("tags_json", None)
-                if tags_json:
-                    try:
-                        item["tags"] = json.loads(tags_json)
-                    except json.JSONDecodeError:
-                        item["tags"] = []
+                item = self._hit(row, columns)
+                last_key = [sort_name, item.pop("sort_value"), item["item_id"]]
+                items.append(item)
+            next_cursor = _encode_cursor(last_key) if last_key and len(items) == limit else None
+            results = {"total": total, "total_capped": total_capped, "items": items, "next_cursor": next_cursor}
+            if facets:
+                if query or kinds or domain or tags or heads_only:
+                    results["facets"] = self._facets(conn, filter_sql, params, total_cap)
                 else:
+                    results["facets"] = self._global_facets(conn)
+            return results
+
+    def _vector_search(
+        self,
+        mode: str,
+        query: str,
+        kinds: Sequence[str],
+        domain: Optional[str],
+        tags: Sequence[str],
+        heads_only: bool,
+        limit: int,
+        offset: int,
+        cursor: Optional[str],
+        total_cap: Optional[int],
+        facets: bool,
+        columns: Sequence[str],
+        snippet: Optional[int],
+    ) -> Dict[str, Any]:
+        where_clauses, params = self._filters(kinds, domain, tags, heads_only)
+        ranked = self._vector_candidates(query, where_clauses, params)
+        capped = len(ranked) >= VECTOR_CANDIDATES
+        if mode == "hybrid":
+            # total_cap=1: only the ranking is needed, not the count.
+            keyword = self._search(
+                query, kinds, domain, tags, heads_only, VECTOR_CANDIDATES, 0, None, 1, False, ["item_id"], None,
+                sort="relevance",
+            )["items"]
+            fused: Dict[str, float] = {}
+            for ranking in ([item_id for _, item_id in ranked], [hit["item_id"] for hit in keyword]):
+                for rank, item_id in enumerate(ranking, start=1):
+                    fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (RRF_K + rank)
+            ranked = [(score, item_id) for item_id, score in fused.items()]
+            capped = capped or len(keyword) >= VECTOR_CANDIDATES
+        ranked.sort(key=lambda hit: (-hit[0], hit[1]))
+
+        if cursor:
+            cursor_mode, last_score, last_item_id = _decode_cursor(cursor)
+            if cursor_mode != mode:
+                raise InvalidQueryError("invalid_cursor", "cursor does not match search mode")
+            ranked_page = [hit for hit in ranked if (-hit[0], hit[1]) > (-last_score, last_item_id)][:limit]
+        else:
+            ranked_page = ranked[offset : offset + limit]
+        page_ids = [item_id for _, item_id in ranked_page]
+        select, select_params = self._select(columns, None, snippet)
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(select)} FROM items i WHERE i.item_id IN (SELECT value FROM json_each(?))",
+                (*select_params, json.dumps(page_ids)),
+            ).fetchall()
+            by_id = {row["item_id"]: self._hit(row, columns) for row in rows}
+            items = [by_id[item_id] for item_id in page_ids if item_id in by_id]
+            next_cursor = (
+                _encode_cursor([mode, *ranked_page[-1]]) if ranked_page and len(ranked_page) == limit else None
+            )
+            total = len(ranked) if total_cap is None else min(len(ranked), total_cap)
+            results = {
+                "total": total,
+                "total_capped": capped or total < len(ranked),
+                "items": items,
+                "next_cursor": next_cursor,
+            }
+            if facets:
+                results["facets"] = self._facets(
+                    conn,
+                    "FROM items i WHERE i.item_id IN (SELECT value FROM json_each(?)) ",
+                    [json.dumps([item_id for _, item_id in ranked])],
+                    total_cap,
+                )
+            return results
+
+    def _vector_candidates(
+        self, query: str, where_clauses: Sequence[str], params: Sequence[Any]
+    ) -> List[Tuple[float, str]]:
+        """The best VECTOR_CANDIDATES (score, item_id) pairs among the filtered items."""
+
+        def keep(hits: List[Tuple[int, float]]) -> List[Tuple[float, str]]:
+            with self.db.connect() as conn:
+                allowed = {
+                    row["rowid"]: row["item_id"]
+                    for row in conn.execute(
+                        "SELECT i.rowid, i.item_id FROM items i WHERE i.rowid IN (SELECT value FROM json_each(?)) AND "
+                        + " AND ".join(where_clauses),
+                        (json.dumps([rowid for rowid, _ in hits]), *params),
+                    )
+                }
+            return [(score, allowed[rowid]) for rowid, score in hits if rowid in allowed][:VECTOR_CANDIDATES]
+
+        if len(where_clauses) == 1:
+            # Only the status filter, which the index already applies.
+            return keep(self.vectors.search(query, VECTOR_CANDIDATES))
+        # A broad filter keeps enough of an oversampled global top; the rest
+        # are scanned over their own items, or filtering the global top would
+        # leave a selective filter with few or no hits.
+        k = VECTOR_CANDIDATES * VECTOR_OVERSAMPLE
+        hits = self.vectors.search(query, k)
+        ranked = keep(hits)
+        if len(ranked) >= VECTOR_CANDIDATES or len(hits) < k:
+            return ranked
+        with self.db.connect() as conn:
+            rowids = [
+                row[0] for row in conn.execute("SELECT i.rowid FROM items i WHERE " + " AND ".join(where_clauses), params)
+            ]
+        return keep(self.vectors.search(query, VECTOR_CANDIDATES, rowids=rowids))
+
+    def _select(
+        self, columns: Sequence[str], fts_table: Optional[str], snippet: Optional[int]
+    ) -> tuple[List[str], List[Any]]:
+        select: List[str] = []
+        select_params: List[Any] = []
+        for column in columns:
+            if column == "tags":
+                select.append(
+                    "(SELECT json_group_array(t.name) FROM item_tags it2 JOIN tags t ON t.tag_id = it2.tag_id "
+                    "WHERE it2.item_id = i.item_id) AS tags_json"
+                )
+            elif column == "snippet" and fts_table:
+                body_column = _FTS_COLUMNS[fts_table].index("body")
+                select.append(f"snippet({fts_table}, {body_column}, ?, ?, ?, ?) AS snippet")
+                select_params.extend([SNIPPET_OPEN, SNIPPET_CLOSE, SNIPPET_ELLIPSIS, snippet])
+            elif column == "snippet":
+                # No FTS match to centre on: the opening of the body, roughly
+                # `snippet` tokens long, is cut in SQL so the body never leaves it.
+                select.append("CASE WHEN length(i.body) > ? THEN substr(i.body, 1, ?) || ? ELSE i.body END AS snippet")
+                select_params.extend([snippet * 8, snippet * 8, SNIPPET_ELLIPSIS])
+            else:
+                select.append(f"i.{column}")
+        return select, select_params
+
+    def _hit(self, row: sqlite3.Row, columns: Sequence[str]) -> Dict[str, Any]:
+        item = row_to_dict(row)
+        if "tags" in columns:
+            tags_json = item.pop("tags_json", None)
+            if tags_json:
+                try:
+                    item["tags"] = json.loads(tags_json)
+                except json.JSONDecodeError:
                     item["tags"] = []
-                items.append(item)
-            return {"total": len(items), "items": items}
+            else:
+                item["tags"] = []
+        return item
+
+    def _facets(
+        self, conn: sqlite3.Connection, filter_sql: str, params: Sequence[Any], cap: Optional[int]
+    ) -> Dict[str, Any]:
+        # The matches are collected once (at most `cap` of them, like `total`)
+        # and every facet is grouped from that materialized set. CROSS JOIN
+        # keeps the matches as the outer loop; grouping by tag_id otherwise
+        # tempts the planner into walking all of idx_item_tags_tag.
+        sql = (
+            "WITH m AS MATERIALIZED (SELECT i.item_id, i.kind, i.domain " + filter_sql + "LIMIT ?) "
+            "SELECT facet, value, count FROM ("
+            "  SELECT 'kind' AS facet, kind AS value, count(*) AS count FROM m"
+            "  GROUP BY kind ORDER BY count DESC, value LIMIT ?) "
+            "UNION ALL SELECT * FROM ("
+            "  SELECT 'domain', domain, count(*) AS count FROM m WHERE domain <> ''"
+            "  GROUP BY domain ORDER BY count DESC, domain LIMIT ?) "
+            "UNION ALL SELECT * FROM ("
+            "  SELECT 'tag', t.name, sum(g.count) AS count FROM ("
+            "    SELECT it.tag_id, count(*) AS count FROM m CROSS JOIN item_tags it ON it.item_id = m.item_id"
+            "    GROUP BY it.tag_id"
+            "  ) AS g JOIN tags t ON t.tag_id = g.tag_id"
+            "  GROUP BY t.name ORDER BY count DESC, t.name LIMIT ?) "
+            "UNION ALL SELECT 'matched', '', count(*) FROM m"
+        )
+        limit = -1 if cap is None else cap
+        rows = conn.execute(sql, (*params, limit, FACET_LIMIT, FACET_LIMIT, FACET_LIMIT)).fetchall()
+        matched = next(row["count"] for row in rows if row["facet"] == "matched")
+        result = self._facet_result([row for row in rows if row["facet"] != "matched"])
+        result["capped"] = cap is not None and matched >= cap
+        return result
+
+    def _global_facets(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        rows = conn.execute(
+            " UNION ALL ".join(
+                "SELECT * FROM (SELECT facet, value, count FROM facet_counts"
+                f" WHERE facet = '{facet}' AND count > 0 ORDER BY count DESC, value LIMIT ?)"
+                for facet, _ in _FACET_KEYS
+            ),
+            (FACET_LIMIT,) * len(_FACET_KEYS),
+        ).fetchall()
+        result = self._facet_result(rows)
+        result["capped"] = False
+        return result
+
+    def _facet_result(self, rows: Sequence[sqlite3.Row]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {name: [] for _, name in _FACET_KEYS}
+        names = dict(_FACET_KEYS)
+        for row in rows:
+            result[names[row["facet"]]].append({"value": row["value"], "count": int(row["count"])})
+        return result
+
+    def _search_columns(self, fields: Optional[Sequence[str]], snippet: Optional[int]) -> List[str]:
+        if fields:
+            unknown = set(fields) - set(SEARCH_FIELDS)
+            if unknown:
+                raise InvalidQueryError("invalid_fields", f"unknown search fields: {sorted(unknown)}")
+        columns = [f for f in SEARCH_FIELDS if not fields or f in fields or f == "item_id"]
+        if snippet is not None:
+            columns = [c for c in columns if c != "body"] + ["snippet"]
+        return columns
+
+    def _count(
+        self, conn: sqlite3.Connection, filter_sql: str, params: Sequence[Any], cap: Optional[int]
+    ) -> tuple[int, bool]:
+        if cap is None:
+            row = conn.execute("SELECT COUNT(*) " + filter_sql, tuple(params)).fetchone()
+            return int(row[0]), False
+        row = conn.execute("SELECT COUNT(*) FROM (SELECT 1 " + filter_sql + "LIMIT ?)", (*params, cap)).fetchone()
+        total = int(row[0])
+        return total, total >= cap
 
     def suggest_domains(self, prefix: str, limit: int = 20) -> List[str]:
+        """Domains and their parent paths starting with `prefix`, read from the domains index.
+
+        Parent paths count as suggestions even when no item uses them directly.
+        Matching ignores ASCII case, like the `LIKE` prefix match it replaced.
+        """
+
         with self.db.connect() as conn:
             rows = conn.execute(
-                "SELECT DISTINCT domain FROM items WHERE domain LIKE ? || '%' ORDER BY domain LIMIT ?",
-                (prefix, limit),
+                """
+                SELECT domain FROM domains
+                WHERE domain >= ? COLLATE NOCASE AND domain < ? COLLATE NOCASE
+                ORDER BY domain COLLATE NOCASE, domain
+                LIMIT ?
+                """,
+                (prefix, prefix + "\U0010ffff", limit),
             ).fetchall()
-            return [r["domain"] for r in rows if r["domain"]]
+            return [r["domain"] for r in rows]
+
+    def domain_children(self, parent: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Direct children of `parent` (top-level domains when None) with their item counts."""
+
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                "SELECT domain, item_count, subtree_count FROM domains WHERE parent IS ? ORDER BY domain",
+                (parent,),
+            ).fetchall()
+            return [row_to_dict(r) for r in rows]
 
 
 class ImportRepo:
@@ -560,6 +1728,47 @@ class ImportRepo:
                 (job_id, source_type, thread_id, chunk_id, digest, hint, json.dumps(source_json)),
             )
 
+    def update_job_source(
+        self,
+        job_id: str,
+        *,
+        source_json: Dict[str, Any],
+        source_type: str = "chatgpt_export_json",
+        thread_id: Optional[str] = None,
+        chunk_id: Optional[str] = None,
+        digest: Optional[str] = None,
+        hint: Optional[str] = None,
+    ) -> None:
+        with self.db.transaction() as cur:
+            cur.execute(
+                """
+                UPDATE import_jobs
+                SET source_type = ?, thread_id = ?, chunk_id = ?, digest = ?, hint = ?, source_json = ?
+                WHERE job_id = ?
+                """,
+                (source_type, thread_id, chunk_id, digest, hint, json.dumps(source_json), job_id),
+            )
+
+    def apply_classification(self, job_id: str, classification: Dict[str, Any]) -> None:
+        """Reset decision, skip_type and reason from `classification` where the item does not set them."""
+
+        with self.db.transaction() as cur:
+            cur.execute(
+                """
+                UPDATE import_candidates SET
+                  decision = CASE WHEN json_type(item_json, '$.decision') IS NULL THEN ? ELSE decision END,
+                  skip_type = CASE WHEN json_type(item_json, '$.skip_type') IS NULL THEN ? ELSE skip_type END,
+                  reason = CASE WHEN json_type(item_json, '$.reason') IS NULL THEN ? ELSE reason END
+                WHERE job_id = ?
+                """,
+                (
+                    classification.get("decision", "KEEP"),
+                    classification.get("skip_type", "NONE"),
+                    classification.get("reason"),
+                    job_id,
+                ),
+            )
+
     def add_candidate(
         self,
         *,
@@ -588,6 +1797,51 @@ class ImportRepo:
                 ),
             )
 
+    def add_candidates(self, job_id: str, candidates: Sequence[Dict[str, Any]]) -> None:
+        if not candidates:
+            return
+        with self.db.transaction() as cur:
+            cur.executemany(
+                """
+                INSERT INTO import_candidates(candidate_id, job_id, temp_item_id, decision, skip_type, reason, item_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    (
+                        c["candidate_id"],
+                        job_id,
+                        c["temp_item_id"],
+                        c.get("decision", "KEEP"),
+                        c.get("skip_type", "NONE"),
+                        c.get("reason"),
+                        json.dumps(c["item_json"]),
+                    )
+                    for c in candidates
+                ),
+            )
+
+    def add_job_chunks(self, job_id: str, chunks: Sequence[tuple[int, Dict[str, Any]]]) -> None:
+        if not chunks:
+            return
+        with self.db.transaction() as cur:
+            cur.executemany(
+                "INSERT INTO import_job_chunks(job_id, chunk_index, source_json) VALUES (?, ?, ?)",
+                ((job_id, index, json.dumps(source)) for index, source in chunks),
+            )
+
+    def list_job_chunks(self, job_id: str) -> List[Dict[str, Any]]:
+        """Chunk sources in `{"source": ...}` form, indexed like `_chunk_index`."""
+
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                "SELECT source_json FROM import_job_chunks WHERE job_id = ? ORDER BY chunk_index", (job_id,)
+            ).fetchall()
+            return [{"source": json.loads(row["source_json"])} for row in rows]
+
+    def delete_job(self, job_id: str) -> None:
+        with self.db.transaction() as cur:
+            cur.execute("DELETE FROM import_jobs WHERE job_id = ?", (job_id,))
+
     def map_temp_id(self, job_id: str, temp_item_id: str, item_id: str) -> None:
         with self.db.transaction() as cur:
             cur.execute(
@@ -598,6 +1852,13 @@ class ImportRepo:
                 (job_id, temp_item_id, item_id),
             )
 
+    def map_temp_ids(self, job_id: str, id_map: Mapping[str, str]) -> None:
+        with self.db.transaction() as cur:
+            cur.executemany(
+                "INSERT OR REPLACE INTO import_id_map(job_id, temp_item_id, item_id) VALUES (?, ?, ?)",
+                ((job_id, temp_item_id, item_id) for temp_item_id, item_id in id_map.items()),
+            )
+
     def list_candidates(self, job_id: str) -> List[Dict[str, Any]]:
         with self.db.connect() as conn:
             rows = conn.execute("SELECT * FROM import_candidates WHERE job_id = ?", (job_id,)).fetchall()
@@ -641,23 +1902,60 @@ class ImportRepo:
                 (status, job_id),
             )
 
+    def set_commit_state(
+        self,
+        job_id: str,
+        state: str,
+        *,
+        processed: Optional[int] = None,
+        total: Optional[int] = None,
+        error: Optional[str] = None,
+        result: Optional[Dict[str, Any]] = None,
+        owner: Optional[str] = None,
+    ) -> None:
+        with self.db.transaction() as cur:
+            cur.execute(
+                """
+                UPDATE import_jobs
+                SET commit_state = ?, commit_processed = COALESCE(?, commit_processed),
+                    commit_total = COALESCE(?, commit_total), commit_error = ?, commit_result = ?,
+                    commit_owner = COALESCE(?, commit_owner),
+                    updated_at = (strftime('%Y-%m-%dT%H:%M:%fZ','now'))
+                WHERE job_id = ?
+                """,
+                (state, processed, total, error, json.dumps(result) if result is not None else None, owner, job_id),
+            )
+
+    def pending_commit_owners(self, states: Sequence[str]) -> List[Optional[str]]:
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT commit_owner FROM import_jobs WHERE commit_state IN (%s)"
+                % ",".join(["?"] * len(states)),
+                tuple(states),
+            ).fetchall()
+            return [row[0] for row in rows]
 
-class RawJsonRepo:
-    def __init__(self, db: Database) -> None:
-        self.db = db
-        self._ensure_table()
+    def fail_pending_commits(self, states: Sequence[str], error: str, *, owners: Sequence[Optional[str]]) -> int:
+        """Fail the commits in `states` that belong to `owners` (None: commits with no owner)."""
 
-    def _ensure_table(self) -> None:
+        named = [owner for owner in owners if owner is not None]
         with self.db.transaction() as cur:
             cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS raw_json_store (
-                  raw_json_id   INTEGER PRIMARY KEY AUTOINCREMENT,
-                  raw_json_text TEXT NOT NULL,
-                  created_at    TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now'))
-                )
-                """
+                "UPDATE import_jobs SET commit_state = 'failed', commit_error = ? WHERE commit_state IN (%s) "
+                "AND (commit_owner IN (%s)%s)"
+                % (
+                    ",".join(["?"] * len(states)),
+                    ",".join(["?"] * len(named)),
+                    " OR commit_owner IS NULL" if None in owners else "",
+                ),
+                (error, *states, *named),
             )
+            return cur.rowcount
+
+
+class RawJsonRepo:
+    def __init__(self, db: Database) -> None:
+        self.db = db
 
     def create_raw_json(self, raw_json_text: str, created_at: Optional[str] = None) -> int:
         with self.db.transaction() as cur:
@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .db import Database
+
+
+# Local vector search over items.title + body, with no model and no network.
+#
+# Texts are cut into words; each word also contributes its character trigrams
+# (CJK runs contribute their character bigrams instead), so inflected or
+# compounded forms land near each other where whole-word FTS sees nothing in
+# common. Features are hashed with a sign bit into VECTOR_DIM dimensions, term
+# frequencies are dampened with 1 + ln(tf) and each item vector is L2
+# normalised. Queries are weighted by IDF from the items_fts vocabulary, so a
+# hit is scored like a TF-IDF dot product.
+#
+# Vectors live in a memory-mapped float32 matrix next to the database (one
+# row per live item, keyed by items.rowid) and are scored brute force in
+# blocks. Triggers record every text change in item_vector_changes; the index
+# applies the rows newer than the last `seq` it saw before each search.
+VECTOR_DIM = 512
+TITLE_WEIGHT = 2.0
+SEARCH_BLOCK_ROWS = 65_536
+_BUILD_BATCH = 5_000
+
+_TOKEN_RE = re.compile(r"\w+")
+# Same ranges as the search router's CJK test.
+_CJK_RE = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f]")
+
+
+def default_vector_search() -> bool:
+    """Semantic search is on when numpy is installed, unless `VECTOR_SEARCH=off`."""
+
+    return np is not None and os.environ.get("VECTOR_SEARCH", "on") != "off"
+
+
+def terms(text: str) -> List[str]:
+    return _TOKEN_RE.findall(unicodedata.normalize("NFKC", text).lower())
+
+
+@lru_cache(maxsize=200_000)
+def _term_features(term: str) -> Tuple[Tuple[int, float], ...]:
+    """(dimension, signed weight) pairs of a term: the word plus its n-grams.
+
+    The n-grams of a term share one unit of weight, so a shared word and a
+    shared spelling count about the same.
+    """
+
+    if _CJK_RE.search(term):
+        grams = [term[n : n + 2] for n in range(len(term) - 1)]
+    else:
+        padded = f"<{term}>"
+        grams = [padded[n : n + 3] for n in range(len(padded) - 2)] if len(term) > 3 else []
+    features = [(term, 1.0)]
+    features.extend((gram, 1.0 / math.sqrt(len(grams))) for gram in grams)
+    pairs = []
+    for feature, weight in features:
+        value = zlib.crc32(feature.encode("utf-8"))
+        pairs.append(((value >> 1) % VECTOR_DIM, weight if value & 1 else -weight))
+    return tuple(pairs)
+
+
+def _vector(weighted_terms: Dict[str, float]) -> "np.ndarray":
+    dims: List[int] = []
+    values: List[float] = []
+    for term, weight in weighted_terms.items():
+        for dim, value in _term_features(term):
+            dims.append(dim)
+            values.append(value * weight)
+    vec = np.bincount(dims, weights=values, minlength=VECTOR_DIM).astype(np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+
+def vectorize(title: str, body: str) -> "np.ndarray":
+    counts: Counter = Counter()
+    for term in terms(title):
+        counts[term] += TITLE_WEIGHT
+    counts.update(terms(body))
+    return _vector({term: 1.0 + math.log(count) for term, count in counts.items()})
+
+
+class VectorIndex:
+    """Memory-mapped item vectors kept in step with `items`.
+
+    The files (`<db>.vectors.npy`, `<db>.vectors.rowids.npy` and a small JSON
+    with the applied `seq`) are a cache: deleting them makes the next search
+    rebuild from `items`. One process should own them at a time.
+    """
+
+    def __init__(self, db: "Database", path: Optional[os.PathLike[str] | str] = None) -> None:
+        if np is None:
+            raise RuntimeError("vector search needs numpy")
+        self.db = db
+        self.path = Path(path) if path else db.db_path.with_name(db.db_path.name + ".vectors.npy")
+        self._rowids_path = self.path.with_name(self.path.stem + ".rowids.npy")
+        self._meta_path = self.path.with_suffix(".json")
+        self._lock = threading.RLock()
+        self._matrix: Optional["np.ndarray"] = None
+        self._rowids: Optional["np.ndarray"] = None
+        self._slots: Dict[int, int] = {}
+        self._size = 0
+        self._seq = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size
+
+    def refresh(self) -> int:
+        """Apply item changes committed since the last call; returns how many."""
+
+        with self._lock:
+            if self._matrix is None and not self._load():
+                return self.rebuild()
+            with self.db.connect() as conn:
+                # Any commit, from this process or another one, moves max(seq);
+                # the check is one step down idx_item_vector_changes_seq.
+                latest = conn.execute("SELECT coalesce(max(seq), 0) FROM item_vector_changes").fetchone()[0]
+                if latest == self._seq:
+                    return 0
+                rows = conn.execute(
+                    """
+                    SELECT c.item_rowid, c.seq, i.title, i.body, i.status
+                    FROM item_vector_changes c
+                    LEFT JOIN items i ON i.rowid = c.item_rowid
+                    WHERE c.seq > ?
+                    ORDER BY c.seq
+                    """,
+                    (self._seq,),
+                ).fetchall()
+            for item_rowid, seq, title, body, status in rows:
+                if title is None or status == "deleted":
+                    self._remove(item_rowid)
+                else:
+                    self._put(item_rowid, vectorize(title, body))
+                self._seq = seq
+            if rows:
+                self._save()
+            return len(rows)
+
+    def rebuild(self) -> int:
+        """Vectorize every live item into fresh files; returns the item count."""
+
+        with self._lock:
+            with self.db.connect() as conn:
+                # Changes after this seq are replayed by the next refresh, so
+                # rows written during the scan are never missed.
+                seq = conn.execute("SELECT coalesce(max(seq), 0) FROM item_vector_changes").fetchone()[0]
+                count = conn.execute("SELECT count(*) FROM items WHERE status != 'deleted'").fetchone()[0]
+                self._open(max(count, 1024), create=True)
+                rows = conn.execute("SELECT rowid, title, body FROM items WHERE status != 'deleted' ORDER BY rowid")
+                while batch := rows.fetchmany(_BUILD_BATCH):
+                    for item_rowid, title, body in batch:
+                        self._put(item_rowid, vectorize(title, body))
+            self._seq = seq
+            self._save()
+            return self._size
+
+    def search(self, query: str, k: int, rowids: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """Up to `k` (items.rowid, score) pairs with a positive score, best first.
+
+        `rowids` limits the scan to those items, so a filtered search gets the
+        best `k` of its own matches rather than what is left of the global top.
+        """
+
+        with self._lock:
+            self.refresh()
+            weights = self._query_weights(terms(query))
+            if not weights:
+                return []
+            q = _vector(weights)
+            best_scores: List["np.ndarray"] = []
+            best_rows: List["np.ndarray"] = []
+            wanted = None
+            if rowids is not None:
+                wanted = np.isin(self._rowids[: self._size], np.fromiter(rowids, dtype=np.int64))
+            for start in range(0, self._size, SEARCH_BLOCK_ROWS):
+                stop = min(start + SEARCH_BLOCK_ROWS, self._size)
+                if wanted is None:
+                    rows = np.arange(start, stop)
+                    scores = self._matrix[start:stop] @ q
+                else:
+                    rows = start + np.flatnonzero(wanted[start:stop])
+                    if len(rows) * 4 < stop - start:
+                        # A sparse filter: read only its rows.
+                        scores = self._matrix[rows] @ q
+                    else:
+                        scores = (self._matrix[start:stop] @ q)[rows - start]
+                if len(scores) > k:
+                    top = np.argpartition(scores, -k)[-k:]
+                    scores = scores[top]
+                    rows = rows[top]
+                best_scores.append(scores)
+                best_rows.append(rows)
+            if not best_scores:
+                return []
+            scores = np.concatenate(best_scores)
+            rows = np.concatenate(best_rows)
+            order = np.argsort(-scores, kind="stable")[:k]
+            return [(int(self._rowids[rows[n]]), float(scores[n])) for n in order if scores[n] > 0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._rowids.flush()
+            self._matrix = self._rowids = None
+
+    def _query_weights(self, query_terms: Sequence[str]) -> Dict[str, float]:
+        if not query_terms:
+            return {}
+        unique = sorted(set(query_terms))
+        total = max(self._size, 1)
+        with self.db.connect() as conn:
+            df = {
+                term: conn.execute("SELECT doc FROM items_fts_vocab WHERE term = ?", (term,)).fetchone()
+                for term in unique
+            }
+        return {term: math.log((total + 1) / ((row[0] if row else 0) + 1)) + 1.0 for term, row in df.items()}
+
+    def _load(self) -> bool:
+        try:
+            meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if meta.get("dim") != VECTOR_DIM or not self.path.exists() or not self._rowids_path.exists():
+            return False
+        with self.db.connect() as conn:
+            latest = conn.execute("SELECT coalesce(max(seq), 0) FROM item_vector_changes").fetchone()[0]
+        if meta["seq"] > latest:
+            # The files belong to another (or a restored) database.
+            return False
+        self._open(0, create=False)
+        self._size = meta["size"]
+        self._seq = meta["seq"]
+        self._slots = {int(rowid): slot for slot, rowid in enumerate(self._rowids[: self._size])}
+        return True
+
+    def _open(self, capacity: int, *, create: bool) -> None:
+        self.close()
+        if create:
+            self._matrix = np.lib.format.open_memmap(
+                self.path, mode="w+", dtype=np.float32, shape=(capacity, VECTOR_DIM)
+            )
+            self._rowids = np.lib.format.open_memmap(self._rowids_path, mode="w+", dtype=np.int64, shape=(capacity,))
+            self._slots, self._size = {}, 0
+        else:
+            self._matrix = np.load(self.path, mmap_mode="r+")
+            self._rowids = np.load(self._rowids_path, mmap_mode="r+")
+
+    def _save(self) -> None:
+        self._matrix.flush()
+        self._rowids.flush()
+        tmp = self._meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"dim": VECTOR_DIM, "size": self._size, "seq": self._seq}), encoding="utf-8")
+        os.replace(tmp, self._meta_path)
+
+    def _grow(self) -> None:
+        capacity = len(self._rowids) * 2
+        matrix_tmp = self.path.with_name(self.path.stem + ".grow.npy")
+        rowids_tmp = self._rowids_path.with_name(self._rowids_path.stem + ".grow.npy")
+        matrix = np.lib.format.open_memmap(matrix_tmp, mode="w+", dtype=np.float32, shape=(capacity, VECTOR_DIM))
+        rowids = np.lib.format.open_memmap(rowids_tmp, mode="w+", dtype=np.int64, shape=(capacity,))
+        matrix[: self._size] = self._matrix[: self._size]
+        rowids[: self._size] = self._rowids[: self._size]
+        matrix.flush()
+        rowids.flush()
+        # Drop every mapping before replacing the files (Windows refuses to
+        # replace a mapped file).
+        del matrix, rowids
+        self._matrix = self._rowids = None
+        os.replace(matrix_tmp, self.path)
+        os.replace(rowids_tmp, self._rowids_path)
+        self._open(0, create=False)
+
+    def _put(self, item_rowid: int, vec: "np.ndarray") -> None:
+        slot = self._slots.get(item_rowid)
+        if slot is None:
+            if self._size == len(self._rowids):
+                self._grow()
+            slot = self._size
+            self._size += 1
+            self._slots[item_rowid] = slot
+            self._rowids[slot] = item_rowid
+        self._matrix[slot] = vec
+
+    def _remove(self, item_rowid: int) -> None:
+        slot = self._slots.pop(item_rowid, None)
+        if slot is None:
+            return
+        last = self._size - 1
+        if slot != last:
+            # Move the last row into the hole so live rows stay contiguous.
+            self._matrix[slot] = self._matrix[last]
+            moved = int(self._rowids[last])
+            self._rowids[slot] = moved
+            self._slots[moved] = slot
+        self._size = last
@@ -0,0 +1,91 @@
+"""Backlinks: the grouped, paged `/backlinks` query versus fetching every link.
+
+Seeds `--items` items with `--links` random links, plus `--hub` links that
+all point at one item. The baseline is what a client does without the
+endpoint: read every link whose target is the item (with source titles),
+then group by rel and keep the first page of each group in Python. Also
+times `list_links_for_item` with and without the target degree counts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from collections import defaultdict
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.db import row_to_dict
+from app.repositories import LinksRepo
+
+RELS = ("born_from", "supersedes", "related", "contradicts")
+
+
+def backlinks_by_fetching_all(links: LinksRepo, item_id: str, limit: int) -> dict:
+    with links.db.connect() as conn:
+        rows = conn.execute(
+            """
+            SELECT l.link_id, l.item_id, l.rel, s.title, s.kind, s.status, l.note, l.confidence, l.created_at
+            FROM item_links l
+            LEFT JOIN items s ON s.item_id = l.item_id
+            WHERE l.target_key = ?
+            ORDER BY l.created_at DESC
+            """,
+            (item_id,),
+        ).fetchall()
+    groups: dict = defaultdict(list)
+    for row in rows:
+        groups[row["rel"]].append(row_to_dict(row))
+    return {rel: {"count": len(group), "links": group[:limit]} for rel, group in groups.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--links", type=int, default=1_000_000)
+    parser.add_argument("--hub", type=int, default=50_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        item_ids = seed_items(db, args.items)
+        hub = item_ids[0]
+        with db.transaction() as cur:
+            cur.executemany(
+                "INSERT INTO item_links(link_id, item_id, rel, target_key) VALUES (?, ?, ?, ?)",
+                (
+                    (f"link-{n:08d}", rng.choice(item_ids), rng.choice(RELS), hub if n < args.hub else rng.choice(item_ids))
+                    for n in range(args.links + args.hub)
+                ),
+            )
+        links = LinksRepo(db)
+        typical = rng.sample(item_ids[1:], args.repeat)
+
+        rows = []
+        for label, targets in (("typical item", typical), (f"hub ({args.hub} backlinks)", [hub] * args.repeat)):
+            for method, fn in (
+                ("grouped query", lambda t: links.backlinks(t, limit=args.limit)),
+                ("fetch all", lambda t: backlinks_by_fetching_all(links, t, args.limit)),
+            ):
+                calls = iter(targets)
+                stats = summarize(time_calls(lambda: fn(next(calls)), args.repeat))
+                rows.append((f"backlinks, {label}", method, stats["p50_ms"], stats["p95_ms"]))
+        for degrees in (False, True):
+            calls = iter(typical)
+            stats = summarize(
+                time_calls(
+                    lambda: links.list_links_for_item(next(calls), include_targets=True, include_degrees=degrees),
+                    args.repeat,
+                )
+            )
+            rows.append(("list_links_for_item", "with degrees" if degrees else "plain", stats["p50_ms"], stats["p95_ms"]))
+        db.close()
+
+    print_table(("operation", "method", "p50_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Loading link titles: one `GET /items/{id}` per id versus `get_items`.
+
+"per item" repeats what the endpoint does for each id (item, payload and tags
+on separate connections); "batch" is `ItemsRepo.get_items` with the
+projection the frontend uses for link lists, and "batch full" adds payloads
+and tags.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import ItemsRepo, TagsRepo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        item_ids = seed_items(db, args.items)
+        items, tags = ItemsRepo(db), TagsRepo(db)
+        rng = random.Random(7)
+
+        def per_item(ids: list) -> None:
+            for item_id in ids:
+                items.get_item(item_id)
+                items.get_payload(item_id)
+                tags.get_tags_for_item(item_id)
+
+        rows = []
+        for links in (5, 20, 100):
+            ids = rng.sample(item_ids, links)
+            cases = (
+                ("per item", lambda: per_item(ids)),
+                ("batch", lambda: items.get_items(ids, fields=["title", "kind"])),
+                ("batch full", lambda: items.get_items(ids, include_payload=True, include_tags=True)),
+            )
+            for label, fn in cases:
+                stats = summarize(time_calls(fn, args.repeat))
+                rows.append((links, label, stats["mean_ms"], stats["p95_ms"]))
+        db.close()
+
+    print_table(("links", "fetch", "mean_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Single-row versus bulk repository writes.
+
+Each case writes `--rows` rows inside one unit of work, once through the
+single-row methods in a loop and once through the bulk method:
+
+- create: `create_item` + `add_payload` vs `create_items`
+- upsert: `find_item_by_stable_key` + `update_item`/`create_item` vs `upsert_items`
+  (half of the stable keys already exist)
+- tags: `replace_item_tags` per item vs one `replace_tags_bulk`
+- links: `create_link` vs `create_links_bulk`
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import ItemsRepo, LinksRepo, TagsRepo
+
+_run = itertools.count()
+
+
+def item_rows(prefix: str, count: int, *, stable: bool = False) -> list:
+    return [
+        {
+            "item_id": f"{prefix}-{n}",
+            "chunk_id": "chunk-bench",
+            "kind": "knowledge",
+            "schema_id": "knowledge/howto.v1",
+            "title": f"Bulk {n}",
+            "body": "body text",
+            "stable_key": f"bench/{n * 2}" if stable else None,
+            "confidence": 0.5,
+            "payload": {"n": n},
+        }
+        for n in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--rows", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        item_ids = seed_items(db, args.items)
+        items, tags, links = ItemsRepo(db), TagsRepo(db), LinksRepo(db)
+        with db.unit_of_work():
+            items.create_items(
+                [{**row, "item_id": f"stable-{n}", "stable_key": f"bench/{n}"} for n, row in enumerate(item_rows("s", args.rows))]
+            )
+        targets = item_ids[: args.rows]
+
+        def single_create() -> None:
+            with db.unit_of_work():
+                for row in item_rows(f"single-{next(_run)}", args.rows):
+                    items.create_item(**{k: v for k, v in row.items() if k != "payload"})
+                    items.add_payload(row["item_id"], row["payload"])
+
+        def bulk_create() -> None:
+            with db.unit_of_work():
+                items.create_items(item_rows(f"bulk-{next(_run)}", args.rows))
+
+        def single_upsert() -> None:
+            with db.unit_of_work():
+                for row in item_rows(f"su-{next(_run)}", args.rows, stable=True):
+                    existing = items.find_item_by_stable_key(row["stable_key"], kind=row["kind"])
+                    fields = {k: v for k, v in row.items() if k not in ("payload", "item_id")}
+                    if existing:
+                        items.update_item(item_id=existing["item_id"], **fields)
+                    else:
+                        items.create_item(item_id=row["item_id"], **fields)
+                    items.add_payload(existing["item_id"] if existing else row["item_id"], row["payload"])
+
+        def bulk_upsert() -> None:
+            with db.unit_of_work():
+                items.upsert_items(item_rows(f"bu-{next(_run)}", args.rows, stable=True))
+
+        tag_sets = {item_id: [{"name": f"tag{(n + k) % 300}"} for k in range(4)] for n, item_id in enumerate(targets)}
+
+        def single_tags() -> None:
+            with db.unit_of_work():
+                for item_id, item_tags in tag_sets.items():
+                    tags.replace_item_tags(item_id, item_tags)
+
+        def bulk_tags() -> None:
+            with db.unit_of_work():
+                tags.replace_tags_bulk(tag_sets)
+
+        def link_rows() -> list:
+            run = next(_run)
+            return [
+                {"link_id": f"link-{run}-{n}", "item_id": targets[n], "rel": "related", "target_key": targets[-n - 1]}
+                for n in range(args.rows)
+            ]
+
+        def single_links() -> None:
+            with db.unit_of_work():
+                for link in link_rows():
+                    links.create_link(**link)
+
+        def bulk_links() -> None:
+            with db.unit_of_work():
+                links.create_links_bulk(link_rows())
+
+        rows = []
+        for case, single, bulk in (
+            ("create", single_create, bulk_create),
+            ("upsert", single_upsert, bulk_upsert),
+            ("tags", single_tags, bulk_tags),
+            ("links", single_links, bulk_links),
+        ):
+            single_stats = summarize(time_calls(single, args.repeat))
+            bulk_stats = summarize(time_calls(bulk, args.repeat))
+            rows.append((case, single_stats["mean_ms"], bulk_stats["mean_ms"], f"{single_stats['mean_ms'] / bulk_stats['mean_ms']:.1f}x"))
+        db.close()
+
+    print_table(("case", "single_ms", "bulk_ms", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
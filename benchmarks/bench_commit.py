@@ -0,0 +1,76 @@
+"""Import commit time against candidate count.
+
+Creates an import job with N candidates (tags and links included) and times
+`POST /import/jobs/{job_id}/commit`. `--per-call` disables the unit of work so
+every repository call commits on its own, as the endpoint used to.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from contextlib import contextmanager
+
+from common import SCHEMA_PATH, print_table, temp_db_path
+
+from fastapi.testclient import TestClient
+
+from app.db import Database
+from app.main import create_app
+
+
+@contextmanager
+def _no_unit_of_work(self):
+    yield None
+
+
+def build_extraction(count: int, tags_per_item: int) -> dict:
+    items = []
+    for n in range(count):
+        items.append(
+            {
+                "item_id": f"temp-id:{n}",
+                "kind": "knowledge" if n % 2 else "summary",
+                "schema_id": "knowledge/howto.v1",
+                "stable_key": f"bench/{n}" if n % 2 else None,
+                "title": f"Candidate {n}",
+                "body": f"Body of candidate {n}",
+                "tags": [{"name": f"tag{(n + k) % 50}"} for k in range(tags_per_item)],
+                "links": [{"rel": "related", "target_key": f"temp-id:{n - 1}"}] if n else [],
+            }
+        )
+    return {"source": {"thread_id": "bench", "digest": f"digest-{count}"}, "items": items}
+
+
+def time_commit(count: int, tags_per_item: int) -> float:
+    with temp_db_path() as db_path:
+        client = TestClient(create_app(db_path=str(db_path), schema_path=str(SCHEMA_PATH)))
+        job = client.post("/import/jobs", json={"extraction": build_extraction(count, tags_per_item)})
+        job_id = job.json()["job_id"]
+        start = time.perf_counter()
+        response = client.post(f"/import/jobs/{job_id}/commit")
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.text
+        client.app.state.db.close()
+        return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", default="10,50,200,500")
+    parser.add_argument("--tags", type=int, default=3)
+    parser.add_argument("--per-call", action="store_true", help="commit every repository call separately")
+    args = parser.parse_args()
+
+    if args.per_call:
+        Database.unit_of_work = _no_unit_of_work  # type: ignore[assignment]
+
+    rows = []
+    for count in (int(c) for c in args.counts.split(",")):
+        elapsed = time_commit(count, args.tags)
+        rows.append((count, elapsed * 1000, elapsed * 1000 / count))
+    print_table(("candidates", "commit_ms", "ms_per_candidate"), rows)
+
+
+if __name__ == "__main__":
+    main()
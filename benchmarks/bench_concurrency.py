@@ -0,0 +1,85 @@
+"""Mixed readers and writers against each storage profile.
+
+Reader threads run `SearchRepo.search_items` (FTS query) while writer threads
+insert items with `ItemsRepo.create_item`. Each profile gets a fresh database
+seeded with the same rows; the table reports throughput and latency per role.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import threading
+import time
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path
+
+from app.repositories import ItemsRepo, SearchRepo
+
+
+def run_profile(profile: str, items: int, readers: int, writers: int, duration: float) -> list:
+    with temp_db_path() as db_path:
+        db = make_database(db_path, storage_profile=profile, pool_size=readers + 1)
+        seed_items(db, items)
+        search, repo = SearchRepo(db), ItemsRepo(db)
+        counter = itertools.count()
+        stop = threading.Event()
+        samples = {"read": [], "write": []}
+
+        def reader(n: int) -> None:
+            queries = ["sqlite", f"keyword{n % 13}", "topic5", "search words"]
+            for q in itertools.cycle(queries):
+                if stop.is_set():
+                    return
+                start = time.perf_counter()
+                search.search_items(query=q, limit=20)
+                samples["read"].append(time.perf_counter() - start)
+
+        def writer(_: int) -> None:
+            while not stop.is_set():
+                n = next(counter)
+                start = time.perf_counter()
+                repo.create_item(
+                    item_id=f"bench-new-{n}",
+                    chunk_id="chunk-bench",
+                    kind="knowledge",
+                    schema_id="knowledge/howto.v1",
+                    title=f"Fresh item {n} about sqlite",
+                    body="written while readers search",
+                )
+                samples["write"].append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+        threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        db.close()
+
+    rows = []
+    for role in ("read", "write"):
+        stats = summarize(samples[role]) if samples[role] else {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0}
+        rows.append((profile, role, len(samples[role]) / duration, stats["mean_ms"], stats["p95_ms"]))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--profiles", default="default,wal")
+    args = parser.parse_args()
+
+    rows = []
+    for profile in args.profiles.split(","):
+        rows.extend(run_profile(profile, args.items, args.readers, args.writers, args.duration))
+    print_table(("profile", "role", "ops_per_s", "mean_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Domain suggestions and subtree filtering: `items` scans versus the domains index.
+
+- suggest: `SELECT DISTINCT domain FROM items WHERE domain LIKE ?||'%'` (the
+  old `suggest_domains`) versus `SearchRepo.suggest_domains`
+- subtree: one page plus the capped total for `domain=domainN.*`, written as
+  `domain LIKE 'domainN.%'` versus the index-expanded filter `/search` uses
+- write: insert cost of items with a domain, with and without the
+  domain-index triggers
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+from typing import Callable
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import ItemsRepo, SearchRepo
+
+PREFIXES = ["d", "domain1", "domain3.", "domain7.sub2", "x"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--writes", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        seed_items(db, args.items)
+        search = SearchRepo(db)
+        prefixes = itertools.cycle(PREFIXES)
+        roots = itertools.cycle([f"domain{n}" for n in range(11)] + [f"domain{n}.sub{n % 5}" for n in range(11)])
+
+        def scan_suggest() -> None:
+            with db.connect() as conn:
+                conn.execute(
+                    "SELECT DISTINCT domain FROM items WHERE domain LIKE ? || '%' ORDER BY domain LIMIT 20",
+                    (next(prefixes),),
+                ).fetchall()
+
+        def subtree(domain_filter: str) -> Callable[[], None]:
+            # One result page plus the capped total, as `/search` computes them.
+            def run() -> None:
+                root = next(roots)
+                params = (root, root + ".", root + "/") if "domains" in domain_filter else (root, root)
+                with db.connect() as conn:
+                    conn.execute(
+                        f"SELECT item_id FROM items WHERE status != 'deleted' AND {domain_filter} "
+                        "ORDER BY updated_at DESC LIMIT 20",
+                        params,
+                    ).fetchall()
+                    conn.execute(
+                        f"SELECT count(*) FROM (SELECT 1 FROM items WHERE status != 'deleted' AND {domain_filter} LIMIT 10000)",
+                        params,
+                    ).fetchone()
+
+            return run
+
+        rows = [
+            ("suggest", "items scan", summarize(time_calls(scan_suggest, args.repeat))),
+            ("suggest", "domains index", summarize(time_calls(lambda: search.suggest_domains(next(prefixes)), args.repeat))),
+            ("subtree", "items LIKE", summarize(time_calls(subtree("(domain = ? OR domain LIKE ? || '.%')"), args.repeat))),
+            (
+                "subtree",
+                "domains index",
+                summarize(
+                    time_calls(
+                        subtree("domain IN (SELECT domain FROM domains WHERE domain = ? OR (domain > ? AND domain < ?))"),
+                        args.repeat,
+                    )
+                ),
+            ),
+        ]
+
+        items = ItemsRepo(db)
+        batch = itertools.count()
+
+        def write_items() -> None:
+            run = next(batch)
+            with db.unit_of_work():
+                for n in range(args.writes):
+                    items.create_item(
+                        item_id=f"write-{run}-{n}",
+                        chunk_id="chunk-bench",
+                        kind="summary",
+                        schema_id="summary/v1",
+                        title="write",
+                        body="body",
+                        domain=f"domain{n % 11}.sub{n % 5}.leaf{n % 3}",
+                    )
+
+        rows.append(("write", "with triggers", summarize(time_calls(write_items, 3))))
+        with db.transaction() as cur:
+            for trigger in ("trg_items_ai_domains", "trg_items_au_domains", "trg_items_ad_domains"):
+                cur.execute(f"DROP TRIGGER {trigger}")
+        rows.append(("write", "without triggers", summarize(time_calls(write_items, 3))))
+        db.close()
+
+    print_table(
+        ("case", "path", "mean_ms", "p50_ms", "p95_ms"),
+        [(case, path, s["mean_ms"], s["p50_ms"], s["p95_ms"]) for case, path, s in rows],
+    )
+
+
+if __name__ == "__main__":
+    main()
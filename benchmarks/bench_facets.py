@@ -0,0 +1,53 @@
+"""Facet overhead in `SearchRepo.search_items` on broad queries.
+
+Times each query without facets and with `facets=True`, both with the default
+`total_cap` (facets over at most that many matches) and exact (`total_cap=None`).
+The unfiltered browse reads the maintained `facet_counts` table; the others
+group the materialized matches.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import SEARCH_TOTAL_CAP, SearchRepo
+
+QUERIES = [
+    ("browse (global counts)", {"sort": "updated_at"}),
+    ("kind filter", {"kinds": ["knowledge"], "sort": "updated_at"}),
+    ("query: every item", {"query": "sqlite"}),
+    ("query: 1/13 of items", {"query": "keyword3"}),
+    ("domain subtree", {"domain": "domain3.*", "sort": "updated_at"}),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        seed_items(db, args.items)
+        search = SearchRepo(db)
+
+        rows = []
+        for label, params in QUERIES:
+            cells = [label]
+            for total_cap in (SEARCH_TOTAL_CAP, None):
+                for facets in (False, True):
+                    stats = summarize(
+                        time_calls(lambda: search.search_items(total_cap=total_cap, facets=facets, **params), args.repeat)
+                    )
+                    cells.append(stats["p50_ms"])
+            rows.append(cells)
+        db.close()
+
+    print_table(("query", "capped_ms", "capped+facets_ms", "exact_ms", "exact+facets_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Tag-heavy writes with per-row FTS triggers versus the deferred queue.
+
+Each write mirrors `POST /items`: create an item and replace its tags inside
+one unit of work. `legacy` stops the schema at version 1, where every
+`item_tags` row rewrites the item's FTS row; `deferred` queues the item and
+rebuilds it once at commit. `rebuild` loads with the queue drained by a single
+`rebuild_all` at the end, as a bulk import would.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from common import SCHEMA_PATH, print_table, seed_items, temp_db_path
+
+from app.db import Database
+from app.fts import rebuild_all
+from app.migrations import migrate
+from app.repositories import ItemsRepo, TagsRepo
+
+
+def write_items(db: Database, count: int, tags_per_item: int) -> None:
+    items, tags = ItemsRepo(db), TagsRepo(db)
+    for n in range(count):
+        item_id = f"new-{n}"
+        with db.unit_of_work():
+            items.create_item(
+                item_id=item_id,
+                chunk_id="chunk-bench",
+                kind="knowledge",
+                schema_id="knowledge/howto.v1",
+                title=f"Tagged item {n}",
+                body="body",
+            )
+            tags.replace_item_tags(item_id, [{"name": f"tag{(n + k) % 200}"} for k in range(tags_per_item)])
+
+
+def run(mode: str, existing: int, count: int, tags_per_item: int) -> float:
+    with temp_db_path() as db_path:
+        db = Database(db_path, fts_sync="background" if mode == "rebuild" else "transaction")
+        migrate(db, SCHEMA_PATH, target=1 if mode == "legacy" else None)
+        if mode == "legacy":
+            db.before_commit.clear()
+        seed_items(db, existing)
+        start = time.perf_counter()
+        write_items(db, count, tags_per_item)
+        if mode == "rebuild":
+            with db.transaction() as cur:
+                rebuild_all(cur)
+        elapsed = time.perf_counter() - start
+        db.close()
+        return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--existing", type=int, default=20_000, help="rows already in the index")
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--tags", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = []
+    for mode in ("legacy", "deferred", "rebuild"):
+        elapsed = run(mode, args.existing, args.items, args.tags)
+        rows.append((mode, elapsed * 1000, args.items / elapsed))
+    print_table(("mode", "total_ms", "items_per_s"), rows)
+
+
+if __name__ == "__main__":
+    main()
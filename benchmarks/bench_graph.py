@@ -0,0 +1,78 @@
+"""Depth-3 link graph traversal: one recursive CTE versus item-by-item requests.
+
+Seeds `--items` items and `--links` random links between them (rels drawn
+from the four the UI follows), then walks from random roots. The baseline
+is what the UI does without `/items/{id}/graph`: one `/items/{id}/links`
+lookup per reached node, breadth first (in process, so without the HTTP
+round trip each of those costs the UI). Both walks stop at `GRAPH_NODE_LIMIT`
+nodes; "supersedes only" keeps the frontier small enough to finish.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from typing import List, Optional, Sequence
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import GRAPH_NODE_LIMIT, LinksRepo
+
+RELS = ("born_from", "supersedes", "related", "contradicts")
+
+
+def walk_item_by_item(links: LinksRepo, root: str, depth: int, rels: Optional[Sequence[str]]) -> int:
+    seen = {root}
+    frontier: List[str] = [root]
+    for _ in range(depth):
+        following: List[str] = []
+        for item_id in frontier:
+            for link in links.list_links_for_item(item_id, include_targets=True):
+                target = link["target_key"]
+                if (rels is None or link["rel"] in rels) and target not in seen and len(seen) < GRAPH_NODE_LIMIT:
+                    seen.add(target)
+                    following.append(target)
+        frontier = following
+    return len(seen)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--links", type=int, default=1_000_000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--roots", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        item_ids = seed_items(db, args.items)
+        with db.transaction() as cur:
+            cur.executemany(
+                "INSERT INTO item_links(link_id, item_id, rel, target_key) VALUES (?, ?, ?, ?)",
+                (
+                    (f"link-{n:08d}", rng.choice(item_ids), rng.choice(RELS), rng.choice(item_ids))
+                    for n in range(args.links)
+                ),
+            )
+        links = LinksRepo(db)
+        roots = rng.sample(item_ids, args.roots)
+
+        rows = []
+        for label, rels in (("all rels", None), ("supersedes only", ["supersedes"])):
+            nodes = sum(len(links.graph(r, depth=args.depth, rels=rels)["nodes"]) for r in roots) / len(roots)
+            for method, fn in (
+                ("recursive CTE", lambda r: links.graph(r, depth=args.depth, rels=rels)),
+                ("item by item", lambda r: walk_item_by_item(links, r, args.depth, rels)),
+            ):
+                calls = iter(roots * 2)
+                stats = summarize(time_calls(lambda: fn(next(calls)), len(roots)))
+                rows.append((label, method, nodes, stats["p50_ms"], stats["p95_ms"]))
+        db.close()
+
+    print_table(("walk", "method", "avg_nodes", "p50_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Supersedes chain heads: precomputed `item_heads` versus walking `item_links`.
+
+Seeds `--items` items, turns a third of them into version chains of
+`--chain` items linked by `supersedes` and adds `--other-links` random
+`related` / `born_from` links. Measures:
+- resolving the head of the oldest version: one `item_heads` lookup versus
+  one `item_links` query per hop;
+- filtering superseded items out of a kind-filtered count: `item_heads`
+  versus a correlated NOT EXISTS on `item_links` per row ("no filter" is
+  the cost of the count itself);
+- the write cost: adding a `supersedes` link (chain heads recomputed before
+  commit) versus a `related` link.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import LinksRepo
+
+NEXT_VERSION = """
+SELECT item_id FROM item_links
+WHERE target_key = ? AND rel = 'supersedes'
+ORDER BY created_at DESC, rowid DESC LIMIT 1
+"""
+COUNT = "SELECT count(*) FROM items i WHERE i.status != 'deleted' AND i.kind = 'knowledge' AND "
+FILTERS = {
+    "no filter": "1",
+    "item_heads": "i.item_id NOT IN (SELECT item_id FROM item_heads)",
+    "NOT EXISTS item_links": (
+        "NOT EXISTS (SELECT 1 FROM item_links l WHERE l.target_key = i.item_id AND l.rel = 'supersedes')"
+    ),
+}
+
+
+def walk_links(conn, item_id: str) -> str:
+    while (row := conn.execute(NEXT_VERSION, (item_id,)).fetchone()) is not None:
+        item_id = row[0]
+    return item_id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--chain", type=int, default=5)
+    parser.add_argument("--other-links", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        item_ids = seed_items(db, args.items)
+        chained = item_ids[: args.items // 3]
+        with db.transaction() as cur:
+            cur.executemany(
+                "INSERT INTO item_links(link_id, item_id, rel, target_key) VALUES (?, ?, 'supersedes', ?)",
+                (
+                    (f"link-{n:08d}", chained[n + 1], chained[n])
+                    for n in range(len(chained) - 1)
+                    if (n + 1) % args.chain
+                ),
+            )
+            cur.executemany(
+                "INSERT INTO item_links(link_id, item_id, rel, target_key) VALUES (?, ?, ?, ?)",
+                (
+                    (f"other-{n:08d}", rng.choice(item_ids), rng.choice(("related", "born_from")), rng.choice(item_ids))
+                    for n in range(args.other_links)
+                ),
+            )
+        links = LinksRepo(db)
+        oldest = [chained[n] for n in range(0, len(chained), args.chain)]
+
+        rows = []
+        with db.connect() as conn:
+            picks = iter(rng.choices(oldest, k=args.repeat * 2))
+            for label, fn in (
+                ("item_heads", lambda: links.head(next(picks))),
+                ("walk item_links", lambda: walk_links(conn, next(picks))),
+            ):
+                rows.append(("head of oldest version", label, *summarize(time_calls(fn, args.repeat)).values()))
+            for label, sql in FILTERS.items():
+                stats = summarize(time_calls(lambda: conn.execute(COUNT + sql).fetchone(), 5))
+                rows.append(("count non-superseded", label, *stats.values()))
+
+        counter = iter(range(10**9))
+        for rel in ("supersedes", "related"):
+            def add_link() -> None:
+                n = next(counter)
+                links.create_link(
+                    link_id=f"bench-{n}", item_id=rng.choice(item_ids), rel=rel, target_key=rng.choice(chained)
+                )
+
+            rows.append(("create link", rel, *summarize(time_calls(add_link, args.repeat)).values()))
+        db.close()
+
+    print_table(("operation", "method", "mean_ms", "p50_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
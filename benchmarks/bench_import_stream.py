@@ -0,0 +1,121 @@
+"""Peak RSS and throughput of importing a large extraction file.
+
+Writes a synthetic export of `--size-mb` (default 1 GB: chunks with their
+conversation messages and extracted items) and imports it in a fresh process
+per mode, so each peak RSS is measured on its own:
+
+- "in-memory": `json.load` of the whole file, then `import_extraction`, as the
+  `POST /import/jobs` body path does.
+- "stream": `ExtractionImporter.import_stream` over the open file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from common import make_database, print_table, temp_db_path
+
+from app.importer import ExtractionImporter
+from app.repositories import ImportRepo
+
+
+def write_export(path: Path, size_mb: int) -> int:
+    target = size_mb * 1024 * 1024
+    written = 0
+    n = 0
+    with path.open("w", encoding="utf-8") as out:
+        out.write('{"extraction": {"source": {"source_type": "chatgpt_export_json"}, "chunks": [')
+        while written < target:
+            chunk = {
+                "source": {
+                    "thread_id": f"thread-{n // 20}",
+                    "locator": {"turn_range": {"start": n, "end": n + 14}},
+                    "messages": [
+                        {"role": "user" if m % 2 else "assistant", "content": f"メッセージ {n}-{m} " + "本文" * 200}
+                        for m in range(14)
+                    ],
+                },
+                "items": [
+                    {
+                        "item_id": f"temp-{n}-{k}",
+                        "kind": "knowledge",
+                        "schema_id": "knowledge/howto.v1",
+                        "title": f"Item {n}-{k}",
+                        "body": "抽出された知識 " * 40,
+                        "tags": [{"name": f"tag{k}"}],
+                    }
+                    for k in range(4)
+                ],
+            }
+            text = ("," if n else "") + json.dumps(chunk, ensure_ascii=False)
+            out.write(text)
+            written += len(text.encode("utf-8"))
+            n += 1
+        out.write("]}}")
+    return n
+
+
+def run_mode(mode: str, export: Path, db_path: Path) -> None:
+    db = make_database(db_path)
+    importer = ExtractionImporter(ImportRepo(db))
+    start = time.perf_counter()
+    if mode == "stream":
+        with export.open("rb") as stream:
+            job = importer.import_stream(stream)
+    else:
+        with export.open("rb") as stream:
+            job = importer.import_extraction(json.load(stream)["extraction"])
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    db.close()
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_mb, "candidates": job.candidates}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--mode", choices=("in-memory", "stream"), help=argparse.SUPPRESS)
+    parser.add_argument("--export", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, Path(args.export), Path(args.db))
+        return
+
+    with temp_db_path() as db_path:
+        export = db_path.with_name("export.json")
+        chunks = write_export(export, args.size_mb)
+        size_mb = export.stat().st_size / 1024 / 1024
+        rows = []
+        for mode in ("in-memory", "stream"):
+            mode_db = db_path.with_name(f"{mode}.sqlite")
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--export", str(export), "--db", str(mode_db)],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            rows.append(
+                (
+                    mode,
+                    chunks,
+                    result["candidates"],
+                    f"{result['peak_rss_mb']:.0f}",
+                    f"{result['seconds']:.2f}",
+                    f"{size_mb / result['seconds']:.1f}",
+                )
+            )
+
+    print_table(("mode", "chunks", "candidates", "peak_rss_mb", "seconds", "mb_per_s"), rows)
+
+
+if __name__ == "__main__":
+    main()
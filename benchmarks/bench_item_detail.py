@@ -0,0 +1,65 @@
+"""`GET /items/{id}` data loading: three repository calls versus one statement.
+
+"three calls" is what the endpoint used to do (`get_item`, `get_payload`,
+`get_tags_for_item`); "detail" is `ItemsRepo.get_item_detail`, and "detail +
+links" also loads links with their target titles, which previously took a
+separate request plus one more per linked item.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import ItemsRepo, LinksRepo, TagsRepo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--links", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        item_ids = seed_items(db, args.items)
+        items, tags, links = ItemsRepo(db), TagsRepo(db), LinksRepo(db)
+        rng = random.Random(11)
+        sample = rng.sample(item_ids, min(200, len(item_ids)))
+        with db.unit_of_work():
+            for item_id in sample:
+                for n, target in enumerate(rng.sample(item_ids, args.links)):
+                    links.create_link(link_id=f"link-{item_id}-{n}", item_id=item_id, rel="related", target_key=target)
+        picks = iter(lambda: rng.choice(sample), None)
+
+        def three_calls(item_id: str) -> None:
+            items.get_item(item_id)
+            items.get_payload(item_id)
+            tags.get_tags_for_item(item_id)
+
+        def links_before() -> None:
+            item_id = next(picks)
+            three_calls(item_id)
+            for link in links.list_links_for_item(item_id):
+                items.get_item(link["target_key"])
+
+        cases = (
+            ("three calls", lambda: three_calls(next(picks))),
+            ("detail", lambda: items.get_item_detail(next(picks))),
+            ("three calls + links", links_before),
+            ("detail + links", lambda: items.get_item_detail(next(picks), include_links=True)),
+        )
+        rows = []
+        for label, fn in cases:
+            stats = summarize(time_calls(fn, args.repeat))
+            rows.append((label, stats["mean_ms"], stats["p50_ms"], stats["p95_ms"]))
+        db.close()
+
+    print_table(("load", "mean_ms", "p50_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
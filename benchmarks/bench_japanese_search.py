@@ -0,0 +1,71 @@
+"""Japanese queries: unicode61-only FTS versus the routed trigram search.
+
+Rewrites the seeded corpus with Japanese titles and bodies, then for a set of
+queries reports recall against a plain substring scan and per-query latency.
+"unicode61" matches the query against `items_fts` only, as search did before
+the trigram index; "routed" is `SearchRepo.search_items`.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import SearchRepo
+
+_WORDS = ["検索", "設定", "インデックス", "データベース", "再構築", "手順", "障害", "復旧", "性能", "計測", "キャッシュ", "同期"]
+QUERIES = ["インデックス", "データベース 性能", "再構築", "障害", "キャッシュ"]
+
+
+def _text(n: int, width: int) -> str:
+    return "の".join(_WORDS[(n * 5 + k * 7) % len(_WORDS)] for k in range(width)) + "について"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        item_ids = seed_items(db, args.items)
+        docs = {item_id: (_text(n, 2), _text(n + 3, 6)) for n, item_id in enumerate(item_ids)}
+        with db.transaction() as cur:
+            cur.executemany(
+                "UPDATE items SET title = ?, body = ? WHERE item_id = ?",
+                ((title, body, item_id) for item_id, (title, body) in docs.items()),
+            )
+        search = SearchRepo(db)
+
+        def unicode61(query: str, limit: int) -> list:
+            with db.connect() as conn:
+                rows = conn.execute(
+                    "SELECT item_id FROM items_fts WHERE items_fts MATCH ? LIMIT ?",
+                    (search._build_match(query), limit),
+                ).fetchall()
+            return [row[0] for row in rows]
+
+        def routed(query: str, limit: int) -> list:
+            return [item["item_id"] for item in search.search_items(query=query, limit=limit)["items"]]
+
+        rows = []
+        for query in QUERIES:
+            expected = {
+                item_id for item_id, (title, body) in docs.items()
+                if all(term in title or term in body for term in query.split())
+            }
+            for label, fn in (("unicode61", unicode61), ("routed", routed)):
+                found = set(fn(query, args.items))
+                recall = len(found & expected) / len(expected) if expected else 1.0
+                stats = summarize(time_calls(lambda: fn(query, args.limit), args.repeat))
+                rows.append((query, label, len(expected), f"{recall:.2f}", stats["mean_ms"], stats["p95_ms"]))
+        db.close()
+
+    print_table(("query", "search", "expected", "recall", "mean_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
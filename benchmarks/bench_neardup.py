@@ -0,0 +1,130 @@
+"""Near-duplicate lookup: the MinHash LSH index versus scanning every item.
+
+Seeds `--items` items of random text over a `--vocabulary` word list, then
+queries with `--queries` paraphrases of random items (`--edit` of the words
+replaced). Measures:
+- lookup latency of `find_near_duplicates` versus comparing the query's
+  signature with every stored signature, and versus exact Jaccard over the
+  shingles of every item (what an index-free check would do);
+- recall (the paraphrased item is found) and precision (hits whose exact
+  Jaccard similarity reaches the threshold);
+- the write cost: bulk inserting items with and without the signing
+  triggers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.neardup import rebuild_minhash, shingles, signature, similarity, unpack
+from app.repositories import NEAR_DUPLICATE_MIN_SIMILARITY, ItemsRepo
+
+INSERT = """
+INSERT INTO items(item_id, chunk_id, kind, schema_id, title, body)
+VALUES (?, 'chunk-bench', 'knowledge', 'knowledge/howto.v1', ?, ?)
+"""
+MINHASH_TRIGGERS = ("trg_items_ai_minhash", "trg_items_au_minhash", "trg_items_ad_minhash")
+
+
+def random_text(rng: random.Random, words: List[str]) -> Tuple[str, str]:
+    return " ".join(rng.choices(words, k=6)), " ".join(rng.choices(words, k=rng.randint(30, 80)))
+
+
+def paraphrase(rng: random.Random, text: Tuple[str, str], words: List[str], edit: float) -> Tuple[str, str]:
+    title, body = text
+    tokens = body.split()
+    for n in rng.sample(range(len(tokens)), int(len(tokens) * edit)):
+        tokens[n] = rng.choice(words)
+    return title, " ".join(tokens)
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def bulk_insert(db, texts: List[Tuple[str, str]], prefix: str) -> float:
+    start = time.perf_counter()
+    with db.transaction() as cur:
+        cur.executemany(INSERT, ((f"{prefix}-{n:08d}", t, b) for n, (t, b) in enumerate(texts)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--vocabulary", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--edit", type=float, default=0.15)
+    parser.add_argument("--scan-queries", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    words = [f"w{n:x}{rng.choice('aeiou')}" for n in range(args.vocabulary)]
+    texts = [random_text(rng, words) for _ in range(args.items)]
+    picks = rng.sample(range(args.items), args.queries)
+    queries = [paraphrase(rng, texts[n], words, args.edit) for n in picks]
+
+    rows = []
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        seed_items(db, 0)
+        write_ms = {}
+        for n, label in enumerate(("with signing", "without signing")):
+            if n:
+                with db.transaction() as cur:
+                    for trigger in MINHASH_TRIGGERS:
+                        cur.execute(f"DROP TRIGGER {trigger}")
+            sample = [random_text(rng, words) for _ in range(5_000)]
+            write_ms[label] = bulk_insert(db, sample, f"write{n}") * 1000 / len(sample)
+        bulk_insert(db, texts, "item")
+        with db.transaction() as cur:
+            cur.execute("DELETE FROM items WHERE item_id LIKE 'write-%'")
+        # The triggers are gone, so sign everything the way an upgraded
+        # database is signed.
+        rebuild_minhash(db)
+        items_repo = ItemsRepo(db)
+
+        found, returned, relevant = 0, 0, 0
+        exact = [shingles(f"{t} {b}") for t, b in texts]
+        for n, query in zip(picks, queries):
+            [hits] = items_repo.find_near_duplicates([query])
+            found += any(hit["item_id"] == f"item-{n:08d}" for hit in hits)
+            query_grams = shingles(f"{query[0]} {query[1]}")
+            for hit in hits:
+                returned += 1
+                relevant += jaccard(query_grams, exact[int(hit["item_id"].split("-")[1])]) >= NEAR_DUPLICATE_MIN_SIMILARITY
+
+        with db.connect() as conn:
+            stored = [unpack(row[0]) for row in conn.execute("SELECT signature FROM item_minhash")]
+
+        def scan_signatures(query: Tuple[str, str]) -> list:
+            sig = signature(*query)
+            return [s for s in stored if similarity(sig, s) >= NEAR_DUPLICATE_MIN_SIMILARITY]
+
+        def scan_exact(query: Tuple[str, str]) -> list:
+            grams = shingles(f"{query[0]} {query[1]}")
+            return [g for g in exact if jaccard(grams, g) >= NEAR_DUPLICATE_MIN_SIMILARITY]
+
+        for method, fn, repeat in (
+            ("LSH index", lambda q: items_repo.find_near_duplicates([q]), args.queries),
+            ("scan signatures", scan_signatures, args.scan_queries),
+            ("scan exact Jaccard", scan_exact, args.scan_queries),
+        ):
+            calls = iter(queries)
+            stats = summarize(time_calls(lambda: fn(next(calls)), repeat))
+            rows.append(("lookup", method, stats["p50_ms"], stats["p95_ms"]))
+        for label, ms in write_ms.items():
+            rows.append(("bulk insert, per item", label, round(ms, 3), ""))
+        db.close()
+
+    print_table(("operation", "method", "p50_ms", "p95_ms"), rows)
+    print(f"recall {found / len(queries):.3f}, precision {relevant / max(returned, 1):.3f} ({returned} hits)")
+
+
+if __name__ == "__main__":
+    main()
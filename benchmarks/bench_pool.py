@@ -0,0 +1,61 @@
+"""Latency of the `GET /items/{id}` data path with and without connection pooling.
+
+The handler does `get_item`, `get_payload` and `get_tags_for_item`; this script
+replays that sequence from a thread pool, once with `pool_size=0` (connect per
+call) and once with the reader pool enabled.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path
+
+from app.repositories import ItemsRepo, TagsRepo
+
+
+def fetch_item_detail(items: ItemsRepo, tags: TagsRepo, item_id: str) -> float:
+    start = time.perf_counter()
+    item = items.get_item(item_id)
+    assert item is not None
+    items.get_payload(item_id)
+    tags.get_tags_for_item(item_id)
+    return time.perf_counter() - start
+
+
+def run(pool_size: int, db_path, item_ids, requests: int, threads: int) -> dict:
+    db = make_database(db_path, pool_size=pool_size)
+    items, tags = ItemsRepo(db), TagsRepo(db)
+    rng = random.Random(7)
+    targets = [rng.choice(item_ids) for _ in range(requests)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        samples = list(executor.map(lambda item_id: fetch_item_detail(items, tags, item_id), targets))
+    db.close()
+    return summarize(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        seed_db = make_database(db_path)
+        item_ids = seed_items(seed_db, args.items)
+        seed_db.close()
+
+        rows = []
+        for label, pool_size in (("connect-per-call", 0), (f"pooled ({args.pool_size})", args.pool_size)):
+            stats = run(pool_size, db_path, item_ids, args.requests, args.threads)
+            rows.append((label, stats["mean_ms"], stats["p50_ms"], stats["p95_ms"]))
+        print_table(("mode", "mean_ms", "p50_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
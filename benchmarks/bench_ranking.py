@@ -0,0 +1,132 @@
+"""Offline relevance and latency of the search sorts on a small judged query set.
+
+Each judged topic has a current guide (title hit, high confidence, fresh), an
+archived copy of it (same text, low confidence, three years old) and a handful
+of short notes that only repeat the term in their body. The guide is graded
+2, the archived copy 1, the notes 0. Rankings are scored with nDCG@10 and the
+reciprocal rank of the guide, for plain bm25 (every column weighs 1.0),
+column-weighted bm25 and the blended sort. `--items` filler rows from
+`seed_items` make the latency numbers meaningful; the broad query matches
+one in 13 of them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import statistics
+from typing import Dict, List
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import SearchRepo
+
+TOPICS = (
+    "replication",
+    "vacuum",
+    "checkpoint",
+    "tokenizer",
+    "migration",
+    "backup",
+    "partition",
+    "trigger",
+    "collation",
+    "savepoint",
+    "pragma",
+    "upsert",
+)
+NOTES_PER_TOPIC = 5
+GUIDE_BODY = (
+    "Step by step instructions covering {t}, the settings involved, how to verify the result "
+    "and what to watch for when running it on a busy database with many concurrent readers."
+)
+
+
+def seed_judged(db) -> Dict[str, Dict[str, int]]:
+    rows = []
+    judgments: Dict[str, Dict[str, int]] = {}
+    for t in TOPICS:
+        body = GUIDE_BODY.format(t=t)
+        rows.append((f"guide-{t}", f"{t} guide", body, 0.9, "strftime('%Y-%m-%dT%H:%M:%fZ','now')"))
+        rows.append((f"archived-{t}", f"{t} guide", body, 0.3, "'2023-06-01T00:00:00.000Z'"))
+        for n in range(NOTES_PER_TOPIC):
+            rows.append((f"note-{t}-{n}", f"note {n}", f"{t} came up; {t} again", 0.5, "strftime('%Y-%m-%dT%H:%M:%fZ','now')"))
+        judgments[t] = {f"guide-{t}": 2, f"archived-{t}": 1}
+    with db.transaction() as cur:
+        for item_id, title, body, confidence, updated_at in rows:
+            cur.execute(
+                f"""
+                INSERT INTO items(item_id, chunk_id, kind, schema_id, title, body, domain, confidence, updated_at)
+                VALUES (?, 'chunk-bench', 'knowledge', 'knowledge/howto.v1', ?, ?, 'judged', ?, {updated_at})
+                """,
+                (item_id, title, body, confidence),
+            )
+    return judgments
+
+
+def ndcg(ranked: List[str], grades: Dict[str, int], k: int = 10) -> float:
+    dcg = sum((2 ** grades.get(item_id, 0) - 1) / math.log2(rank + 2) for rank, item_id in enumerate(ranked[:k]))
+    ideal = sorted(grades.values(), reverse=True)[:k]
+    idcg = sum((2**grade - 1) / math.log2(rank + 2) for rank, grade in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
+
+
+def reciprocal_rank(ranked: List[str], grades: Dict[str, int]) -> float:
+    best = max(grades.values())
+    for rank, item_id in enumerate(ranked):
+        if grades.get(item_id) == best:
+            return 1.0 / (rank + 1)
+    return 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        seed_items(db, args.items)
+        judgments = seed_judged(db)
+        plain = SearchRepo(db, weights={})
+        weighted = SearchRepo(db)
+
+        rows = []
+        for label, search, sort in (
+            ("bm25", plain, "relevance"),
+            ("weighted bm25", weighted, "relevance"),
+            ("weighted + blended", weighted, "blended"),
+        ):
+            ndcgs, rrs = [], []
+            for query, grades in judgments.items():
+                hits = search.search_items(query=query, sort=sort, limit=args.limit)["items"]
+                ranked = [hit["item_id"] for hit in hits]
+                ndcgs.append(ndcg(ranked, grades))
+                rrs.append(reciprocal_rank(ranked, grades))
+            judged = summarize(
+                time_calls(
+                    lambda: [search.search_items(query=q, sort=sort, limit=args.limit) for q in judgments],
+                    args.repeat,
+                )
+            )
+            broad = summarize(
+                time_calls(lambda: search.search_items(query="keyword3", sort=sort, limit=args.limit), args.repeat)
+            )
+            rows.append(
+                (
+                    label,
+                    statistics.fmean(ndcgs),
+                    statistics.fmean(rrs),
+                    judged["p50_ms"] / len(judgments),
+                    broad["p50_ms"],
+                )
+            )
+        db.close()
+
+    print_table(("ranking", "ndcg@10", "mrr", "judged_p50_ms", "broad_p50_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""`SearchRepo.search_items` with and without `SearchCache`.
+
+Replays a home-screen session: the user toggles between a handful of filter
+combinations, so most searches repeat one seen a moment ago. `--write-every`
+inserts an item every N searches to show the cost of invalidation.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.cache import SearchCache
+from app.repositories import ItemsRepo, SearchRepo
+
+FILTERS = [
+    {},
+    {"query": "sqlite"},
+    {"query": "sqlite", "kinds": ["knowledge"]},
+    {"kinds": ["summary"], "sort": "updated_at"},
+    {"query": "keyword3", "tags": ["tag7"]},
+    {"domain": "domain4.sub4", "sort": "created_at"},
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--searches", type=int, default=300)
+    parser.add_argument("--write-every", type=int, default=0)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        seed_items(db, args.items)
+        items = ItemsRepo(db)
+        rows = []
+        for label, cache in (("no cache", None), ("cache", SearchCache())):
+            search = SearchRepo(db, cache=cache)
+            filters = itertools.cycle(FILTERS)
+            counter = itertools.count()
+
+            def one_search() -> None:
+                n = next(counter)
+                if args.write_every and n % args.write_every == args.write_every - 1:
+                    items.create_item(
+                        item_id=f"bench-{label}-{n}",
+                        chunk_id="chunk-bench",
+                        kind="knowledge",
+                        schema_id="knowledge/howto.v1",
+                        title="sqlite write",
+                        body="body",
+                    )
+                search.search_items(**next(filters))
+
+            stats = summarize(time_calls(one_search, args.searches))
+            hit_rate = ""
+            if cache:
+                cache_stats = cache.stats()
+                hit_rate = f"{cache_stats['hits'] / max(1, cache_stats['hits'] + cache_stats['misses']):.2f}"
+            rows.append((label, hit_rate, stats["mean_ms"], stats["p50_ms"], stats["p95_ms"]))
+        db.close()
+
+    print_table(("search", "hit_rate", "mean_ms", "p50_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Deep paging in `SearchRepo.search_items`: OFFSET versus keyset cursors.
+
+Times page 1 and page N (default 500, 20 rows per page) for a browse query
+(sorted by updated_at) and a relevance-sorted FTS query. The cursor for page N
+is taken from the last row of page N-1, as a client walking pages would have.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import SearchRepo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        seed_items(db, args.items)
+        search = SearchRepo(db)
+        deep_offset = (args.page - 1) * args.limit
+
+        rows = []
+        for label, params in (("browse", {"sort": "updated_at"}), ("query", {"query": "sqlite", "sort": "relevance"})):
+            previous = search.search_items(limit=args.limit, offset=deep_offset - args.limit, total_cap=None, **params)
+            cursor = previous["next_cursor"]
+            cases = (
+                ("page 1", {"offset": 0}),
+                (f"page {args.page} offset", {"offset": deep_offset}),
+                (f"page {args.page} cursor", {"cursor": cursor}),
+            )
+            for case, extra in cases:
+                stats = summarize(time_calls(lambda: search.search_items(limit=args.limit, **params, **extra), args.repeat))
+                rows.append((label, case, stats["mean_ms"], stats["p95_ms"]))
+            exact = summarize(time_calls(lambda: search.search_items(limit=args.limit, total_cap=None, **params), 3))
+            rows.append((label, "page 1 exact total", exact["mean_ms"], exact["p95_ms"]))
+        db.close()
+
+    print_table(("search", "case", "mean_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Search response size and latency: full bodies versus `fields=` and `snippet=`.
+
+Seeds items whose bodies are padded to `--body-chars` characters and runs a
+query page of `--limit` hits three ways: the default response (full `body`),
+a projection without `body`, and `snippet=16`. Timings include JSON encoding,
+as the API pays it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import SearchRepo
+
+FILLER = "Long form notes about storage engines, indexes and query planning. "
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--body-chars", type=int, default=8_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    padding = (FILLER * (args.body_chars // len(FILLER) + 1))[: args.body_chars]
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        seed_items(db, args.items)
+        with db.transaction() as cur:
+            cur.execute("UPDATE items SET body = ? || body", (padding,))
+        search = SearchRepo(db)
+
+        rows = []
+        for label, extra in (
+            ("full body", {}),
+            ("fields without body", {"fields": ["item_id", "kind", "title", "domain", "updated_at", "tags"]}),
+            ("snippet=16", {"snippet": 16}),
+            ("fields + snippet=16", {"fields": ["item_id", "title"], "snippet": 16}),
+        ):
+            params = {"query": "keyword3", "limit": args.limit, **extra}
+            size = len(json.dumps(search.search_items(**params)).encode("utf-8"))
+            stats = summarize(time_calls(lambda: json.dumps(search.search_items(**params)), args.repeat))
+            rows.append((label, size, stats["p50_ms"], stats["p95_ms"]))
+        db.close()
+
+    print_table(("response", "bytes", "p50_ms", "p95_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Startup cost on an existing, large database file.
+
+Compares re-running all of `schema.sql` (what every boot used to do) with the
+versioned `ensure_schema`, which only checks `schema_version` when the file is
+already up to date. Also times `RawJsonRepo` construction, which used to run
+DDL on every request.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from common import SCHEMA_PATH, make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.db import Database, ensure_schema
+from app.repositories import RawJsonRepo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        seed_db = make_database(db_path)
+        seed_items(seed_db, args.items)
+        seed_db.close()
+        size_mb = db_path.stat().st_size / (1024 * 1024)
+
+        def boot_full_schema() -> None:
+            db = Database(db_path)
+            db.apply_schema(SCHEMA_PATH)
+            db.close()
+
+        def boot_versioned() -> None:
+            db = Database(db_path)
+            ensure_schema(db, SCHEMA_PATH)
+            db.close()
+
+        db = Database(db_path)
+        rows = [
+            ("executescript schema.sql", summarize(time_calls(boot_full_schema, args.repeat))),
+            ("ensure_schema (versioned)", summarize(time_calls(boot_versioned, args.repeat))),
+            ("RawJsonRepo(db)", summarize(time_calls(lambda: RawJsonRepo(db), args.repeat))),
+        ]
+        db.close()
+
+    print(f"database: {args.items} items, {size_mb:.1f} MiB")
+    print_table(("step", "mean_ms", "p95_ms"), [(label, s["mean_ms"], s["p95_ms"]) for label, s in rows])
+
+
+if __name__ == "__main__":
+    main()
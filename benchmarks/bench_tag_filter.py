@@ -0,0 +1,66 @@
+"""Tag filters in `SearchRepo.search_items`: `GROUP BY ... HAVING` versus rarest-first probing.
+
+Seeds items with `--tags-per-item` tags, adds a `popular` tag to every other
+item, and times 1, 3 and 5-tag AND filters plus an OR/NOT expression, once through the previous
+`IN (... GROUP BY item_id HAVING COUNT(*) >= n)` subquery and once through
+`SearchRepo._tag_filter`. Each search returns one page and the capped total.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from common import make_database, print_table, seed_items, summarize, temp_db_path, time_calls
+
+from app.repositories import SearchRepo
+
+
+def having_filter(tags):
+    return (
+        "i.item_id IN (SELECT it2.item_id FROM item_tags it2 JOIN tags t2 ON t2.tag_id = it2.tag_id "
+        "WHERE t2.name IN (%s) GROUP BY it2.item_id HAVING COUNT(*) >= ? )" % ",".join(["?"] * len(tags)),
+        [*tags, len(tags)],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--tags-per-item", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    # seed_items gives item n the tags (7n + 31k) % 200, so these co-occur on item 1.
+    co_tags = [f"tag{(7 + 31 * k) % 200}" for k in range(5)]
+    filters = [
+        ("1 tag", ["popular"]),
+        ("3 tags", ["popular", *co_tags[:2]]),
+        ("5 tags", ["popular", *co_tags[:4]]),
+        ("a|b AND -c", [f"{co_tags[0]}|{co_tags[1]}", "-popular"]),
+    ]
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        seed_items(db, args.items, tags_per_item=args.tags_per_item)
+        with db.transaction() as cur:
+            tag_id = cur.execute("INSERT INTO tags(name, path) VALUES ('popular', '')").lastrowid
+            cur.execute("INSERT INTO item_tags(item_id, tag_id) SELECT item_id, ? FROM items WHERE rowid % 2 = 1", (tag_id,))
+        legacy, engine = SearchRepo(db), SearchRepo(db)
+        legacy._tag_filter = having_filter
+
+        rows = []
+        for label, tags in filters:
+            cells = [label, engine.search_items(tags=tags)["total"]]
+            for repo in (legacy, engine):
+                if repo is legacy and any(tag.startswith("-") or "|" in tag for tag in tags):
+                    cells.append("n/a")
+                    continue
+                cells.append(summarize(time_calls(lambda: repo.search_items(tags=tags), args.repeat))["p50_ms"])
+            rows.append(cells)
+        db.close()
+
+    print_table(("filter", "total", "having_ms", "rarest_first_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
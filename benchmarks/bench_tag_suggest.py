@@ -0,0 +1,66 @@
+"""`/suggest/tags` latency: SQLite `LIKE` scan versus `TagCache`.
+
+Seeds `--tags` tag names and replays typing: every word of a random sample is
+suggested once per keystroke (`t`, `ta`, `tag`, ...). Also reports the time to
+warm the cache at startup and to resolve tag ids for a write.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import random
+import time
+
+from common import make_database, print_table, summarize, temp_db_path, time_calls
+
+from app.cache import TagCache
+from app.repositories import TagsRepo
+
+SYLLABLES = ["ka", "to", "re", "mi", "sa", "no", "py", "th", "on", "da", "ta", "ba", "se", "lu", "xi", "go"]
+
+
+def tag_names(count: int, rng: random.Random) -> list:
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))))
+    return sorted(names)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tags", type=int, default=100_000)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    names = tag_names(args.tags, rng)
+    words = rng.sample(names, args.words)
+    prefixes = [word[:n] for word in words for n in range(1, len(word) + 1)]
+
+    with temp_db_path() as db_path:
+        db = make_database(db_path)
+        with db.transaction() as cur:
+            cur.executemany("INSERT INTO tags(name, path) VALUES (?, '')", ((name,) for name in names))
+
+        cache = TagCache()
+        start = time.perf_counter()
+        TagsRepo(db, cache=cache).warm_cache()
+        warm_ms = (time.perf_counter() - start) * 1000
+
+        rows = []
+        for label, repo in (("sqlite LIKE", TagsRepo(db)), ("TagCache", TagsRepo(db, cache=cache))):
+            keystrokes = itertools.cycle(prefixes)
+            stats = summarize(time_calls(lambda: repo.suggest_tags(next(keystrokes), limit=args.limit), len(prefixes)))
+            lookups = [{"name": name} for name in words]
+            resolve = summarize(time_calls(lambda: repo.resolve_tags(lookups), 20))
+            rows.append((label, stats["mean_ms"], stats["p50_ms"], stats["p95_ms"], resolve["mean_ms"]))
+        db.close()
+
+    print(f"tags={args.tags} keystrokes={len(prefixes)} cache warm-up={warm_ms:.1f}ms")
+    print_table(("suggest", "mean_ms", "p50_ms", "p95_ms", "resolve_ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+Benchmarks are plain scripts (`python benchmarks/bench_pool.py --help`) that
+build a throwaway SQLite database from `schema.sql`, seed it with synthetic
+rows and print timing tables to stdout.
+"""
+
+from __future__ import annotations
+
+import json
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Sequence
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+BACKEND_DIR = ROOT_DIR / "backend"
+SCHEMA_PATH = ROOT_DIR / "schema.sql"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.db import Database, ensure_schema  # noqa: E402
+
+
+@contextmanager
+def temp_db_path(name: str = "bench.sqlite") -> Iterator[Path]:
+    with tempfile.TemporaryDirectory(prefix="tdr-bench-") as tmp:
+        yield Path(tmp) / name
+
+
+def make_database(db_path: Path, **kwargs) -> Database:
+    db = Database(db_path, **kwargs)
+    ensure_schema(db, SCHEMA_PATH)
+    return db
+
+
+def seed_items(db: Database, count: int, *, tags_per_item: int = 3, tag_vocabulary: int = 200) -> List[str]:
+    """Insert `count` items with payloads and tags in a single transaction.
+
+    Tag links are written before their items (foreign keys are checked at
+    commit) so the FTS triggers build each row once instead of per tag.
+    """
+
+    item_ids = [f"item-{n:08d}" for n in range(count)]
+    with db.transaction() as cur:
+        cur.execute("PRAGMA defer_foreign_keys = ON;")
+        cur.execute(
+            "INSERT OR IGNORE INTO chunks(chunk_id, thread_id, digest, locator_json) VALUES (?, ?, ?, ?)",
+            ("chunk-bench", "thread-bench", "digest-bench", "{}"),
+        )
+        cur.executemany(
+            "INSERT OR IGNORE INTO tags(name, path) VALUES (?, '')",
+            [(f"tag{n}",) for n in range(tag_vocabulary)],
+        )
+        tag_ids = [row[0] for row in cur.execute("SELECT tag_id FROM tags ORDER BY tag_id")]
+        cur.executemany(
+            "INSERT OR IGNORE INTO item_tags(item_id, tag_id, confidence) VALUES (?, ?, 0.5)",
+            (
+                (item_id, tag_ids[(n * 7 + k * 31) % len(tag_ids)])
+                for n, item_id in enumerate(item_ids)
+                for k in range(tags_per_item)
+            ),
+        )
+        cur.executemany(
+            """
+            INSERT INTO items(item_id, chunk_id, kind, schema_id, title, body, domain, confidence)
+            VALUES (?, 'chunk-bench', ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    item_id,
+                    "knowledge" if n % 3 else "summary",
+                    "knowledge/howto.v1",
+                    f"Title {n} about sqlite topic{n % 97}",
+                    f"Body text {n} with keyword{n % 13} and more words for search",
+                    f"domain{n % 11}.sub{n % 5}",
+                    (n % 10) / 10,
+                )
+                for n, item_id in enumerate(item_ids)
+            ),
+        )
+        cur.executemany(
+            "INSERT INTO item_payloads(item_id, payload_json) VALUES (?, ?)",
+            ((item_id, json.dumps({"n": n})) for n, item_id in enumerate(item_ids)),
+        )
+    return item_ids
+
+
+def time_calls(fn: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+    }
+
+
+def print_table(headers: Sequence[str], rows: Sequence[Sequence[object]]) -> None:
+    cells = [[_fmt(v) for v in row] for row in rows]
+    widths = [max(len(h), *(len(r[i]) for r in cells)) if cells else len(h) for i, h in enumerate(headers)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def _fmt(value: object) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
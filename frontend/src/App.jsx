@@ -323,29 +323,6 @@ async function fetchJson(url, options = {}) {
   return res.json();
 }
 
-const loadLinkTitles = async (groupedLinks) => {
-  const linkIds = Object.values(groupedLinks || {})
-    .flat()
-    .filter(Boolean);
-  const uniqueIds = [...new Set(linkIds)];
-  if (!uniqueIds.length) return {};
-
-  const results = await Promise.allSettled(
-    uniqueIds.map((id) => fetchJson(`${API_BASE}/api/items/${id}`)),
-  );
-  const titleMap = {};
-  results.forEach((result, index) => {
-    const id = uniqueIds[index];
-    if (result.status === 'fulfilled') {
-      const item = toDisplayItem({ ...result.value.item, tags: result.value.item?.tags });
-      titleMap[id] = item?.title || id;
-    } else {
-      titleMap[id] = id;
-    }
-  });
-  return titleMap;
-};
-
 function showApiError(err, fallbackMessage) {
   if (err?.detail) {
     alert(err.detail);
@@ -2441,28 +2418,23 @@ export default function App() {
   }, [searchFilters, fetchSearchResults]);
 
   const loadItemDetail = useCallback(async (itemId) => {
-    const data = await fetchJson(`${API_BASE}/api/items/${itemId}`);
-    const detail = toDisplayItem({ ...data.item, tags: data.item?.tags });
-    detail.links = createEmptyLinks();
-    detail.linkTitles = {};
-    detail.linkMeta = createEmptyLinkMeta();
-    try {
-      const links = await fetchJson(`${API_BASE}/api/items/${itemId}/links`);
-      const grouped = createEmptyLinks();
-      const metaGrouped = createEmptyLinkMeta();
-      (links.links || []).forEach((link) => {
-        const rel = link.rel || 'related';
-        if (!grouped[rel]) grouped[rel] = [];
-        if (!metaGrouped[rel]) metaGrouped[rel] = [];
-        grouped[rel].push(link.target_key);
-        metaGrouped[rel].push({ linkId: link.link_id, targetId: link.target_key });
-      });
-      detail.links = grouped;
-      detail.linkTitles = await loadLinkTitles(grouped);
-      detail.linkMeta = metaGrouped;
-    } catch (err) {
-      console.warn('links fetch failed', err);
-    }
+    const data = await fetchJson(`${API_BASE}/api/items/${itemId}?include_links=true`);
+    const links = data.item?.links || [];
+    const detail = toDisplayItem({ ...data.item, tags: data.item?.tags, links: undefined });
+    const grouped = createEmptyLinks();
+    const metaGrouped = createEmptyLinkMeta();
+    const titles = {};
+    links.forEach((link) => {
+      const rel = link.rel || 'related';
+      if (!grouped[rel]) grouped[rel] = [];
+      if (!metaGrouped[rel]) metaGrouped[rel] = [];
+      grouped[rel].push(link.target_key);
+      metaGrouped[rel].push({ linkId: link.link_id, targetId: link.target_key });
+      titles[link.target_key] = link.target_title || link.target_key;
+    });
+    detail.links = grouped;
+    detail.linkTitles = titles;
+    detail.linkMeta = metaGrouped;
     return detail;
   }, []);
 
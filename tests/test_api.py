@@ -1,5 +1,7 @@
+import json
 from pathlib import Path
 
+import pytest
 from fastapi.testclient import TestClient
 
 from app.db import Database
@@ -45,11 +47,35 @@ def test_item_crud_and_search(tmp_path: Path) -> None:
     result_items = search.json()["items"]
     assert result_items and result_items[0]["item_id"] == item_id
 
+    light = client.get("/api/search", params={"q": "fast", "fields": "item_id,title", "snippet": 4}).json()["items"]
+    assert light == [{"item_id": item_id, "title": "Learn SQLite FTS5", "snippet": "FTS5 enables <mark>fast</mark> search"}]
+    browse = client.get("/api/search", params={"fields": "kind", "snippet": 1}).json()["items"]
+    assert browse == [{"item_id": item_id, "kind": "knowledge", "snippet": "FTS5 ena…"}]
+    assert client.get("/api/search", params={"fields": "payload"}).json()["detail"] == "invalid_fields"
+    assert client.get("/api/search", params={"q": "fast", "mode": "fuzzy"}).json()["detail"] == "invalid_mode"
+    recent_cursor = client.get("/api/search", params={"limit": 1}).json()["next_cursor"]
+    mismatched = client.get("/api/search", params={"q": "fast", "cursor": recent_cursor})
+    assert mismatched.status_code == 400 and mismatched.json()["detail"] == "invalid_cursor"
+    assert client.get("/api/search", params={"cursor": "not-a-cursor"}).json()["detail"] == "invalid_cursor"
+
     delete_resp = client.delete(f"/api/items/{item_id}")
     assert delete_resp.status_code == 200
     assert db_path.exists()
 
 
+def test_semantic_search_modes(tmp_path: Path) -> None:
+    pytest.importorskip("numpy")
+    client, _ = make_client(tmp_path)
+    base = {"kind": "knowledge", "schema_id": "knowledge/howto.v1"}
+    indexing = client.post("/api/items", json={**base, "title": "Indexing strategies", "body": "Covering indexes"})
+    client.post("/api/items", json={**base, "title": "Backups", "body": "Copy the file while idle"})
+
+    assert client.get("/api/search", params={"q": "index"}).json()["items"] == []
+    for mode in ("semantic", "hybrid"):
+        hits = client.get("/api/search", params={"q": "index", "mode": mode}).json()["items"]
+        assert hits[0]["item_id"] == indexing.json()["item_id"]
+
+
 def test_import_commit_creates_items_and_links(tmp_path: Path) -> None:
     client, db_path = make_client(tmp_path)
 
@@ -99,6 +125,19 @@ def test_import_commit_creates_items_and_links(tmp_path: Path) -> None:
     assert len(items) == 2
     assert len(links) == 1
 
+    source, target = links[0]["item_id"], links[0]["target_key"]
+    graph = client.get(f"/api/items/{target}/graph", params={"direction": "in", "rels": "related"})
+    assert graph.status_code == 200
+    assert [(n["item_id"], n["depth"]) for n in graph.json()["nodes"]] == [(target, 0), (source, 1)]
+    assert client.get("/api/items/missing/graph").status_code == 404
+
+    backlinks = client.get(f"/api/items/{target}/backlinks").json()
+    assert backlinks["total"] == 1 and backlinks["rels"][0]["links"][0]["item_id"] == source
+    bad_cursor = client.get(f"/api/items/{target}/backlinks", params={"cursor": "bad"})
+    assert bad_cursor.status_code == 400 and bad_cursor.json()["detail"] == "invalid_cursor"
+    bad_direction = client.get(f"/api/items/{target}/graph", params={"direction": "up"})
+    assert bad_direction.status_code == 400 and bad_direction.json()["detail"] == "invalid_direction"
+
 
 def test_import_commit_updates_existing_chunk_on_duplicate_digest(tmp_path: Path) -> None:
     client, db_path = make_client(tmp_path)
@@ -153,6 +192,31 @@ def test_import_commit_updates_existing_chunk_on_duplicate_digest(tmp_path: Path
     assert chunks[0]["hint"] == "updated"
 
 
+def test_import_job_lists_near_duplicates(tmp_path: Path) -> None:
+    client, _ = make_client(tmp_path)
+
+    def extraction(digest: str, title: str, body: str) -> dict:
+        return {
+            "source": {"thread_id": "thread-1", "digest": digest},
+            "items": [
+                {"item_id": "temp-1", "kind": "knowledge", "schema_id": "knowledge/howto.v1", "title": title, "body": body}
+            ],
+        }
+
+    original = extraction("digest-a", "Vacuum the database", "Run VACUUM after deleting many rows to reclaim space.")
+    first_job = client.post("/api/import/jobs", json={"extraction": original}).json()["job_id"]
+    client.post(f"/api/import/jobs/{first_job}/commit")
+
+    reworded = extraction("digest-b", "Vacuuming the database", "Run VACUUM after deleting lots of rows to reclaim space.")
+    second_job = client.post("/api/import/jobs", json={"extraction": reworded}).json()["job_id"]
+    fetched = client.get(f"/api/import/jobs/{second_job}").json()
+    [candidate] = fetched["candidates"]
+    [hit] = fetched["near_duplicate_matches"][candidate["candidate_id"]]
+    assert hit["title"] == "Vacuum the database" and hit["similarity"] >= 0.5
+    skipped = client.get(f"/api/import/jobs/{second_job}", params={"near_duplicates": 0}).json()
+    assert skipped["near_duplicate_matches"] == {} and skipped["near_duplicates_complete"]
+
+
 def test_import_commit_upserts_stateful_items_by_stable_key(tmp_path: Path) -> None:
     client, db_path = make_client(tmp_path)
 
@@ -198,4 +262,96 @@ def test_import_commit_upserts_stateful_items_by_stable_key(tmp_path: Path) -> N
     assert item["title"] == "Updated title"
     assert item["body"] == "Updated body"
     assert item["domain"] == "imported"
-    assert any(tag.get("name") == "fresh" for tag in item.get("tags", []))
\ No newline at end of file
+    assert any(tag.get("name") == "fresh" for tag in item.get("tags", []))
+
+def test_batch_get_items_projects_fields(tmp_path: Path) -> None:
+    client, _ = make_client(tmp_path)
+
+    ids = []
+    for title in ("First", "Second"):
+        created = client.post(
+            "/api/items",
+            json={
+                "kind": "knowledge",
+                "schema_id": "knowledge/howto.v1",
+                "title": title,
+                "body": f"{title} body",
+                "tags": [{"name": "batch"}],
+                "payload": {"title": title},
+            },
+        )
+        ids.append(created.json()["item_id"])
+
+    titles = client.post("/api/items:batch_get", json={"ids": [ids[1], "missing", ids[0]], "fields": ["title", "kind"]})
+    assert titles.status_code == 200
+    assert titles.json() == {
+        "items": [
+            {"item_id": ids[1], "kind": "knowledge", "title": "Second"},
+            {"item_id": ids[0], "kind": "knowledge", "title": "First"},
+        ],
+        "missing": ["missing"],
+    }
+
+    full = client.post("/api/items:batch_get", json={"ids": ids, "include": ["payload", "tags"]})
+    first = full.json()["items"][0]
+    assert first["payload"] == {"title": "First"}
+    assert [tag["name"] for tag in first["tags"]] == ["batch"]
+    assert first["body"] == "First body"
+
+    assert client.post("/api/items:batch_get", json={"ids": ids, "fields": ["nope"]}).status_code == 400
+
+
+def test_item_writes_report_missing_items(tmp_path: Path) -> None:
+    client, _ = make_client(tmp_path)
+
+    payload = {"kind": "knowledge", "schema_id": "knowledge/howto.v1", "title": "t", "body": "b", "tags": [{"name": "x"}]}
+    assert client.put("/api/items/missing", json=payload).status_code == 404
+    assert client.delete("/api/items/missing").status_code == 404
+    assert client.get("/api/items/missing").status_code == 404
+
+
+def test_stream_import_job_then_commit(tmp_path: Path) -> None:
+    client, _ = make_client(tmp_path)
+
+    extraction = {
+        "chunks": [
+            {
+                "source": {"thread_id": "thread-s", "digest": "digest-s"},
+                "items": [
+                    {"item_id": "temp-1", "kind": "summary", "schema_id": "summary/basic.v1", "title": "Streamed", "body": "b"}
+                ],
+            }
+        ]
+    }
+    created = client.post("/api/import/jobs:stream", content=json.dumps({"extraction": extraction}))
+    assert created.status_code == 200
+    assert created.json()["candidates"] == 1
+    job_id = created.json()["job_id"]
+
+    job = client.get(f"/api/import/jobs/{job_id}").json()["job"]
+    assert job["source"]["chunks"][0]["source"]["digest"] == "digest-s"
+    assert client.post(f"/api/import/jobs/{job_id}/commit").json()["inserted"] == 1
+
+    assert client.post("/api/import/jobs:stream", content=b'{"chunks": [').status_code == 400
+
+
+def test_background_commit_reports_progress(tmp_path: Path) -> None:
+    client, _ = make_client(tmp_path)
+
+    extraction = {
+        "source": {"digest": "digest-bg"},
+        "items": [
+            {"item_id": f"temp-{n}", "kind": "summary", "schema_id": "summary/basic.v1", "title": f"T{n}", "body": "b"}
+            for n in range(3)
+        ],
+    }
+    with client:
+        job_id = client.post("/api/import/jobs", json={"extraction": extraction}).json()["job_id"]
+        queued = client.post(f"/api/import/jobs/{job_id}/commit", params={"background": "true"})
+        assert queued.status_code == 202
+        client.app.state.commit_executor.shutdown()
+
+        progress = client.get(f"/api/import/jobs/{job_id}/progress").json()
+        assert progress["commit_state"] == "committed" and progress["processed"] == 3
+        assert progress["result"]["inserted"] == 3
+        assert client.post(f"/api/import/jobs/{job_id}/cancel").status_code == 409
@@ -0,0 +1,48 @@
+from app.cache import SearchCache, TagCache
+
+
+def test_search_cache_lru_ttl_and_generation() -> None:
+    now = [0.0]
+    cache = SearchCache(maxsize=2, ttl=10.0, clock=lambda: now[0])
+
+    cache.put("a", 0, {"n": 1})
+    cache.put("b", 0, {"n": 2})
+    assert cache.get("a", 0) == {"n": 1}
+    cache.put("c", 0, {"n": 3})
+    assert cache.get("b", 0) is None  # least recently used was evicted
+    assert cache.get("a", 1) is None  # a write happened since it was cached
+
+    now[0] = 11.0
+    assert cache.get("c", 0) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 3
+    assert stats["evictions"] == 1 and stats["invalidations"] == 1 and stats["expirations"] == 1
+    assert stats["size"] == 0
+
+
+def test_search_cache_hands_out_copies() -> None:
+    cache = SearchCache()
+    value = {"items": [{"item_id": "a", "tags": ["x"]}]}
+    cache.put("k", 0, value)
+    value["items"].clear()
+    hit = cache.get("k", 0)
+    hit["items"][0]["tags"].append("y")
+    assert cache.get("k", 0) == {"items": [{"item_id": "a", "tags": ["x"]}]}
+
+
+def test_tag_cache_ranks_prefix_matches_by_usage() -> None:
+    cache = TagCache(depth=2)
+    cache.reset([(1, "python", "", 1), (2, "Pydantic", "", 5), (3, "pytest", "", 3), (4, "rust", "", 9)])
+
+    assert cache.suggest("py", limit=2) == ["Pydantic", "pytest"]
+    assert cache.suggest("PY", limit=3) == ["Pydantic", "pytest", "python"]
+    assert cache.suggest("", limit=2) == ["rust", "Pydantic"]
+    assert cache.suggest("go") == []
+
+    cache.set_usage({1: 10})
+    cache.add_tags([(5, "pyo3", "lang")])
+    assert cache.suggest("py", limit=2) == ["python", "Pydantic"]
+    assert cache.suggest("pyo") == ["pyo3"]
+    assert cache.tag_id("pyo3", "lang") == 5
+    assert cache.tag_id("pyo3") is None
@@ -1,6 +1,10 @@
+import sqlite3
 from pathlib import Path
 
 from app.db import Database, ensure_schema, row_to_dict
+from app.migrations import MIGRATIONS, current_version, latest_version, migrate
+from app.neardup import rebuild_minhash
+from app.repositories import ItemsRepo
 
 
 def test_initialize_creates_database(tmp_path: Path) -> None:
@@ -61,4 +65,200 @@ def test_row_to_dict(tmp_path: Path) -> None:
         "locator_json": "{}",
         "hint": None,
         "created_at": row["created_at"],
-    }
\ No newline at end of file
+    }
+
+def test_pooled_connections_are_reused(tmp_path: Path) -> None:
+    db_path = tmp_path / "pool.sqlite"
+    schema_path = Path(__file__).resolve().parent.parent / "schema.sql"
+    db = Database(db_path, pool_size=2)
+    ensure_schema(db, schema_path)
+
+    with db.connect() as first:
+        pass
+    with db.connect() as second:
+        assert second is first
+        with db.connect() as nested:
+            assert nested is second
+
+    with db.transaction() as cur:
+        with db.connect() as conn:
+            # reads inside a transaction see its uncommitted writes
+            assert conn is cur.connection
+    db.close()
+
+
+def test_broken_pooled_connection_is_evicted(tmp_path: Path) -> None:
+    db_path = tmp_path / "evict.sqlite"
+    schema_path = Path(__file__).resolve().parent.parent / "schema.sql"
+    db = Database(db_path, pool_size=1)
+    ensure_schema(db, schema_path)
+
+    with db.connect() as conn:
+        broken = conn
+    broken.close()
+
+    try:
+        with db.connect() as conn:
+            conn.execute("SELECT 1;")
+    except sqlite3.ProgrammingError:
+        pass
+
+    with db.connect() as conn:
+        assert conn is not broken
+        assert conn.execute("SELECT 1;").fetchone()[0] == 1
+    db.close()
+
+
+def test_unit_of_work_rolls_back_nested_transactions(tmp_path: Path) -> None:
+    db_path = tmp_path / "uow.sqlite"
+    schema_path = Path(__file__).resolve().parent.parent / "schema.sql"
+    db = Database(db_path)
+    ensure_schema(db, schema_path)
+
+    try:
+        with db.unit_of_work():
+            with db.transaction() as cur:
+                cur.execute(
+                    "INSERT INTO chunks(chunk_id, thread_id, digest, locator_json) VALUES (?,?,?,?)",
+                    ("chunk-uow", "thread", "digest-uow", "{}"),
+                )
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+
+    with db.unit_of_work():
+        with db.transaction() as cur:
+            cur.execute(
+                "INSERT INTO chunks(chunk_id, thread_id, digest, locator_json) VALUES (?,?,?,?)",
+                ("chunk-kept", "thread", "digest-kept", "{}"),
+            )
+        try:
+            with db.transaction() as cur:
+                cur.execute(
+                    "INSERT INTO chunks(chunk_id, thread_id, digest, locator_json) VALUES (?,?,?,?)",
+                    ("chunk-dup", "thread", "digest-kept", "{}"),
+                )
+        except sqlite3.IntegrityError:
+            pass
+
+    with db.connect() as conn:
+        saved = [r["chunk_id"] for r in conn.execute("SELECT chunk_id FROM chunks ORDER BY chunk_id")]
+    assert saved == ["chunk-kept"]
+
+
+def test_after_commit_callbacks_follow_the_transaction_outcome(tmp_path: Path) -> None:
+    db = Database(tmp_path / "hooks.sqlite")
+    ensure_schema(db, Path(__file__).resolve().parent.parent / "schema.sql")
+    calls: list = []
+
+    db.after_commit(lambda: calls.append("immediate"))
+    try:
+        with db.unit_of_work():
+            db.after_commit(lambda: calls.append("aborted"))
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    with db.unit_of_work():
+        db.after_commit(lambda: calls.append("outer"))
+        try:
+            with db.transaction():
+                db.after_commit(lambda: calls.append("savepoint"))
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+        assert calls == ["immediate"]
+
+    assert calls == ["immediate", "outer"]
+
+
+def test_wal_storage_profile_applies_pragmas(tmp_path: Path) -> None:
+    db_path = tmp_path / "wal.sqlite"
+    schema_path = Path(__file__).resolve().parent.parent / "schema.sql"
+    db = Database(db_path, storage_profile="wal")
+    ensure_schema(db, schema_path)
+
+    with db.connect() as conn:
+        assert conn.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous;").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout;").fetchone()[0] == 5000
+    assert db.checkpoint()["busy"] == 0
+    db.close()
+
+
+def test_migrations_record_version_and_skip_on_restart(tmp_path: Path) -> None:
+    db_path = tmp_path / "migrate.sqlite"
+    schema_path = Path(__file__).resolve().parent.parent / "schema.sql"
+    db = Database(db_path)
+
+    assert ensure_schema(db, schema_path) is True
+    assert current_version(db) == latest_version()
+    assert migrate(db, schema_path) == []
+    assert ensure_schema(db, schema_path) is False
+
+    with db.connect() as conn:
+        versions = [r["version"] for r in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == [m.version for m in MIGRATIONS]
+
+
+def test_unversioned_database_is_brought_under_migrations(tmp_path: Path) -> None:
+    db_path = tmp_path / "legacy.sqlite"
+    schema_path = Path(__file__).resolve().parent.parent / "schema.sql"
+    db = Database(db_path)
+    db.apply_schema(schema_path)
+    assert current_version(db) == 0
+
+    assert ensure_schema(db, schema_path) is False
+    assert current_version(db) == latest_version()
+
+
+def test_item_heads_migration_backfills_existing_chains(tmp_path: Path) -> None:
+    db_path = tmp_path / "heads.sqlite"
+    schema_path = Path(__file__).resolve().parent.parent / "schema.sql"
+    db = Database(db_path)
+    migrate(db, schema_path, target=9)
+    db.execute_script(
+        """
+        INSERT INTO chunks(chunk_id, thread_id, digest, locator_json) VALUES ('c', 't', 'd', '{}');
+        INSERT INTO items(item_id, chunk_id, kind, schema_id, title, body)
+        VALUES ('a', 'c', 'knowledge', 's', 'A', 'a'), ('b', 'c', 'knowledge', 's', 'B', 'b'),
+               ('c', 'c', 'knowledge', 's', 'C', 'c');
+        INSERT INTO item_links(link_id, item_id, rel, target_key)
+        VALUES ('l1', 'b', 'supersedes', 'a'), ('l2', 'c', 'supersedes', 'b');
+        """
+    )
+
+    assert migrate(db, schema_path) == [m.version for m in MIGRATIONS if m.version > 9]
+    with db.connect() as conn:
+        heads = dict(conn.execute("SELECT item_id, head_id FROM item_heads").fetchall())
+        assert conn.execute("SELECT count(*) FROM heads_dirty").fetchone()[0] == 0
+    assert heads == {"a": "c", "b": "c"}
+
+
+def test_minhash_backfill_tracks_items_from_before_the_index(tmp_path: Path) -> None:
+    db_path = tmp_path / "minhash.sqlite"
+    schema_path = Path(__file__).resolve().parent.parent / "schema.sql"
+    db = Database(db_path)
+    migrate(db, schema_path, target=10)
+    db.execute_script(
+        """
+        INSERT INTO chunks(chunk_id, thread_id, digest, locator_json) VALUES ('c', 't', 'd', '{}');
+        INSERT INTO items(item_id, chunk_id, kind, schema_id, title, body)
+        VALUES ('a', 'c', 'knowledge', 's', 'Vacuum guide', 'Reclaim free pages after deletes'),
+               ('b', 'c', 'knowledge', 's', 'WAL', 'Checkpoint intervals');
+        """
+    )
+    migrate(db, schema_path)
+    items = ItemsRepo(db)
+    assert not items.near_duplicates_complete()
+    assert items.find_near_duplicates([("Vacuum guide", "Reclaim free pages after deletes")]) == [[]]
+
+    # An edit signs the item and takes it off the backfill queue.
+    items.update_item(item_id="b", kind="knowledge", schema_id="s", title="WAL", body="Checkpoint often")
+    with db.connect() as conn:
+        queued = conn.execute("SELECT i.item_id FROM minhash_backfill b JOIN items i ON i.rowid = b.item_rowid")
+        assert [row[0] for row in queued] == ["a"]
+
+    assert rebuild_minhash(db) == 2
+    assert items.near_duplicates_complete()
+    hits = items.find_near_duplicates([("Vacuum guide", "Reclaim free pages after deletes")])[0]
+    assert [hit["item_id"] for hit in hits] == ["a"]
@@ -0,0 +1,193 @@
+import io
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.db import Database, ensure_schema
+from app.importer import CommitExecutor, ExtractionImporter, ImportCommitError, iter_extraction
+from app.repositories import ImportRepo
+
+
+def make_extraction(chunks: int) -> dict:
+    return {
+        "source": {"source_type": "chatgpt_export_json"},
+        "chunks": [
+            {
+                "source": {"thread_id": f"thread-{n}", "locator": {"turn_range": {"start": n, "end": n + 1}}},
+                "classification": {"decision": "SKIP" if n == 1 else "KEEP"},
+                "items": [
+                    {"item_id": f"temp-{n}-{k}", "kind": "summary", "title": "日本語 title", "body": "x" * 50, "n": 1.5e3}
+                    for k in range(3)
+                ],
+            }
+            for n in range(chunks)
+        ],
+        "trailer": [1, 2, 3],
+    }
+
+
+def test_iter_extraction_reads_across_small_blocks() -> None:
+    extraction = make_extraction(4)
+    raw = json.dumps({"extraction": extraction}, ensure_ascii=False).encode("utf-8")
+
+    events = list(iter_extraction(io.BytesIO(raw), block_size=7))
+    chunks = [value for kind, value in events if kind == "chunk"]
+    header = events[-1]
+
+    assert chunks == extraction["chunks"]
+    assert header == ("header", {"source": extraction["source"], "trailer": [1, 2, 3]})
+
+    with pytest.raises(ValueError):
+        list(iter_extraction(io.BytesIO(raw[:-40]), block_size=7))
+
+
+def test_streaming_import_batches_candidates(tmp_path: Path) -> None:
+    db = Database(tmp_path / "import.sqlite")
+    ensure_schema(db, Path(__file__).resolve().parent.parent / "schema.sql")
+    repo = ImportRepo(db)
+    seen = []
+    importer = ExtractionImporter(repo, batch_size=4, progress=lambda p: seen.append(p.candidates))
+
+    raw = json.dumps(make_extraction(5)).encode("utf-8")
+    job = importer.import_stream(io.BytesIO(raw))
+
+    assert (job.chunks, job.candidates, job.bytes_read) == (5, 15, len(raw))
+    assert seen == sorted(seen) and seen[-1] == 15 and len(seen) > 2
+    assert repo.get_job(job.job_id)["thread_id"] == "thread-0"
+    chunks = repo.list_job_chunks(job.job_id)
+    assert [c["source"]["thread_id"] for c in chunks] == [f"thread-{n}" for n in range(5)]
+    assert all(c["source"]["digest"] for c in chunks)
+    candidates = repo.list_candidates(job.job_id)
+    assert sum(c["decision"] == "SKIP" for c in candidates) == 3
+
+    duplicate = make_extraction(2)
+    duplicate["chunks"][1]["items"][0]["item_id"] = "temp-0-0"
+    with pytest.raises(Exception):
+        importer.import_extraction(duplicate, job_id="job-broken")
+    assert repo.get_job("job-broken") is None
+
+
+def test_streaming_import_reads_header_keys_after_items(tmp_path: Path) -> None:
+    db = Database(tmp_path / "import.sqlite")
+    ensure_schema(db, Path(__file__).resolve().parent.parent / "schema.sql")
+    repo = ImportRepo(db)
+    items = [
+        {"item_id": "temp-1", "kind": "summary", "title": "a", "body": "b"},
+        {"item_id": "temp-2", "kind": "summary", "title": "c", "body": "d", "decision": "KEEP"},
+    ]
+    # Keys are written in this order: the header follows the array.
+    raw = json.dumps(
+        {"items": items, "source": {"thread_id": "thread-late", "hint": "h"}, "classification": {"decision": "SKIP"}}
+    ).encode("utf-8")
+
+    job = ExtractionImporter(repo, batch_size=1).import_stream(io.BytesIO(raw))
+
+    stored = repo.get_job(job.job_id)
+    assert (stored["thread_id"], stored["hint"]) == ("thread-late", "h")
+    decisions = {c["temp_item_id"]: c["decision"] for c in repo.list_candidates(job.job_id)}
+    assert decisions == {"temp-1": "SKIP", "temp-2": "KEEP"}
+
+
+def test_commit_executor_runs_and_cancels_jobs(tmp_path: Path) -> None:
+    db = Database(tmp_path / "commit.sqlite")
+    ensure_schema(db, Path(__file__).resolve().parent.parent / "schema.sql")
+    repo = ImportRepo(db)
+    importer = ExtractionImporter(repo)
+    extraction = make_extraction(2)
+    for chunk in extraction["chunks"]:
+        chunk["classification"] = {}
+        for item in chunk["items"]:
+            item["schema_id"] = "summary/basic.v1"
+    done = importer.import_extraction(extraction).job_id
+    running = importer.import_extraction(extraction).job_id
+    queued = importer.import_extraction(extraction).job_id
+
+    executor = CommitExecutor(db)
+    executor.submit(done)
+    executor.shutdown()
+    progress = executor.progress(done)
+    assert progress["status"] == "committed" and progress["commit_state"] == "committed"
+    assert (progress["processed"], progress["total"]) == (6, 6)
+    assert progress["result"]["inserted"] == 6
+
+    executor = CommitExecutor(db)
+    # Holding the write lock keeps the first job from starting its commit.
+    with db.transaction():
+        executor.submit(running)
+        executor.submit(queued)
+        with pytest.raises(ImportCommitError):
+            executor.submit(queued)
+        assert executor.cancel(queued)
+        assert executor.cancel(running)
+    executor.shutdown()
+
+    for job_id in (running, queued):
+        progress = executor.progress(job_id)
+        assert progress["status"] == "reviewing" and progress["commit_state"] == "cancelled"
+    assert repo.get_job(running)["commit_processed"] == 0
+
+
+def test_commit_executor_queues_and_cancels_while_another_commit_writes(tmp_path: Path) -> None:
+    db = Database(tmp_path / "commit.sqlite")
+    ensure_schema(db, Path(__file__).resolve().parent.parent / "schema.sql")
+    importer = ExtractionImporter(ImportRepo(db))
+    extraction = make_extraction(2)
+    for chunk in extraction["chunks"]:
+        chunk["classification"] = {}
+        for item in chunk["items"]:
+            item["schema_id"] = "summary/basic.v1"
+    first = importer.import_extraction(extraction).job_id
+    second = importer.import_extraction(extraction).job_id
+
+    executor = CommitExecutor(db)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold_write_lock() -> None:
+        with db.transaction():
+            holding.set()
+            release.wait(10)
+
+    holder = threading.Thread(target=hold_write_lock)
+    holder.start()
+    holding.wait(10)
+    try:
+        # Another thread owns the write lock, as a running commit would.
+        executor.submit(first)
+        executor.submit(second)
+        assert executor.progress(second)["commit_state"] == "queued"
+        assert executor.cancel(second)
+        assert executor.progress(second)["commit_state"] == "cancelled"
+    finally:
+        release.set()
+        holder.join()
+    executor.shutdown()
+
+    assert executor.progress(first)["commit_state"] == "committed"
+    assert executor.progress(second)["commit_state"] == "cancelled"
+    assert ImportRepo(db).get_job(second)["commit_state"] == "cancelled"
+
+
+def test_commit_executor_fails_only_commits_of_stopped_processes(tmp_path: Path) -> None:
+    db = Database(tmp_path / "commit.sqlite")
+    ensure_schema(db, Path(__file__).resolve().parent.parent / "schema.sql")
+    repo = ImportRepo(db)
+    importer = ExtractionImporter(repo)
+    extraction = make_extraction(1)
+    live_job, gone_job, unowned_job = (importer.import_extraction(extraction).job_id for _ in range(3))
+
+    other = CommitExecutor(db)  # stands in for another worker process
+    repo.set_commit_state(live_job, "running", owner=other.owner)
+    repo.set_commit_state(gone_job, "running", owner="stopped-process")
+    repo.set_commit_state(unowned_job, "queued")
+
+    starting = CommitExecutor(db)
+    states = {job_id: repo.get_job(job_id)["commit_state"] for job_id in (live_job, gone_job, unowned_job)}
+    assert states == {live_job: "running", gone_job: "failed", unowned_job: "failed"}
+
+    other.shutdown()
+    CommitExecutor(db).shutdown()
+    assert repo.get_job(live_job)["commit_state"] == "failed"
+    starting.shutdown()
+    assert not list(tmp_path.glob("commit.sqlite.commit-*.lock"))
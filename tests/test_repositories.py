@@ -1,8 +1,13 @@
 import json
 from pathlib import Path
 
+import pytest
+
+from app.cache import SearchCache, TagCache
 from app.db import Database, ensure_schema
-from app.repositories import ImportRepo, ItemsRepo, LinksRepo, SearchRepo, TagsRepo
+from app.fts import FtsFlusher, rebuild_all
+from app.neardup import BANDS, rebuild_minhash
+from app.repositories import ImportRepo, InvalidQueryError, ItemsRepo, LinksRepo, SearchRepo, TagsRepo
 
 
 def setup_db(tmp_path: Path) -> Database:
@@ -73,8 +78,8 @@ def test_search_repository_uses_fts(tmp_path: Path) -> None:
     create_sample_item(db, item_id="item-search")
 
     search_repo = SearchRepo(db)
-        results = search_repo.search_items(query="example")
-␊
+    results = search_repo.search_items(query="example")
+
     assert results["items"] and results["items"][0]["item_id"] == "item-search"
 
 
@@ -96,4 +101,656 @@ def test_import_repository(tmp_path: Path) -> None:
     candidates = repo.list_candidates("job-1")
 
     assert job is not None and job["job_id"] == "job-1"
-    assert candidates and candidates[0]["candidate_id"] == "cand-1"
\ No newline at end of file
+    assert candidates and candidates[0]["candidate_id"] == "cand-1"
+
+def test_tag_changes_reach_fts_once_per_transaction(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    tags_repo = TagsRepo(db)
+
+    with db.unit_of_work():
+        tags_repo.replace_item_tags("item-1", [{"name": "alpha"}, {"name": "beta"}])
+        with db.connect() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM fts_dirty").fetchone()[0] == 1
+
+    with db.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM fts_dirty").fetchone()[0] == 0
+        row = conn.execute("SELECT tags_text FROM items_fts WHERE items_fts MATCH 'beta'").fetchone()
+    assert row["tags_text"] == "alpha beta"
+
+
+def test_background_fts_sync_waits_for_flush(tmp_path: Path) -> None:
+    db_path = tmp_path / "background.sqlite"
+    schema_path = Path(__file__).resolve().parent.parent / "schema.sql"
+    db = Database(db_path, fts_sync="background")
+    ensure_schema(db, schema_path)
+    create_sample_item(db, item_id="item-bg")
+
+    search_repo = SearchRepo(db)
+    assert search_repo.search_items(query="example")["items"] == []
+
+    FtsFlusher(db).flush()
+    assert search_repo.search_items(query="example")["items"][0]["item_id"] == "item-bg"
+
+    with db.transaction() as cur:
+        assert rebuild_all(cur) == 1
+
+
+def test_search_total_and_keyset_pagination(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db, item_id="item-00")
+    items_repo = ItemsRepo(db)
+    for n in range(1, 7):
+        items_repo.create_item(
+            item_id=f"item-{n:02d}",
+            chunk_id="chunk-1",
+            kind="knowledge",
+            schema_id="knowledge/howto.v1",
+            title="example",
+            body="body",
+        )
+
+    search_repo = SearchRepo(db)
+    first = search_repo.search_items(query="example", limit=4)
+    assert first["total"] == 7 and first["total_capped"] is False
+
+    seen = [item["item_id"] for item in first["items"]]
+    second = search_repo.search_items(query="example", limit=4, cursor=first["next_cursor"])
+    seen += [item["item_id"] for item in second["items"]]
+    assert sorted(seen) == [f"item-{n:02d}" for n in range(7)]
+    assert second["next_cursor"] is None
+
+    capped = search_repo.search_items(sort="updated_at", limit=2, total_cap=3)
+    assert capped["total"] == 3 and capped["total_capped"] is True
+    by_updated = search_repo.search_items(sort="updated_at", limit=2, cursor=capped["next_cursor"])
+    assert {i["item_id"] for i in by_updated["items"]}.isdisjoint({i["item_id"] for i in capped["items"]})
+
+    try:
+        search_repo.search_items(query="example", cursor=capped["next_cursor"])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("cursor from another sort order was accepted")
+
+
+def test_search_routes_japanese_terms(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    items_repo = ItemsRepo(db)
+    items_repo.create_item(
+        item_id="item-ja",
+        chunk_id="chunk-1",
+        kind="knowledge",
+        schema_id="knowledge/howto.v1",
+        title="検索エンジンの設定",
+        body="全文検索インデックスを再構築する手順 example",
+    )
+
+    search_repo = SearchRepo(db)
+    for query in ("インデックス", "検索", "再構築 example", "設定"):
+        result = search_repo.search_items(query=query)
+        assert [item["item_id"] for item in result["items"]] == ["item-ja"], query
+        assert result["total"] == 1
+
+    assert search_repo.search_items(query="インデックス 存在しない")["items"] == []
+    assert search_repo.search_items(query="エンジン", sort="relevance")["items"][0]["item_id"] == "item-ja"
+
+
+def test_search_cache_is_invalidated_by_writes(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    cache = SearchCache()
+    search_repo = SearchRepo(db, cache=cache)
+
+    first = search_repo.search_items(query="example", kinds=["knowledge"])
+    first["items"].clear()  # callers get their own copy
+    hit = search_repo.search_items(query="  example ", kinds=["knowledge"])
+    assert [item["item_id"] for item in hit["items"]] == ["item-1"]
+    assert cache.stats()["hits"] == 1
+
+    TagsRepo(db).replace_item_tags("item-1", [{"name": "alpha"}])
+    refreshed = search_repo.search_items(query="example", kinds=["knowledge"])
+    assert refreshed["items"][0]["tags"] == ["alpha"]
+    assert cache.stats()["invalidations"] == 1
+
+    # Short CJK terms are matched with a case-sensitive substring test, so the
+    # query's case is part of the key.
+    ItemsRepo(db).create_item(
+        item_id="item-ja", chunk_id="chunk-1", kind="knowledge", schema_id="knowledge/howto.v1", title="A日記", body="b"
+    )
+    assert [item["item_id"] for item in search_repo.search_items(query="A日")["items"]] == ["item-ja"]
+    assert search_repo.search_items(query="a日")["items"] == []
+
+
+def test_item_detail_loads_related_rows_in_one_query(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db, item_id="item-1")
+    items_repo = ItemsRepo(db)
+    items_repo.create_item(
+        item_id="item-2", chunk_id="chunk-1", kind="knowledge", schema_id="knowledge/howto.v1", title="target", body="b"
+    )
+    items_repo.add_payload("item-1", {"steps": [1, 2]})
+    TagsRepo(db).replace_item_tags("item-1", [{"name": "beta", "confidence": 0.5}, {"name": "alpha"}])
+    LinksRepo(db).create_link(link_id="link-1", item_id="item-1", rel="related", target_key="item-2")
+
+    detail = items_repo.get_item_detail("item-1", fields=["title"], include_links=True)
+    assert detail == {
+        "item_id": "item-1",
+        "title": "example",
+        "payload": {"steps": [1, 2]},
+        "tags": [
+            {"name": "alpha", "path": "", "confidence": 0.0},
+            {"name": "beta", "path": "", "confidence": 0.5},
+        ],
+        "links": [
+            {
+                "link_id": "link-1",
+                "item_id": "item-1",
+                "rel": "related",
+                "target_key": "item-2",
+                "note": None,
+                "confidence": 0.0,
+                "target_title": "target",
+                "target_kind": "knowledge",
+            }
+        ],
+    }
+    assert items_repo.get_item_detail("item-2")["tags"] == []
+    assert items_repo.get_item_detail("missing") is None
+    assert items_repo.soft_delete("missing") is False
+
+
+def test_bulk_item_tag_and_link_writes(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db, item_id="item-existing")
+    items_repo = ItemsRepo(db)
+    items_repo.update_item(
+        item_id="item-existing", kind="knowledge", schema_id="knowledge/howto.v1", title="old", body="old", stable_key="k/1"
+    )
+
+    def row(item_id: str, **extra: object) -> dict:
+        return {
+            "item_id": item_id,
+            "chunk_id": "chunk-1",
+            "kind": "knowledge",
+            "schema_id": "knowledge/howto.v1",
+            "title": item_id,
+            "body": "body",
+            "payload": {"id": item_id},
+            **extra,
+        }
+
+    items_repo.create_items([row("item-a"), row("item-b", kind="summary", stable_key="k/1")])
+    survivors = items_repo.upsert_items(
+        [row("item-c", stable_key="k/1"), row("item-d", stable_key="k/2"), row("item-e", stable_key="k/2")]
+    )
+    assert survivors == {"item-c": "item-existing", "item-d": "item-d", "item-e": "item-d"}
+    assert items_repo.get_item("item-existing")["title"] == "item-c"
+    assert items_repo.get_item("item-d")["title"] == "item-e"
+    assert items_repo.get_payload("item-d") == {"id": "item-e"}
+    assert items_repo.get_payload("item-b") == {"id": "item-b"}
+
+    assert items_repo.upsert_stateful_item(row("item-f", stable_key="k/1")) == ("item-existing", False)
+    assert items_repo.upsert_stateful_item(row("item-g", kind="value", stable_key="k/1")) == ("item-g", True)
+    assert items_repo.get_payload("item-existing") == {"id": "item-f"}
+    with pytest.raises(ValueError):
+        items_repo.upsert_stateful_item(row("item-h"))
+
+    tags_repo = TagsRepo(db)
+    tags_repo.create_tag("shared")
+    tags_repo.replace_tags_bulk(
+        {"item-a": [{"name": "shared"}, {"name": "new", "confidence": 0.4}], "item-d": [{"name": "new"}]}
+    )
+    tags_repo.replace_tags_bulk({"item-a": [{"name": "shared", "confidence": 0.9}]})
+    assert tags_repo.get_tags_for_item("item-a") == [{"name": "shared", "path": "", "confidence": 0.9}]
+    assert [t["name"] for t in tags_repo.get_tags_for_item("item-d")] == ["new"]
+    assert len(tags_repo.list_tags()) == 2
+
+    links_repo = LinksRepo(db)
+    links_repo.create_links_bulk(
+        [
+            {"link_id": "link-1", "item_id": "item-a", "rel": "related", "target_key": "item-d"},
+            {"link_id": "link-2", "item_id": "item-a", "rel": "supersedes", "target_key": "item-b", "confidence": 0.5},
+        ]
+    )
+    assert [l["target_key"] for l in links_repo.list_links_for_item("item-a")] == ["item-d", "item-b"]
+
+
+def test_tag_cache_follows_committed_tag_writes(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db, item_id="item-1")
+    ItemsRepo(db).create_item(
+        item_id="item-2", chunk_id="chunk-1", kind="knowledge", schema_id="knowledge/howto.v1", title="t", body="b"
+    )
+    TagsRepo(db).replace_item_tags("item-1", [{"name": "python"}])
+    cache = TagCache()
+    tags_repo = TagsRepo(db, cache=cache)
+    tags_repo.warm_cache()
+    assert tags_repo.suggest_tags("p") == ["python"]
+
+    tags_repo.replace_tags_bulk({"item-1": [{"name": "pytest"}], "item-2": [{"name": "pytest"}, {"name": "python"}]})
+    assert tags_repo.suggest_tags("py") == ["pytest", "python"]
+
+    try:
+        with db.unit_of_work():
+            tags_repo.replace_item_tags("item-1", [{"name": "pygments"}])
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    assert tags_repo.suggest_tags("py") == ["pytest", "python"]
+    assert cache.tag_id("pygments") is None
+
+    tags_repo.clear_tags_for_item("item-2")
+    assert tags_repo.suggest_tags("py") == ["pytest", "python"]
+    tags_repo.add_tag_to_item("item-2", tags_repo.find_or_create({"name": "python"}))
+    tags_repo.add_tag_to_item("item-1", tags_repo.find_or_create({"name": "python"}))
+    assert tags_repo.suggest_tags("py") == ["python", "pytest"]
+
+
+def test_domain_index_tracks_item_writes(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    items_repo = ItemsRepo(db)
+    for item_id, domain in (
+        ("item-a", "software.testing"),
+        ("item-b", "software.testing.unit"),
+        ("item-c", "software"),
+        ("item-d", "aquarium"),
+    ):
+        items_repo.create_item(
+            item_id=item_id, chunk_id="chunk-1", kind="summary", schema_id="summary/v1", title=item_id, body="b", domain=domain
+        )
+    items_repo.update_item(item_id="item-d", kind="summary", schema_id="summary/v1", title="d", body="b", domain="software.db")
+
+    search_repo = SearchRepo(db)
+    assert search_repo.suggest_domains("soft") == ["software", "software.db", "software.testing", "software.testing.unit"]
+    assert search_repo.suggest_domains("aq") == []
+    assert search_repo.suggest_domains("Soft", limit=2) == ["software", "software.db"]
+    assert search_repo.suggest_domains("SOFTWARE.T") == ["software.testing", "software.testing.unit"]
+    assert search_repo.domain_children() == [{"domain": "software", "item_count": 1, "subtree_count": 4}]
+    assert search_repo.domain_children("software.testing") == [
+        {"domain": "software.testing.unit", "item_count": 1, "subtree_count": 1}
+    ]
+
+    def found(domain: str) -> list:
+        return sorted(r["item_id"] for r in search_repo.search_items(domain=domain)["items"])
+
+    assert found("software.testing.*") == ["item-a", "item-b"]
+    assert found("software.*") == ["item-a", "item-b", "item-c", "item-d"]
+    assert found("software") == ["item-c"]
+
+
+def test_search_facets_match_filtered_and_global_counts(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    items_repo = ItemsRepo(db)
+    for item_id, kind, domain in (
+        ("item-a", "knowledge", "software.testing"),
+        ("item-b", "summary", "software"),
+        ("item-c", "knowledge", None),
+    ):
+        items_repo.create_item(
+            item_id=item_id, chunk_id="chunk-1", kind=kind, schema_id="s/v1", title="sqlite", body="b", domain=domain
+        )
+    TagsRepo(db).replace_tags_bulk({"item-a": [{"name": "fts"}, {"name": "db"}], "item-b": [{"name": "db"}]})
+    items_repo.soft_delete("item-1")
+    search_repo = SearchRepo(db)
+
+    everything = search_repo.search_items(facets=True)["facets"]
+    assert everything == {
+        "kinds": [{"value": "knowledge", "count": 2}, {"value": "summary", "count": 1}],
+        "domains": [{"value": "software", "count": 1}, {"value": "software.testing", "count": 1}],
+        "tags": [{"value": "db", "count": 2}, {"value": "fts", "count": 1}],
+        "capped": False,
+    }
+
+    knowledge = search_repo.search_items(query="sqlite", kinds=["knowledge"], facets=True)["facets"]
+    assert knowledge["kinds"] == [{"value": "knowledge", "count": 2}]
+    assert knowledge["tags"] == [{"value": "db", "count": 1}, {"value": "fts", "count": 1}]
+    assert search_repo.search_items(query="sqlite", facets=True, total_cap=2)["facets"]["capped"]
+    assert "facets" not in search_repo.search_items(query="sqlite")
+
+
+def test_readding_a_tag_counts_it_once(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    tags_repo = TagsRepo(db)
+    tag_id = tags_repo.create_tag("fts")
+    tags_repo.add_tag_to_item("item-1", tag_id, confidence=0.2)
+    tags_repo.add_tag_to_item("item-1", tag_id, confidence=0.9)
+
+    def tag_count() -> int:
+        with db.connect() as conn:
+            row = conn.execute("SELECT count FROM facet_counts WHERE facet = 'tag' AND value = 'fts'").fetchone()
+        return row[0] if row else 0
+
+    assert tag_count() == 1
+    assert tags_repo.get_tags_for_item("item-1")[0]["confidence"] == 0.9
+    with db.transaction() as cur:
+        cur.execute("DELETE FROM items WHERE item_id = 'item-1'")
+    assert tag_count() == 0
+
+
+def test_search_tag_expressions(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    items_repo = ItemsRepo(db)
+    for item_id in ("item-a", "item-b", "item-c"):
+        items_repo.create_item(item_id=item_id, chunk_id="chunk-1", kind="summary", schema_id="s/v1", title="t", body="b")
+    TagsRepo(db).replace_tags_bulk(
+        {
+            "item-a": [{"name": "db"}, {"name": "sqlite"}],
+            "item-b": [{"name": "db"}, {"name": "postgres"}, {"name": "draft"}],
+            "item-c": [{"name": "sqlite"}, {"name": "sqlite", "path": "lang"}],
+        }
+    )
+    search_repo = SearchRepo(db)
+
+    def found(*tags: str) -> list:
+        return sorted(r["item_id"] for r in search_repo.search_items(tags=list(tags))["items"])
+
+    assert found("sqlite") == ["item-a", "item-c"]
+    assert found("db", "sqlite") == ["item-a"]
+    assert found("sqlite|postgres") == ["item-a", "item-b", "item-c"]
+    assert found("db", "-draft") == ["item-a"]
+    assert found("-db") == ["item-1", "item-c"]
+    assert found("db", "unknown") == []
+    assert found("db", "-unknown") == ["item-a", "item-b"]
+
+
+def test_search_column_weights_and_blended_sort(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    items_repo = ItemsRepo(db)
+    for item_id, title, body, confidence in (
+        ("item-title", "replication guide", "notes", 0.2),
+        ("item-body", "misc", "replication replication", 0.2),
+        ("item-fresh", "replication setup", "notes", 0.9),
+    ):
+        items_repo.create_item(
+            item_id=item_id,
+            chunk_id="chunk-1",
+            kind="knowledge",
+            schema_id="knowledge/howto.v1",
+            title=title,
+            body=body,
+            confidence=confidence,
+        )
+    with db.transaction() as cur:
+        cur.execute("UPDATE items SET updated_at = '2020-01-01T00:00:00.000Z' WHERE item_id = 'item-title'")
+
+    def ranked(repo: SearchRepo, **kwargs) -> list:
+        return [item["item_id"] for item in repo.search_items(query="replication", **kwargs)["items"]]
+
+    assert ranked(SearchRepo(db))[-1] == "item-body"
+    assert ranked(SearchRepo(db, weights={"title": 1.0, "body": 4.0}))[0] == "item-body"
+    with pytest.raises(ValueError):
+        SearchRepo(db, weights={"payload": 2.0})
+
+    blended = ranked(SearchRepo(db), sort="blended")
+    assert blended[0] == "item-fresh" and blended.index("item-title") > blended.index("item-fresh")
+
+    search_repo = SearchRepo(db)
+    first = search_repo.search_items(query="replication", sort="blended", limit=2)
+    second = search_repo.search_items(query="replication", sort="blended", limit=2, cursor=first["next_cursor"])
+    assert [i["item_id"] for i in first["items"] + second["items"]] == blended
+
+
+def test_link_graph_walks_cycles_within_depth(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db, item_id="item-a")
+    items_repo = ItemsRepo(db)
+    for item_id in ("item-b", "item-c", "item-d", "item-e"):
+        items_repo.create_item(
+            item_id=item_id, chunk_id="chunk-1", kind="knowledge", schema_id="knowledge/howto.v1", title=item_id, body="b"
+        )
+    links_repo = LinksRepo(db)
+    for n, (source, rel, target) in enumerate(
+        (
+            ("item-a", "related", "item-b"),
+            ("item-b", "related", "item-c"),
+            ("item-c", "related", "item-a"),
+            ("item-c", "supersedes", "item-d"),
+            ("item-e", "born_from", "item-a"),
+        )
+    ):
+        links_repo.create_link(link_id=f"link-{n}", item_id=source, rel=rel, target_key=target)
+
+    def reached(**kwargs) -> list:
+        return [(n["item_id"], n["depth"]) for n in links_repo.graph("item-a", **kwargs)["nodes"]]
+
+    assert reached(depth=1) == [("item-a", 0), ("item-b", 1)]
+    full = links_repo.graph("item-a", depth=5)
+    assert [n["item_id"] for n in full["nodes"]] == ["item-a", "item-b", "item-c", "item-d"]
+    assert len(full["edges"]) == 4 and full["truncated"] is False
+    assert reached(depth=5, rels=["related"], direction="both") == [("item-a", 0), ("item-b", 1), ("item-c", 1)]
+    assert reached(direction="in") == [("item-a", 0), ("item-e", 1), ("item-c", 1), ("item-b", 2)]
+    assert links_repo.graph("item-a", depth=5, limit=2)["truncated"] is True
+    assert links_repo.graph("item-missing") is None
+
+
+def test_item_heads_follow_supersedes_links(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db, item_id="v1")
+    items_repo = ItemsRepo(db)
+    for item_id in ("v2", "v3", "fork", "loop-a", "loop-b"):
+        items_repo.create_item(
+            item_id=item_id, chunk_id="chunk-1", kind="knowledge", schema_id="knowledge/howto.v1", title="example", body="b"
+        )
+    links_repo = LinksRepo(db)
+    links_repo.create_links_bulk(
+        [
+            {"link_id": "link-1", "item_id": "v2", "rel": "supersedes", "target_key": "v1"},
+            {"link_id": "link-2", "item_id": "v3", "rel": "supersedes", "target_key": "v2"},
+            {"link_id": "link-3", "item_id": "loop-a", "rel": "supersedes", "target_key": "loop-b"},
+            {"link_id": "link-4", "item_id": "loop-b", "rel": "supersedes", "target_key": "loop-a"},
+            {"link_id": "link-5", "item_id": "v3", "rel": "related", "target_key": "fork"},
+        ]
+    )
+    assert [links_repo.head(i) for i in ("v1", "v2", "v3", "fork")] == ["v3", "v3", "v3", "fork"]
+    assert links_repo.head("loop-a") == "loop-a"
+
+    # The newest link wins when an item is superseded twice.
+    links_repo.create_link(link_id="link-6", item_id="fork", rel="supersedes", target_key="v2")
+    assert [links_repo.head(i) for i in ("v1", "v2", "v3")] == ["fork", "fork", "v3"]
+    links_repo.delete_link("link-6")
+    links_repo.delete_link("link-2")
+    assert [links_repo.head(i) for i in ("v1", "v2", "v3")] == ["v2", "v2", "v3"]
+
+    search_repo = SearchRepo(db)
+    heads = search_repo.search_items(query="example", heads_only=True, sort="created_at")
+    assert {item["item_id"] for item in heads["items"]} == {"v2", "v3", "fork", "loop-a", "loop-b"}
+    with db.connect() as conn:
+        assert conn.execute("SELECT count(*) FROM heads_dirty").fetchone()[0] == 0
+
+
+def test_backlinks_are_grouped_by_rel_and_paged(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db, item_id="hub")
+    items_repo = ItemsRepo(db)
+    for n in range(5):
+        items_repo.create_item(
+            item_id=f"src-{n}", chunk_id="chunk-1", kind="knowledge", schema_id="knowledge/howto.v1", title=f"S{n}", body="b"
+        )
+    links_repo = LinksRepo(db)
+    for n in range(5):
+        links_repo.create_link(link_id=f"rel-{n}", item_id=f"src-{n}", rel="related", target_key="hub")
+    links_repo.create_link(link_id="born", item_id="src-0", rel="born_from", target_key="hub")
+    links_repo.create_link(link_id="out", item_id="hub", rel="related", target_key="src-4")
+
+    first = links_repo.backlinks("hub", limit=2)
+    assert first["total"] == 6
+    assert [(g["rel"], g["count"]) for g in first["rels"]] == [("born_from", 1), ("related", 5)]
+    born, related = first["rels"]
+    assert born["next_cursor"] is None and born["links"][0]["title"] == "S0"
+    assert [link["item_id"] for link in related["links"]] == ["src-4", "src-3"]
+
+    seen = [link["item_id"] for link in related["links"]]
+    cursor = related["next_cursor"]
+    while cursor:
+        page = links_repo.backlinks("hub", limit=2, cursor=cursor)
+        assert [(g["rel"], g["count"]) for g in page["rels"]] == [("related", 5)]
+        seen += [link["item_id"] for link in page["rels"][0]["links"]]
+        cursor = page["rels"][0]["next_cursor"]
+    assert seen == ["src-4", "src-3", "src-2", "src-1", "src-0"]
+    with pytest.raises(InvalidQueryError) as mismatch:
+        links_repo.backlinks("hub", rel="born_from", cursor=related["next_cursor"])
+    assert mismatch.value.detail == "invalid_cursor"
+
+    out = links_repo.list_links_for_item("hub", include_degrees=True)
+    assert [(l["target_key"], l["target_in_degree"], l["target_out_degree"]) for l in out] == [("src-4", 1, 1)]
+
+
+def test_near_duplicates_follow_item_writes(tmp_path: Path) -> None:
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    items_repo = ItemsRepo(db)
+    for item_id, title, body in (
+        ("item-fts", "Rebuild the FTS index after bulk loads", "Run rebuild-fts after importing many items so search sees them."),
+        ("item-wal", "Tune WAL checkpoints", "Checkpoint intervals matter for write heavy workloads."),
+    ):
+        items_repo.create_item(
+            item_id=item_id, chunk_id="chunk-1", kind="knowledge", schema_id="knowledge/howto.v1", title=title, body=body
+        )
+
+    paraphrase = ("Rebuilding the FTS index after a bulk load", "Run rebuild-fts after importing lots of items so search sees them.")
+    [hits] = items_repo.find_near_duplicates([paraphrase])
+    assert [hit["item_id"] for hit in hits] == ["item-fts"] and hits[0]["similarity"] >= 0.5
+    assert items_repo.find_near_duplicates([paraphrase], exclude_item_id="item-fts") == [[]]
+
+    items_repo.update_item(
+        item_id="item-fts", kind="knowledge", schema_id="knowledge/howto.v1", title="Unrelated", body="Nothing alike."
+    )
+    assert items_repo.find_near_duplicates([paraphrase]) == [[]]
+    items_repo.update_item(
+        item_id="item-wal", kind="knowledge", schema_id="knowledge/howto.v1", title=paraphrase[0], body=paraphrase[1]
+    )
+    assert items_repo.soft_delete("item-wal")
+    assert items_repo.find_near_duplicates([paraphrase]) == [[]]
+
+    with db.connect() as conn:
+        signed = conn.execute("SELECT count(*) FROM item_minhash").fetchone()[0]
+        assert conn.execute("SELECT count(*) FROM item_minhash_buckets").fetchone()[0] == signed * BANDS
+    assert rebuild_minhash(db) == signed == 3
+
+
+def test_semantic_and_hybrid_search_follow_item_writes(tmp_path: Path) -> None:
+    pytest.importorskip("numpy")
+    from app.vectors import VectorIndex
+
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    items_repo = ItemsRepo(db)
+    for item_id, title, body in (
+        ("item-vacuum", "Vacuuming", "Reclaim free pages after large deletes."),
+        ("item-vacuum-note", "Maintenance notes", "Run vacuum weekly."),
+        ("item-wal", "WAL checkpoints", "Checkpoint intervals for write heavy workloads."),
+    ):
+        items_repo.create_item(
+            item_id=item_id, chunk_id="chunk-1", kind="knowledge", schema_id="knowledge/howto.v1", title=title, body=body
+        )
+    index = VectorIndex(db)
+    search_repo = SearchRepo(db, vectors=index)
+
+    # "vacuum" is not a token of "Vacuuming", so FTS misses the title hit.
+    keyword = search_repo.search_items(query="vacuum")["items"]
+    assert [hit["item_id"] for hit in keyword] == ["item-vacuum-note"]
+    semantic = search_repo.search_items(query="vacuum", mode="semantic", fields=["title"])
+    assert {hit["item_id"] for hit in semantic["items"][:2]} == {"item-vacuum", "item-vacuum-note"}
+    assert set(semantic["items"][0]) == {"item_id", "title"}
+    hybrid = search_repo.search_items(query="vacuum", mode="hybrid", limit=1)
+    assert hybrid["items"][0]["item_id"] == "item-vacuum-note"
+    rest = search_repo.search_items(query="vacuum", mode="hybrid", limit=1, cursor=hybrid["next_cursor"])
+    assert rest["items"][0]["item_id"] == "item-vacuum"
+    with pytest.raises(InvalidQueryError) as mismatch:
+        search_repo.search_items(query="vacuum", mode="semantic", cursor=hybrid["next_cursor"])
+    assert mismatch.value.detail == "invalid_cursor"
+    with pytest.raises(InvalidQueryError) as unavailable:
+        SearchRepo(db).search_items(query="vacuum", mode="semantic")
+    assert unavailable.value.detail == "semantic_search_unavailable"
+
+    items_repo.update_item(
+        item_id="item-wal", kind="knowledge", schema_id="knowledge/howto.v1", title="Vacuum into", body="Copies."
+    )
+    assert items_repo.soft_delete("item-vacuum")
+    ranked = [hit["item_id"] for hit in search_repo.search_items(query="vacuum", mode="semantic")["items"]]
+    assert "item-wal" in ranked and "item-vacuum" not in ranked
+    filtered = search_repo.search_items(query="vacuum", mode="semantic", kinds=["summary"])
+    assert filtered["items"] == [] and filtered["total"] == 0
+    index.close()
+
+    # A new index resumes from the files and the change log.
+    items_repo.update_item(
+        item_id="item-vacuum-note", kind="knowledge", schema_id="knowledge/howto.v1", title="Other", body="Nothing."
+    )
+    reopened = VectorIndex(db)
+    assert len(reopened) == 0 and reopened.refresh() == 1 and len(reopened) == 3
+    hits = SearchRepo(db, vectors=reopened).search_items(query="vacuum", mode="semantic")["items"]
+    ranked = [hit["item_id"] for hit in hits]
+    assert ranked[0] == "item-wal" and "item-vacuum-note" not in ranked[:1]
+    assert reopened.rebuild() == 3
+
+
+def test_filtered_semantic_search_scans_the_filtered_items(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("numpy")
+    from app import repositories
+    from app.vectors import VectorIndex
+
+    monkeypatch.setattr(repositories, "VECTOR_CANDIDATES", 2)
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    items_repo = ItemsRepo(db)
+    for n in range(10):
+        items_repo.create_item(
+            item_id=f"item-vacuum-{n}",
+            chunk_id="chunk-1",
+            kind="knowledge",
+            schema_id="knowledge/howto.v1",
+            title="Vacuum",
+            body=f"Vacuum guide {n}.",
+        )
+    items_repo.create_item(
+        item_id="item-summary",
+        chunk_id="chunk-1",
+        kind="summary",
+        schema_id="summary/basic.v1",
+        title="Weekly maintenance",
+        body="We ran vacuum on the archive and checked the free pages afterwards.",
+    )
+    search_repo = SearchRepo(db, vectors=VectorIndex(db))
+
+    # The summary ranks below every knowledge hit, so the global top misses it.
+    unfiltered = search_repo.search_items(query="vacuum", mode="semantic")
+    assert unfiltered["total_capped"] and "item-summary" not in [hit["item_id"] for hit in unfiltered["items"]]
+    filtered = search_repo.search_items(query="vacuum", mode="semantic", kinds=["summary"])
+    assert [hit["item_id"] for hit in filtered["items"]] == ["item-summary"]
+    assert filtered["total"] == 1 and not filtered["total_capped"]
+    broad = search_repo.search_items(query="vacuum", mode="hybrid", kinds=["knowledge"])
+    assert broad["total_capped"] and all(hit["item_id"].startswith("item-vacuum-") for hit in broad["items"])
+    search_repo.vectors.close()
+
+
+def test_vector_index_sees_writes_from_another_connection(tmp_path: Path) -> None:
+    pytest.importorskip("numpy")
+    from app.vectors import VectorIndex
+
+    db = setup_db(tmp_path)
+    create_sample_item(db)
+    index = VectorIndex(db)
+    assert index.refresh() == 1 and index.refresh() == 0
+
+    # A second Database stands in for another process (a CLI import, another
+    # worker): its commits do not move this process's counters.
+    other = Database(db.db_path)
+    ItemsRepo(other).create_item(
+        item_id="item-vacuum",
+        chunk_id="chunk-1",
+        kind="knowledge",
+        schema_id="knowledge/howto.v1",
+        title="Vacuuming",
+        body="Reclaim free pages.",
+    )
+    other.close()
+    hits = SearchRepo(db, vectors=index).search_items(query="vacuum", mode="semantic")["items"]
+    assert [hit["item_id"] for hit in hits] == ["item-vacuum"]
+    index.close()